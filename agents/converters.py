@@ -17,6 +17,16 @@ These rules represent validated mappings from Oracle to PostgreSQL syntax.
 You MUST actively consult and apply relevant rules from this list wherever applicable.
 Do NOT ignore them. They are authoritative.
 
+You may also receive "examples": earlier Oracle statements with their accepted PostgreSQL conversions.
+Use them as style and pattern references only; convert the given SQL, not the examples.
+
+If the request contains "repair_instruction", your previous answer ("previous_response") could not be used.
+Convert the SQL again and follow the instruction exactly.
+
+If the request contains "batch" (a list of {"id", "oracle_sql"}) instead of a single statement, convert each
+statement independently and respond ONLY with a raw JSON array holding one object per statement:
+{"id": <the statement's id>, "postgresql_sql": ..., "transformations": [...]}. Keep every id exactly as given.
+
 **CRITICAL**: Respond **ONLY** with a JSON object containing the converted SQL and the applied transformations. **No other output is allowed**, including comments, explanations, or wrapping in triple backticks (e.g., ```json). Return **raw JSON text only** in the exact format specified below.
 
 **Required Keys**:
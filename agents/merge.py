@@ -14,6 +14,7 @@ Also, report the transformation rules applied in the final selected SQL.
 Input:
 - oracle_sql: The original Oracle SQL query.
 - candidates: A list of PostgreSQL SQL strings converted by different agents.
+- syntax_errors (optional): errors a PostgreSQL parser reported for "postgresql_sql"; fix them first.
 
 IMPORTANT: Respond ONLY with a JSON object containing the best merged/selected PostgreSQL SQL string and the applied transformations.
 Keys must be "postgresql_sql" and "transformations".
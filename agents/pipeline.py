@@ -1,4 +1,5 @@
 from core.app import fast_agent_instance
+from core.complexity import refinement_tiers, tier_agent_name
 from config.loader import load_sqlporter_config
 
 sqlporter_config = load_sqlporter_config()
@@ -13,3 +14,18 @@ settings = sqlporter_config.get("settings", {})
 )
 async def oracle_to_pg_pipeline(payload: dict):
     return payload
+
+def register_tier(tier):
+    @fast_agent_instance.evaluator_optimizer(
+        name=tier_agent_name(tier),
+        generator="merge_and_select",
+        evaluator="sql_evaluator",
+        min_rating=tier.get("min_rating", "GOOD"),
+        max_refinements=tier.get("max_refinements", 1)
+    )
+    async def tiered_pipeline(payload: dict):
+        return payload
+
+# Cheaper evaluator-optimizer variants for simpler statements (see core.complexity)
+for refinement_tier in refinement_tiers(settings):
+    register_tier(refinement_tier)
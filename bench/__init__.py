@@ -0,0 +1,6 @@
+"""
+Offline benchmark harness: runs the real conversion pipeline against a
+deterministic fake agent provider on a synthetic Oracle corpus.
+
+    python -m bench --files 200 --latency lognormal:0.05:0.5
+"""
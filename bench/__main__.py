@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+from bench.corpus import generate_corpus
+from bench.fake_agents import FakeAgentProvider, parse_latency
+from bench.harness import bench_config, run_benchmark
+from bench.metrics import compare, format_report, save_results
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLPorter-AI offline benchmark (fake agents, synthetic corpus)")
+    parser.add_argument("--files", type=int, default=50, help="Number of synthetic SQL files")
+    parser.add_argument("--statements", type=int, default=3, help="Statements per file")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2, help="Share of statements repeating an earlier shape")
+    parser.add_argument("--corpus", type=Path, help="Use this directory of .sql files instead of generating one")
+    parser.add_argument("--config", type=Path, help="Config file to benchmark (default: the sample config)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Files converted at the same time")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="Agent latency: <seconds>, fixed:<s>, uniform:<low>:<high> or lognormal:<median>:<sigma>")
+    parser.add_argument("--agent-latency", action="append", default=[], metavar="NAME=SPEC",
+                        help="Latency for one agent, e.g. oracle_to_pg_pipeline=lognormal:0.5:0.3")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of calls failing with a transport error")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of converter answers that are not JSON")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Simulated generation speed (0: instant)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Apply the config's rate limits to the fake agents")
+    parser.add_argument("--label", default="bench", help="Name prefix of the stored result file")
+    parser.add_argument("--results-dir", type=Path, default=Path("bench/results"), help="Where results are stored")
+    parser.add_argument("--baseline", type=Path, help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression against the baseline")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    provider = FakeAgentProvider(
+        latency=parse_latency(args.latency),
+        agent_latency={name: parse_latency(spec) for name, spec in (a.split("=", 1) for a in args.agent_latency)},
+        failure_rate=args.failure_rate,
+        malformed_rate=args.malformed_rate,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="sqlporter-bench-") as temp_dir:
+        work_dir = Path(temp_dir)
+        config = bench_config(work_dir, args.config, args.concurrency, args.keep_rate_limits)
+        if args.corpus:
+            config["paths"]["input_dir"] = str(args.corpus)
+        else:
+            generate_corpus(work_dir / "ASIS", args.files, args.statements, args.duplicate_ratio, args.seed)
+        results = asyncio.run(run_benchmark(config, provider))
+
+    results["parameters"] = {
+        k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+        if k not in ("results_dir", "baseline", "verbose")
+    }
+    rows, regressions = [], []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        rows, regressions = compare(results, baseline, args.tolerance)
+        results["baseline"] = str(args.baseline)
+        results["regressions"] = regressions
+
+    path = save_results(results, args.results_dir, args.label)
+    print(format_report(results, rows))
+    print(f"Results stored in {path}")
+    if regressions:
+        print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
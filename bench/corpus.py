@@ -0,0 +1,62 @@
+import random
+from pathlib import Path
+from typing import Dict, List
+
+TABLES = ["employees", "departments", "orders", "order_items", "customers", "invoices", "shipments", "products"]
+COLUMNS = ["id", "name", "status", "amount", "created_at", "region", "manager_id", "price", "qty", "note"]
+
+# Oracle statement shapes, from trivially rule-convertible to PL/SQL blocks.
+TEMPLATES = [
+    "SELECT NVL({c1}, {n}) FROM {t} WHERE {c2} = {n2};",
+    "SELECT {c1}, SYSDATE FROM {t} WHERE ROWNUM <= {n};",
+    "SELECT DECODE({c1}, {n}, 'A', {n2}, 'B', 'C') AS code, NVL({c2}, 'none') FROM {t};",
+    "SELECT a.{c1}, b.{c2} FROM {t} a, {t2} b WHERE a.id = b.{c3}(+) AND a.{c2} > {n};",
+    "SELECT TO_CHAR({c1}, 'YYYY-MM-DD'), NVL2({c2}, 1, 0) FROM {t} WHERE {c3} IS NOT NULL;",
+    "CREATE TABLE {t}_{n} ({c1} NUMBER(10) PRIMARY KEY, {c2} VARCHAR2({n2}) NOT NULL, {c3} DATE DEFAULT SYSDATE);",
+    "SELECT LEVEL, {c1} FROM {t} START WITH {c2} IS NULL CONNECT BY PRIOR id = {c2};",
+    "MERGE INTO {t} d USING {t2} s ON (d.id = s.id) WHEN MATCHED THEN UPDATE SET d.{c1} = s.{c1} "
+    "WHEN NOT MATCHED THEN INSERT (id, {c1}) VALUES (s.id, s.{c1});",
+    "UPDATE {t} SET {c1} = NVL({c1}, 0) + {n}, {c2} = SYSDATE WHERE {c3} = '{word}';",
+    "BEGIN\n  FOR r IN (SELECT {c1} FROM {t} WHERE {c2} = {n}) LOOP\n"
+    "    UPDATE {t2} SET {c3} = r.{c1} WHERE id = {n2};\n  END LOOP;\nEXCEPTION\n"
+    "  WHEN NO_DATA_FOUND THEN NULL;\nEND;",
+]
+
+def random_shape(rng: random.Random) -> Dict:
+    """A template with its tables and columns chosen; literals are filled in later."""
+    c1, c2, c3 = rng.sample(COLUMNS, 3)
+    t, t2 = rng.sample(TABLES, 2)
+    return {"template": rng.randrange(len(TEMPLATES)), "c1": c1, "c2": c2, "c3": c3, "t": t, "t2": t2}
+
+def render(shape: Dict, rng: random.Random) -> str:
+    values = {k: v for k, v in shape.items() if k != "template"}
+    return TEMPLATES[shape["template"]].format(
+        n=rng.randint(1, 500), n2=rng.randint(1, 500), word=rng.choice(["open", "closed", "pending"]), **values,
+    )
+
+def generate_corpus(target_dir: Path, files: int = 50, statements_per_file: int = 3,
+                    duplicate_ratio: float = 0.2, seed: int = 0) -> List[Path]:
+    """
+    Write `files` synthetic Oracle scripts under `target_dir` (spread over a
+    few subdirectories) and return their paths. Roughly `duplicate_ratio` of
+    the statements reuse an earlier statement's shape with new literals, so
+    deduplication is exercised as on real corpora. The same seed always
+    gives the same corpus.
+    """
+    rng = random.Random(seed)
+    shapes: List[Dict] = []
+    paths = []
+    for index in range(files):
+        statements = []
+        for _ in range(max(1, statements_per_file)):
+            if shapes and rng.random() < duplicate_ratio:
+                shape = rng.choice(shapes)
+            else:
+                shape = random_shape(rng)
+                shapes.append(shape)
+            statements.append(render(shape, rng))
+        path = target_dir / f"module_{index % 5}" / f"script_{index:05d}.sql"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n\n".join(statements) + "\n", encoding="utf-8")
+        paths.append(path)
+    return paths
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import random
+import re
+import zlib
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from core.complexity import PIPELINE_AGENT
+
+# Oracle -> PostgreSQL rewrites the fake converters apply, with the rule they report.
+FAKE_RULES = [
+    (re.compile(r"\bNVL\s*\(", re.IGNORECASE), "COALESCE(", {"from": "NVL", "to": "COALESCE", "context": "function"}),
+    (re.compile(r"\bSYSDATE\b", re.IGNORECASE), "CURRENT_TIMESTAMP",
+     {"from": "SYSDATE", "to": "CURRENT_TIMESTAMP", "context": "function"}),
+    (re.compile(r"\bVARCHAR2\b", re.IGNORECASE), "VARCHAR", {"from": "VARCHAR2", "to": "VARCHAR", "context": "data type"}),
+    (re.compile(r"\bNUMBER\b", re.IGNORECASE), "NUMERIC", {"from": "NUMBER", "to": "NUMERIC", "context": "data type"}),
+    (re.compile(r"\s+FROM\s+dual\b", re.IGNORECASE), "", {"from": "FROM dual", "to": "", "context": "dual table"}),
+]
+
+class FakeTransportError(ConnectionError):
+    """Injected transport failure."""
+
+def parse_latency(spec: str) -> Dict:
+    """
+    "fixed:0.05", "uniform:0.01:0.1" or "lognormal:<median>:<sigma>" as a
+    latency distribution dict; a bare number means fixed.
+    """
+    parts = spec.split(":")
+    if len(parts) == 1:
+        return {"distribution": "fixed", "value": float(parts[0])}
+    kind, values = parts[0], [float(v) for v in parts[1:]]
+    if kind == "fixed":
+        return {"distribution": "fixed", "value": values[0]}
+    if kind == "uniform":
+        return {"distribution": "uniform", "low": values[0], "high": values[1]}
+    if kind == "lognormal":
+        return {"distribution": "lognormal", "median": values[0], "sigma": values[1] if len(values) > 1 else 0.5}
+    raise ValueError(f"Unknown latency distribution '{kind}'")
+
+def sample_latency(rng: random.Random, latency: Dict) -> float:
+    kind = latency.get("distribution", "fixed")
+    if kind == "uniform":
+        return rng.uniform(latency["low"], latency["high"])
+    if kind == "lognormal":
+        return rng.lognormvariate(0.0, latency["sigma"]) * latency["median"]
+    return latency.get("value", 0.0)
+
+def fake_convert(oracle_sql: str) -> Dict:
+    sql, transformations = oracle_sql, []
+    for pattern, replacement, rule in FAKE_RULES:
+        sql, count = pattern.subn(replacement, sql)
+        if count:
+            transformations.append(rule)
+    return {"postgresql_sql": sql, "transformations": transformations}
+
+class FakeAgent:
+    """
+    Stand-in for one fast-agent agent. Answers converter, batch, merge,
+    refinement-pipeline and knowledge-manager requests with deterministic
+    output after a sampled latency, and injects transport failures and
+    malformed answers at the configured rates.
+    """
+
+    def __init__(self, name: str, provider: "FakeAgentProvider"):
+        self.name = name
+        self.provider = provider
+        self.instruction = f"fake {name}"
+        self.refinement_history: List[Dict] = []
+
+    async def send(self, payload: Any) -> str:
+        provider = self.provider
+        text = payload if isinstance(payload, str) else json.dumps(payload, sort_keys=True, default=str)
+        rng = provider.rng_for(self.name, text)
+        answer = self._answer(payload if isinstance(payload, dict) else {}, rng)
+        delay = sample_latency(rng, provider.latency_for(self.name))
+        if provider.tokens_per_second:
+            delay += (len(answer) // 4 + 1) / provider.tokens_per_second
+        await asyncio.sleep(delay)
+        provider.record(self.name, delay)
+
+        if rng.random() < provider.failure_rate:
+            provider.injected["transport"] += 1
+            raise FakeTransportError(f"fake transport failure from {self.name}")
+        if self._is_converter(payload) and rng.random() < provider.malformed_rate:
+            provider.injected["malformed"] += 1
+            return "Sorry, I could not produce JSON for this one."
+        return answer
+
+    def _is_converter(self, payload: Any) -> bool:
+        return isinstance(payload, dict) and "candidates" not in payload \
+            and self.name != "knowledge_manager" and not self.name.startswith(PIPELINE_AGENT)
+
+    def _answer(self, payload: Dict, rng: random.Random) -> str:
+        if self.name == "knowledge_manager":
+            return json.dumps({"cleaned_rules": payload.get("rules", []), "removed_count": 0})
+        if self.name.startswith(PIPELINE_AGENT):
+            rounds = rng.randint(0, self.provider.max_refinements)
+            self.refinement_history = [{"attempt": i + 1} for i in range(rounds)]
+            return json.dumps({"postgresql_sql": payload.get("postgresql_sql", ""), "transformations": [],
+                               "RATING": "EXCELLENT" if rounds == 0 else "GOOD"})
+        if "candidates" in payload:
+            return json.dumps(fake_convert(payload["candidates"][0] if payload["candidates"] else ""))
+        if "batch" in payload:
+            return json.dumps([{"id": item["id"], **fake_convert(item["oracle_sql"])} for item in payload["batch"]])
+        return json.dumps(fake_convert(payload.get("oracle_sql", "")))
+
+class FakeAgentProvider(dict):
+    """
+    Agent map in the shape `fast_agent_instance.run()` yields: `provider[name]`
+    returns a FakeAgent, created on first use. `run()` can replace
+    `fast_agent_instance.run` to drive main.py without models.
+    """
+
+    def __init__(self, latency: Optional[Dict] = None, agent_latency: Optional[Dict[str, Dict]] = None,
+                 failure_rate: float = 0.0, malformed_rate: float = 0.0, tokens_per_second: float = 0.0,
+                 max_refinements: int = 1, seed: int = 0):
+        super().__init__()
+        self.latency = latency or {"distribution": "fixed", "value": 0.0}
+        self.agent_latency = agent_latency or {}
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.tokens_per_second = tokens_per_second
+        self.max_refinements = max_refinements
+        self.seed = seed
+        self.calls: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.injected = {"transport": 0, "malformed": 0}
+        self._attempts: Dict[int, int] = {}
+
+    def __missing__(self, name: str) -> FakeAgent:
+        agent = self[name] = FakeAgent(name, self)
+        return agent
+
+    def latency_for(self, name: str) -> Dict:
+        return self.agent_latency.get(name, self.latency)
+
+    def rng_for(self, name: str, text: str) -> random.Random:
+        """Seeded per agent, request and repeat, so a retried request can succeed."""
+        key = zlib.crc32(f"{self.seed}:{name}:{text}".encode("utf-8"))
+        repeat = self._attempts[key] = self._attempts.get(key, 0) + 1
+        return random.Random(key * 1000003 + repeat)
+
+    def record(self, name: str, seconds: float):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.latencies.append(seconds)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @asynccontextmanager
+    async def run(self):
+        yield self
@@ -0,0 +1,104 @@
+import copy
+import platform
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+from bench.fake_agents import FakeAgentProvider
+from bench.metrics import latency_summary
+from config.loader import SAMPLE_CONFIG
+from core.conversion import convert_file
+from core.dedup import get_deduper
+from core.file_io import get_sql_files
+from core.knowledge_store import flush_knowledge_stores
+from core.scheduler import run_bounded
+from core.telemetry import close_telemetry
+
+def bench_config(work_dir: Path, config_path: Optional[Path] = None, concurrency: int = 4,
+                 keep_rate_limits: bool = False) -> Dict:
+    """
+    The sqlporter config for a benchmark run: the given config file (or the
+    sample config) with every path, knowledge store and cache moved into
+    `work_dir`, so each run starts cold and leaves the real ones untouched.
+    """
+    if config_path is not None:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)["sqlporter"]
+    else:
+        config = copy.deepcopy(SAMPLE_CONFIG["sqlporter"])
+    config["paths"] = {
+        "input_dir": str(work_dir / "ASIS"),
+        "output_dir": str(work_dir / "TOBE"),
+        "report_dir": str(work_dir / "reports"),
+    }
+    settings = config.setdefault("settings", {})
+    settings["max_concurrent_files"] = concurrency
+    settings["progress_interval"] = 3600
+    knowledge = settings.setdefault("knowledge", {})
+    knowledge["path"] = str(work_dir / "knowledge" / "transformations.db")
+    knowledge["json_path"] = str(work_dir / "knowledge" / "transformations.json")
+    settings.setdefault("retrieval", {})["examples_path"] = str(work_dir / "knowledge" / "conversions.jsonl")
+    settings.setdefault("cache", {})["dir"] = str(work_dir / "cache")
+    settings["telemetry"] = {"enabled": True, "path": str(work_dir / "reports" / "telemetry.jsonl")}
+    if not keep_rate_limits:
+        settings["rate_limits"] = {}    # limits are for real providers; the fake one has none
+    return config
+
+async def run_benchmark(config: Dict, provider: FakeAgentProvider) -> Dict:
+    """
+    Convert every file under config.paths.input_dir through the real
+    per-file pipeline (core.conversion.convert_file) against `provider`
+    and return the run's metrics.
+    """
+    paths = config["paths"]
+    input_dir, output_dir = Path(paths["input_dir"]), Path(paths["output_dir"])
+    settings = config.get("settings", {})
+    file_latencies = []
+    statuses: Counter = Counter()
+    statements = 0
+    knowledge_lookup_seconds = 0.0
+
+    async def timed_convert(sql_path: Path) -> Dict:
+        started = time.monotonic()
+        entry = await convert_file(agent, config, sql_path, input_dir, output_dir)
+        file_latencies.append(time.monotonic() - started)
+        return entry
+
+    started = time.monotonic()
+    async with provider.run() as agent:
+        sql_files = get_sql_files(input_dir, settings.get("discovery", {}))
+        async for _, entry in run_bounded(sql_files, timed_convert, settings.get("max_concurrent_files", 1)):
+            statuses[entry.get("status", "error")] += 1
+            statements += len(entry.get("statements", [])) or 1
+            knowledge_lookup_seconds += entry.get("telemetry", {}).get("knowledge_seconds", 0.0)
+        deduper = get_deduper(config)
+        dedup_ratio = round(deduper.ratio, 4) if deduper else 0.0
+    wall = time.monotonic() - started
+
+    flush_started = time.monotonic()
+    flush_knowledge_stores()
+    knowledge_flush_seconds = time.monotonic() - flush_started
+    close_telemetry()
+
+    files = len(file_latencies)
+    return {
+        "files": files,
+        "statements": statements,
+        "wall_seconds": round(wall, 4),
+        "files_per_sec": round(files / wall, 4) if wall else 0.0,
+        "file_latency": latency_summary(file_latencies),
+        "call_latency": latency_summary(provider.latencies),
+        "llm_calls": provider.total_calls,
+        "llm_calls_per_file": round(provider.total_calls / files, 4) if files else 0.0,
+        "calls_by_agent": dict(sorted(provider.calls.items())),
+        "knowledge_lookup_seconds": round(knowledge_lookup_seconds, 6),
+        "knowledge_flush_seconds": round(knowledge_flush_seconds, 6),
+        "knowledge_io_seconds": round(knowledge_lookup_seconds + knowledge_flush_seconds, 6),
+        "dedup_ratio": dedup_ratio,
+        "statuses": dict(statuses),
+        "injected": dict(provider.injected),
+        "python": platform.python_version(),
+    }
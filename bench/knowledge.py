@@ -0,0 +1,152 @@
+import argparse
+import gc
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bench.metrics import format_value, save_results
+from core.knowledge import load_transformations, save_transformations
+from core.knowledge_store import CachedKnowledgeStore, SqliteKnowledgeStore, relevant_rules
+from core.prompt import build_payload
+
+FUNCTION_WORDS = ["NVL", "DECODE", "TO_CHAR", "TO_DATE", "SUBSTR", "INSTR", "TRUNC", "ADD_MONTHS", "LISTAGG"]
+
+# Budgets as (fixed, per rule); a size's budget is fixed + per_rule * rules.
+# Timings are seconds, memory is bytes. Lookups should not grow with the tree.
+BUDGETS = {
+    "load_seconds": (0.05, 20e-6),
+    "save_seconds": (0.05, 40e-6),
+    "incremental_save_seconds": (0.05, 40e-6),
+    "sqlite_upsert_seconds": (0.1, 60e-6),
+    "cache_load_seconds": (0.05, 20e-6),
+    "matcher_build_seconds": (0.05, 30e-6),
+    "lookup_seconds": (0.002, 0.0),
+    "payload_seconds": (0.001, 0.0),
+    "sqlite_lookup_seconds": (0.002, 0.0),
+    "load_memory_bytes": (1_000_000, 2_000),
+}
+
+def generate_rules(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """`count` distinct rules over about count/2 keys: single words and two-token patterns like `FN (`."""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        key_id = i // 2
+        key = f"ORA_FN_{key_id}" if key_id % 3 else f"{rng.choice(FUNCTION_WORDS)}_{key_id} ("
+        rules.append({
+            "from": key,
+            "to": f"pg_fn_{key_id}_{i % 2}(",
+            "context": rng.choice(["function call", "data type", "expression"]),
+            "example": f"{key.rstrip(' (')}(col_{i % 7})",
+        })
+    return rules
+
+def sample_statements(rules: List[Dict[str, str]], count: int = 50, seed: int = 0) -> List[str]:
+    """SQL statements that each use a few known keys next to ordinary identifiers."""
+    rng = random.Random(seed)
+    statements = []
+    for _ in range(count):
+        keys = [rng.choice(rules)["from"].rstrip(" (") for _ in range(3)]
+        statements.append(
+            f"SELECT {keys[0]}(a, 0), {keys[1]}(b), c FROM orders o WHERE {keys[2]}(o.created_at) > :cutoff"
+        )
+    return statements
+
+def _timed(fn: Callable) -> Tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+def _per_call(fn: Callable, inputs: List) -> float:
+    started = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    return (time.perf_counter() - started) / max(1, len(inputs))
+
+def measure(rule_count: int, work_dir: Path, seed: int = 0) -> Dict:
+    """
+    Time and size the knowledge operations for a tree of `rule_count` rules:
+    the JSON file backend, then the default SQLite backend behind the
+    in-memory cache, looked up the way converter prompts are built.
+    """
+    rules = generate_rules(rule_count, seed)
+    statements = sample_statements(rules, seed=seed)
+    json_path = work_dir / f"transformations_{rule_count}.json"
+    results: Dict = {"rules": rule_count}
+
+    results["save_seconds"], _ = _timed(lambda: save_transformations(rules, json_path))
+    results["file_bytes"] = json_path.stat().st_size
+    new_rules = generate_rules(10, seed + 1)
+    for rule in new_rules:
+        rule["from"] = "NEW_" + rule["from"]
+    results["incremental_save_seconds"], _ = _timed(lambda: save_transformations(new_rules, json_path))
+    gc.collect()
+    results["load_seconds"], _ = _timed(lambda: load_transformations(json_path))
+    results["load_memory_bytes"] = _peak_memory(lambda: load_transformations(json_path))
+
+    sqlite = SqliteKnowledgeStore(work_dir / f"transformations_{rule_count}.db", json_path=None)
+    results["sqlite_upsert_seconds"], _ = _timed(lambda: sqlite.upsert(rules))
+    results["cache_load_seconds"], store = _timed(lambda: CachedKnowledgeStore(sqlite, flush_interval=3600))
+    results["keys"] = len(store.keys())
+    results["matcher_build_seconds"], matcher = _timed(store.matcher)
+
+    # The production path: runner.collect_relevant_rules, then core.prompt.build_payload.
+    results["lookup_seconds"] = _per_call(lambda sql: relevant_rules(store, sql), statements)
+    contexts = [(sql, {"known_transformations": relevant_rules(store, sql)}) for sql in statements]
+    results["payload_seconds"] = _per_call(lambda item: build_payload(item[0], item[1], 2000), contexts)
+    keys = [matcher.keys_in(sql) for sql in statements]
+    results["sqlite_lookup_seconds"] = _per_call(sqlite.lookup, keys)
+    store.close()
+    return {k: round(v, 6) if isinstance(v, float) else v for k, v in results.items()}
+
+def _peak_memory(fn: Callable) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def budget(metric: str, rule_count: int) -> float:
+    fixed, per_rule = BUDGETS[metric]
+    return fixed + per_rule * rule_count
+
+def check_budgets(results: Dict, scale: float = 1.0) -> List[str]:
+    """Metrics over budget (each budget multiplied by `scale`), as readable messages."""
+    violations = []
+    for metric in BUDGETS:
+        limit = budget(metric, results["rules"]) * scale
+        if results.get(metric, 0) > limit:
+            violations.append(f"{results['rules']} rules: {metric} = {format_value(results[metric])} "
+                              f"> budget {format_value(limit)}")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge subsystem scaling benchmark (1k-1M rules)")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated rule counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply every budget (slow machines)")
+    parser.add_argument("--results-dir", type=Path, default=Path("bench/results"))
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="sqlporter-knowledge-bench-") as temp_dir:
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            result = measure(size, Path(temp_dir), args.seed)
+            runs.append(result)
+            print("  ".join(f"{k}={format_value(v)}" for k, v in result.items()))
+
+    violations = [v for run in runs for v in check_budgets(run, args.budget_scale)]
+    path = save_results({"knowledge": runs, "violations": violations}, args.results_dir, "knowledge")
+    print(f"Results stored in {path}")
+    if violations:
+        print("Over budget:\n  " + "\n  ".join(violations), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Metrics compared against a baseline, and whether higher or lower is better.
+TRACKED_METRICS = {
+    "files_per_sec": "higher",
+    "file_latency.p50": "lower",
+    "file_latency.p95": "lower",
+    "file_latency.p99": "lower",
+    "llm_calls_per_file": "lower",
+    "knowledge_io_seconds": "lower",
+}
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def latency_summary(values: Sequence[float]) -> Dict[str, float]:
+    return {f"p{q}": round(percentile(values, q), 6) for q in (50, 95, 99)}
+
+def lookup(results: Dict, dotted: str) -> Optional[float]:
+    value = results
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def save_results(results: Dict, directory: Path, label: str = "") -> Path:
+    """Store one run as <directory>/<label>-<timestamp>.json and as latest.json."""
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    path = directory / f"{label or 'bench'}-{stamp}.json"
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    path.write_text(text, encoding="utf-8")
+    (directory / "latest.json").write_text(text, encoding="utf-8")
+    return path
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.1) -> Tuple[List[Dict], List[str]]:
+    """
+    Compare tracked metrics with a stored baseline run. Returns one row per
+    metric and the names of metrics that got worse by more than `tolerance`
+    (a fraction of the baseline value).
+    """
+    rows, regressions = [], []
+    for name, better in TRACKED_METRICS.items():
+        now, before = lookup(current, name), lookup(baseline, name)
+        if now is None or before is None:
+            continue
+        change = (now - before) / before if before else 0.0
+        worse = change < -tolerance if better == "higher" else change > tolerance
+        rows.append({"metric": name, "baseline": before, "current": now, "change": round(change, 4), "regressed": worse})
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+def format_value(value) -> str:
+    return f"{value:.6f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+
+def format_report(results: Dict, rows: Optional[List[Dict]] = None) -> str:
+    lines = [
+        f"files: {results['files']}  statements: {results['statements']}  wall: {results['wall_seconds']:.2f}s",
+        f"throughput: {results['files_per_sec']:.2f} files/sec",
+        "file latency: " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in results["file_latency"].items()),
+        "agent call latency: " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in results["call_latency"].items()),
+        f"LLM calls/file: {results['llm_calls_per_file']:.2f}  ({results['llm_calls']} total, "
+        f"injected failures {results['injected']['transport']}, malformed {results['injected']['malformed']})",
+        f"knowledge I/O: {results['knowledge_io_seconds'] * 1000:.1f}ms "
+        f"(lookups {results['knowledge_lookup_seconds'] * 1000:.1f}ms, flush {results['knowledge_flush_seconds'] * 1000:.1f}ms)",
+        "statuses: " + ", ".join(f"{k}={v}" for k, v in sorted(results["statuses"].items())),
+    ]
+    for row in rows or []:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        lines.append(f"  {row['metric']}: {row['baseline']} -> {row['current']} ({row['change']:+.1%}){flag}")
+    return "\n".join(lines)
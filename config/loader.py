@@ -37,7 +37,97 @@ SAMPLE_CONFIG = {
             "max_refinements": 3,
             "min_rating": "EXCELLENT",
             "retry_limit": 3,
-            "comment_prefix": "--"
+            "comment_prefix": "--",
+            "max_concurrent_files": 4,
+            "progress_interval": 10,
+            "discovery": {
+                "mode": "sorted",
+                "include": ["*.sql"],
+                "exclude": [],
+                "min_size": 0,
+                "max_size": None
+            },
+            "split_statements": True,
+            "max_concurrent_statements": 4,
+            "dedup_statements": True,
+            "rate_limits": {
+                "generic": {"max_concurrency": 1},
+                "openai": {"max_concurrency": 8, "requests_per_minute": 500}
+            },
+            "knowledge": {
+                "backend": "sqlite",
+                "path": "./knowledge/transformations.db",
+                "json_path": "./knowledge/transformations.json",
+                "in_memory": True,
+                "flush_interval": 5.0
+            },
+            "retrieval": {
+                "enabled": True,
+                "top_k_rules": 20,
+                "top_k_examples": 2,
+                "min_similarity": 0.2,
+                "token_budget": 1500,
+                "examples_path": "./knowledge/conversions.jsonl"
+            },
+            "refinement": {
+                "enabled": True,
+                "skip_below": 3,
+                "tiers": [
+                    {"name": "light", "max_score": 12, "min_rating": "GOOD", "max_refinements": 1}
+                ]
+            },
+            "validation": {
+                "enabled": True,
+                "max_fix_attempts": 1,
+                "fix_agent": "",
+                "short_circuit_below": 8,
+                "trust_lexical": False
+            },
+            "retry": {
+                "transport": {"attempts": 3, "base_delay": 1.0, "max_delay": 30.0},
+                "rate_limit": {"attempts": 5, "base_delay": 2.0, "max_delay": 60.0},
+                "malformed": {"attempts": 2, "base_delay": 0.0, "max_delay": 0.0},
+                "empty_sql": {"attempts": 1, "base_delay": 0.5, "max_delay": 2.0},
+                "circuit_breaker": {"failure_threshold": 5, "cooldown": 60}
+            },
+            "timeouts": {
+                "default": 600,
+                "agents": {"oracle_to_pg_pipeline": 1800}
+            },
+            "hedging": {
+                "enabled": True,
+                "percentile": 95,
+                "min_samples": 20,
+                "min_delay": 1.0,
+                "fallback": {}
+            },
+            "consensus": {
+                "enabled": True,
+                "quorum": 2
+            },
+            "telemetry": {
+                "enabled": True,
+                "path": ""
+            },
+            "batching": {
+                "enabled": False,
+                "max_statement_tokens": 300,
+                "max_wait": 0.05
+            },
+            "deterministic": {
+                "enabled": True,
+                "use_knowledge": False
+            },
+            "prompt": {
+                "budget_ratio": 0.4,
+                "budgets": {}
+            },
+            "cache": {
+                "enabled": True,
+                "dir": "./cache",
+                "max_size_mb": 256,
+                "stages": True
+            }
         }
     }
 }
@@ -66,6 +156,9 @@ def load_sqlporter_config(path: Path = DEFAULT_CONFIG_PATH) -> dict:
                 sys.exit(1)
 
             sqlporter_config = config["sqlporter"]
+            # Agents without a `models` entry run on fast-agent's default model
+            if config.get("default_model"):
+                sqlporter_config.setdefault("default_model", config["default_model"])
             
             # Path validation
             paths = sqlporter_config.get("paths", {})
@@ -1,6 +1,6 @@
 from mcp_agent.core.fastagent import FastAgent
 
 # Central FastAgent instance for the application
-fast_agent_instance = FastAgent("SQLPorter-AI")
+fast_agent_instance = FastAgent("SQLPorter-AI", ignore_unknown_args=True)
 
 # Additional app-level setup can go here if needed
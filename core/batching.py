@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.json_repair import extract_json_array
+from core.prompt import estimate_tokens
+from core.retry import MALFORMED, classify_error
+
+logger = logging.getLogger(__name__)
+
+class StatementBatcher:
+    """
+    Packs short statements bound for one converter into a single request.
+
+    Callers `submit` a converter payload and wait. Pending items are sent as
+    one {"known_transformations", "examples", "batch": [{id, oracle_sql}]}
+    request when adding another would exceed `token_budget`, or `max_wait`
+    seconds after the first item arrived. The converter answers with a JSON
+    array of {id, postgresql_sql, transformations}. An unusable answer splits
+    the batch in halves and re-sends them; items still missing in the end
+    resolve to None so the caller converts them on their own. A failed call
+    (transport error, rate limit) is not split: every item resolves to None
+    at once and takes the caller's retry path, with its backoff and breaker.
+    """
+
+    def __init__(self, send: Callable[[Dict], Awaitable[Any]], agent_name: str,
+                 token_budget: int, max_wait: float = 0.05):
+        self.send = send
+        self.agent_name = agent_name
+        self.token_budget = token_budget
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Dict, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+        self._next_id = 0
+        self.requests = 0
+        self.batched = 0
+        self.fallbacks = 0
+
+    async def submit(self, payload: Dict) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        self._next_id += 1
+        item = {"id": self._next_id, **payload}
+        cost = estimate_tokens(json.dumps(item, ensure_ascii=False))
+        if self._pending and self._pending_tokens + cost > self.token_budget:
+            self._flush()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self._pending_tokens += cost
+        if self._pending_tokens >= self.token_budget:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    @staticmethod
+    def _request(batch: List[Tuple[Dict, asyncio.Future]]) -> Dict:
+        """Shared knowledge once for the whole batch, then the statements."""
+        rules, examples = {}, {}
+        for item, _ in batch:
+            for rule in item.get("known_transformations", []):
+                rules.setdefault((rule.get("from"), rule.get("to"), rule.get("context")), rule)
+            for example in item.get("examples", []):
+                examples.setdefault(example["oracle_sql"], example)
+        request = {
+            "known_transformations": list(rules.values()),
+            "batch": [{"id": item["id"], "oracle_sql": item["oracle_sql"]} for item, _ in batch],
+        }
+        if examples:
+            request["examples"] = list(examples.values())
+        return request
+
+    def _parse(self, response: Any) -> Dict[int, Dict]:
+        if isinstance(response, list):
+            items = response
+        else:
+            items, _ = extract_json_array(response if isinstance(response, str) else str(response))
+        results = {}
+        for entry in items or []:
+            if isinstance(entry, dict) and entry.get("postgresql_sql") and "id" in entry:
+                try:
+                    results[int(entry["id"])] = entry
+                except (TypeError, ValueError):
+                    continue
+        return results
+
+    async def _send_batch(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        if len(batch) == 1:
+            # Nothing to share; the caller's normal path handles a single statement.
+            self._resolve(batch[0][1], None)
+            return
+        self.requests += 1
+        try:
+            results = self._parse(await self.send(self._request(batch)))
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class != MALFORMED:
+                # Splitting would multiply requests against a failing or throttled model.
+                logger.warning(f"[{self.agent_name}] batch of {len(batch)} failed ({error_class}): {e}; "
+                               f"converting its statements individually.")
+                self.fallbacks += len(batch)
+                for _, future in batch:
+                    self._resolve(future, None)
+                return
+            results = {}
+
+        if not results:
+            middle = len(batch) // 2
+            logger.info(f"[{self.agent_name}] unusable batch answer; splitting {len(batch)} statements.")
+            await asyncio.gather(self._send_batch(batch[:middle]), self._send_batch(batch[middle:]))
+            return
+
+        for item, future in batch:
+            result = results.get(item["id"])
+            if result is None:
+                logger.info(f"[{self.agent_name}] statement {item['id']} missing from batch answer; re-queued alone.")
+                self.fallbacks += 1
+            else:
+                self.batched += 1
+                result = {k: v for k, v in result.items() if k != "id"}
+                result.setdefault("transformations", [])
+                result["agent_name"] = self.agent_name
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Optional[Dict]):
+        if not future.done():
+            future.set_result(result)
+
+def batchable(config: Dict, payload: Dict) -> bool:
+    """Whether a converter payload is short enough to share a request (settings.batching)."""
+    batching = config.get("settings", {}).get("batching", {})
+    if not batching.get("enabled", False) or "repair_instruction" in payload:
+        return False
+    return estimate_tokens(payload.get("oracle_sql", "")) <= batching.get("max_statement_tokens", 300)
+
+_batchers: Dict[str, StatementBatcher] = {}
+_batchers_loop_id = None
+
+def get_batcher(config: Dict, agent_name: str, send: Callable[[Dict], Awaitable[Any]],
+                token_budget: int) -> Optional[StatementBatcher]:
+    """The run-wide batcher for a converter (one per event loop), or None if batching is off."""
+    global _batchers, _batchers_loop_id
+    batching = config.get("settings", {}).get("batching", {})
+    if not batching.get("enabled", False):
+        return None
+    loop_id = id(asyncio.get_running_loop())
+    if loop_id != _batchers_loop_id:
+        _batchers, _batchers_loop_id = {}, loop_id
+    if agent_name not in _batchers:
+        _batchers[agent_name] = StatementBatcher(
+            send, agent_name,
+            token_budget=batching.get("token_budget") or token_budget,
+            max_wait=batching.get("max_wait", 0.05),
+        )
+    return _batchers[agent_name]
+
+def batch_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        name: {"requests": b.requests, "statements": b.batched, "fallbacks": b.fallbacks}
+        for name, b in _batchers.items() if b.requests
+    }
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.sql_lexer import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path("./cache")
+DEFAULT_MAX_SIZE_MB = 256
+
+# Bump when the shape of cached payloads or keys changes so stale entries stop matching.
+CACHE_FORMAT_VERSION = "3"
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace between tokens so formatting-only edits hit the cache.
+    Literals and comments are kept as they are, and the line break after a
+    `--` comment is kept so the code after it is not folded into the comment.
+    """
+    parts = []
+    for token in tokenize(sql):
+        if token.kind != "ws":
+            parts.append(token.text)
+        elif parts and parts[-1].startswith("--"):
+            parts.append("\n")
+        elif parts:
+            parts.append(" ")
+    return "".join(parts).strip().rstrip(";").strip()
+
+def hash_payload(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serialisable parts."""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# Settings that change what the pipeline returns for the same SQL and prompt.
+RESULT_SETTINGS = ("prompt", "min_rating", "max_refinements", "refinement", "validation", "deterministic", "consensus")
+
+def make_result_key(oracle_sql: str, config: Dict, prompt_context: Any) -> str:
+    """
+    Key a whole-pipeline result on the SQL, the agent setup, the settings in
+    RESULT_SETTINGS and the knowledge given to the converters.
+    Few-shot examples are left out: every success adds one, so keying on them
+    would miss on the first rerun of each statement.
+    """
+    if isinstance(prompt_context, dict):
+        prompt_context = {k: v for k, v in prompt_context.items() if k != "examples"}
+    settings = config.get("settings", {})
+    return hash_payload(
+        CACHE_FORMAT_VERSION,
+        normalize_sql(oracle_sql),
+        config.get("models", {}),
+        config.get("default_model", ""),
+        config.get("instructions", {}),
+        prompt_context,
+        {name: settings.get(name) for name in RESULT_SETTINGS},
+    )
+
+def make_stage_key(agent_name: str, model: str, instruction: str, payload: Any, *extras: Any) -> str:
+    """Key a single agent call on who answers it and exactly what it is asked."""
+    instruction_hash = hashlib.sha256((instruction or "").encode("utf-8")).hexdigest()
+    return hash_payload(CACHE_FORMAT_VERSION, agent_name, model, instruction_hash, payload, extras)
+
+class ResultCache:
+    """
+    SQLite-backed key/value cache for JSON payloads with size-bounded LRU eviction.
+    Entries live in named tables so several cache layers can share one database file.
+    """
+
+    def __init__(self, db_path: Path, max_bytes: int, table: str = "results"):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.table = table
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table}(last_access)")
+        self._conn.commit()
+        row = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()
+        self._total_bytes = row[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._conn.execute(f"SELECT payload FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logger.warning(f"Cache read failed ({self.table}): {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key: str, payload: Any):
+        try:
+            data = json.dumps(payload, ensure_ascii=False)
+            size = len(data.encode("utf-8"))
+            old = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Cache write failed ({self.table}): {e}")
+
+    def _evict(self):
+        """Drop least recently used entries until the table fits in `max_bytes`."""
+        evicted = 0
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+        if evicted:
+            logger.debug(f"Evicted {evicted} cache entr(y/ies) from {self.table}.")
+
+    def close(self):
+        self._conn.close()
+
+_caches: Dict[tuple, ResultCache] = {}
+
+def get_cache(config: Dict, table: str = "results") -> Optional[ResultCache]:
+    """Return the shared cache for `table`, or None when caching is disabled in config."""
+    cache_config = config.get("settings", {}).get("cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+
+    db_path = Path(cache_config.get("dir", DEFAULT_CACHE_DIR)) / "sqlporter_cache.db"
+    max_bytes = int(float(cache_config.get("max_size_mb", DEFAULT_MAX_SIZE_MB)) * 1024 * 1024)
+    cache_id = (str(db_path.resolve()), table)
+    if cache_id not in _caches:
+        try:
+            _caches[cache_id] = ResultCache(db_path, max_bytes, table)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open cache at {db_path}: {e}", exc_info=True)
+            return None
+    return _caches[cache_id]
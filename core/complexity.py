@@ -0,0 +1,69 @@
+import logging
+from typing import Dict, List
+
+from core.rewriter import oracle_constructs
+from core.sql_lexer import significant_tokens
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_AGENT = "oracle_to_pg_pipeline"
+SKIP_TIER = "skip"
+STANDARD_TIER = "standard"
+
+PLSQL_WORDS = {
+    "BEGIN", "DECLARE", "EXCEPTION", "LOOP", "CURSOR", "PROCEDURE", "FUNCTION", "TRIGGER",
+    "PACKAGE", "PRAGMA", "EXECUTE", "BULK", "FORALL", "RAISE", "ELSIF",
+}
+
+# Tiers below the standard pipeline, cheapest first. Statements scoring above
+# every tier's max_score use the standard oracle_to_pg_pipeline settings.
+DEFAULT_TIERS = [
+    {"name": "light", "max_score": 12, "min_rating": "GOOD", "max_refinements": 1},
+]
+
+def complexity_score(sql: str) -> int:
+    """
+    Rough conversion difficulty: one point per 40 significant tokens, three per
+    distinct Oracle-only construct and five per PL/SQL keyword occurrence.
+    """
+    tokens = list(significant_tokens(sql))
+    plsql = sum(1 for t in tokens if t.kind == "word" and t.text.upper() in PLSQL_WORDS)
+    return len(tokens) // 40 + 3 * len(oracle_constructs(sql)) + 5 * plsql
+
+def refinement_tiers(settings: Dict) -> List[Dict]:
+    return settings.get("refinement", {}).get("tiers", DEFAULT_TIERS)
+
+def tier_agent_name(tier: Dict) -> str:
+    return f"{PIPELINE_AGENT}_{tier['name']}"
+
+def evaluator_settings(config: Dict, agent_name: str) -> Dict | None:
+    """
+    The min_rating/max_refinements an evaluator-optimizer agent is registered
+    with (see agents/pipeline.py), or None for any other agent.
+    """
+    settings = config.get("settings", {})
+    if agent_name == PIPELINE_AGENT:
+        return {"min_rating": settings.get("min_rating", "EXCELLENT"), "max_refinements": settings.get("max_refinements", 3)}
+    for tier in refinement_tiers(settings):
+        if agent_name == tier_agent_name(tier):
+            return {"min_rating": tier.get("min_rating", "GOOD"), "max_refinements": tier.get("max_refinements", 1)}
+    return None
+
+def choose_refinement(sql: str, config: Dict) -> Dict:
+    """
+    Pick the evaluator-optimizer budget for a statement from its complexity
+    score (settings.refinement): "skip" below skip_below, else the first tier
+    whose max_score it does not exceed, else the standard pipeline.
+    Returns {"tier", "complexity", "agent"}; agent is None when skipping.
+    """
+    settings = config.get("settings", {})
+    refinement_config = settings.get("refinement", {})
+    score = complexity_score(sql)
+    if not refinement_config.get("enabled", True):
+        return {"tier": STANDARD_TIER, "complexity": score, "agent": PIPELINE_AGENT}
+    if score < refinement_config.get("skip_below", 3):
+        return {"tier": SKIP_TIER, "complexity": score, "agent": None}
+    for tier in refinement_tiers(settings):
+        if score <= tier["max_score"]:
+            return {"tier": tier["name"], "complexity": score, "agent": tier_agent_name(tier)}
+    return {"tier": STANDARD_TIER, "complexity": score, "agent": PIPELINE_AGENT}
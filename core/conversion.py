@@ -0,0 +1,81 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+from core.file_io import format_unconverted_statement, read_sql_file, write_sql_with_comment
+from core.runner import run_split_sql
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_REPORT_KEYS = ("index", "status", "error", "rating", "refinement", "complexity", "validation")
+
+def file_status(result_payload: Dict) -> str:
+    final_sql = result_payload.get("postgresql_sql", "")
+    statements = result_payload.get("statements", [])
+    if result_payload.get("cached"):
+        return "cached"
+    if result_payload.get("deduplicated"):
+        return "deduplicated"
+    if result_payload.get("deterministic"):
+        return "deterministic"
+    if statements and final_sql and any(not s["postgresql_sql"] for s in statements):
+        return "partial"
+    return "success" if final_sql else "incomplete"
+
+def report_entry(result_payload: Dict) -> Dict:
+    """The result_summary.json entry for one converted file."""
+    entry = {
+        "status": file_status(result_payload),
+        "error": result_payload.get("error", ""),
+        "rating": result_payload.get("RATING", ""),
+        "feedback": result_payload.get("FEEDBACK", ""),
+        "queue_wait": result_payload.get("queue_wait", 0.0),
+        "rules_dropped": result_payload.get("rules_dropped", 0)
+    }
+    if result_payload.get("refinement"):
+        entry["refinement"] = result_payload["refinement"]
+        entry["complexity"] = result_payload.get("complexity")
+        entry["validation"] = result_payload.get("validation", "")
+    if result_payload.get("telemetry"):
+        entry["telemetry"] = result_payload["telemetry"]
+    statements = result_payload.get("statements", [])
+    if statements:
+        entry["statements"] = [{k: s[k] for k in STATEMENT_REPORT_KEYS} for s in statements]
+    return entry
+
+async def convert_file(agent: Any, config: Dict, sql_path: Path, input_dir: Path, output_dir: Path) -> Dict:
+    """
+    Convert one input file end to end: read it, run its statements through
+    the pipeline, write the _ported.sql output and return its report entry.
+    Failures are reported as {"status": "error", "message": ...} entries.
+    """
+    prefix = config.get("settings", {}).get("comment_prefix", "--")
+    logger.info(f"Processing file: {sql_path.name}")
+    try:
+        oracle_sql = read_sql_file(sql_path)
+        result_payload = await run_split_sql(agent, config, oracle_sql, sql_path.name)
+
+        final_sql = result_payload.get("postgresql_sql", "")
+        statements = result_payload.get("statements", [])
+        comment = f"Converted from: {sql_path.name}"
+        if statements:
+            chunks = [
+                s["postgresql_sql"] or format_unconverted_statement(s["oracle_sql"], s["error"], prefix)
+                for s in statements
+            ]
+            write_sql_with_comment(output_dir, input_dir, sql_path, chunks, comment, prefix)
+        else:
+            write_sql_with_comment(output_dir, input_dir, sql_path, final_sql, comment, prefix)
+
+        logger.info(f"Finished: {sql_path.name}")
+        return report_entry(result_payload)
+
+    except FileNotFoundError:
+        logger.error(f"File not found: {sql_path.name}")
+        return {"status": "error", "message": "File not found"}
+    except IOError as e:
+        logger.error(f"I/O error while processing {sql_path.name}: {e}")
+        return {"status": "error", "message": f"I/O Error: {e}"}
+    except Exception as e:
+        logger.exception(f"Unexpected error while processing {sql_path.name}: {e}")
+        return {"status": "error", "message": str(e)}
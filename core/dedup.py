@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.sql_lexer import tokenize
+
+logger = logging.getLogger(__name__)
+
+PARAMETER_KINDS = ("string", "number", "bind")
+
+def fingerprint_statement(sql: str) -> Tuple[str, List[str]]:
+    """
+    Return (canonical form, parameters) for a statement.
+    Literals and bind variables become placeholders, keywords and identifiers
+    are upper-cased, and whitespace and comments are dropped, so statements
+    differing only in literal values or formatting share a fingerprint.
+    """
+    canonical = []
+    params = []
+    for token in tokenize(sql):
+        if token.kind in ("ws", "comment"):
+            continue
+        if token.kind in PARAMETER_KINDS:
+            params.append(token.text)
+            canonical.append(":?" if token.kind == "bind" else "?")
+        elif token.kind == "word":
+            canonical.append(token.text.upper())
+        else:
+            canonical.append(token.text)
+    if canonical and canonical[-1] == ";":
+        canonical.pop()
+    return " ".join(canonical), params
+
+def instantiate(converted_sql: str, rep_params: List[str], params: List[str]) -> Optional[str]:
+    """
+    Re-target a representative's converted SQL to another member of its class by
+    swapping literal/bind tokens. Returns None when the mapping is not provably
+    safe (a value is ambiguous or was rewritten by the converter), in which case
+    the member must be converted on its own.
+    """
+    mapping: Dict[str, str] = {}
+    for rep_value, value in zip(rep_params, params):
+        if mapping.setdefault(rep_value, value) != value:
+            return None
+    mapping = {k: v for k, v in mapping.items() if k != v}
+    if not mapping:
+        return converted_sql
+
+    # Every differing value must still appear in the output exactly as often as
+    # in the source; otherwise the converter moved or rewrote it.
+    rep_counts = Counter(rep_params)
+    output_tokens = list(tokenize(converted_sql))
+    output_counts = Counter(t.text for t in output_tokens if t.kind in PARAMETER_KINDS)
+    if any(output_counts[v] != rep_counts[v] for v in mapping):
+        return None
+
+    return "".join(
+        mapping.get(t.text, t.text) if t.kind in PARAMETER_KINDS else t.text
+        for t in output_tokens
+    )
+
+class StatementDeduper:
+    """
+    Single-flight registry of statement equivalence classes for one run.
+    The first statement of a class is converted; later members wait for it
+    and re-use its result with their own literals substituted back in.
+    """
+
+    def __init__(self):
+        self._classes: Dict[str, Tuple[List[str], asyncio.Future]] = {}
+        self.total = 0
+        self.reused = 0
+
+    @property
+    def ratio(self) -> float:
+        """Share of statements served from another statement's conversion."""
+        return self.reused / self.total if self.total else 0.0
+
+    async def run(self, sql: str, convert: Callable[[], Awaitable[Dict]]) -> Dict:
+        fingerprint, params = fingerprint_statement(sql)
+        self.total += 1
+
+        entry = self._classes.get(fingerprint)
+        if entry is None:
+            future = asyncio.get_running_loop().create_future()
+            self._classes[fingerprint] = (params, future)
+            try:
+                result = await convert()
+            except BaseException:
+                future.set_result(None)
+                raise
+            usable = bool(result.get("postgresql_sql")) and not result.get("error")
+            future.set_result(dict(result) if usable else None)
+            return result
+
+        rep_params, future = entry
+        rep_result = await asyncio.shield(future)
+        if rep_result:
+            converted = instantiate(rep_result["postgresql_sql"], rep_params, params)
+            if converted is not None:
+                self.reused += 1
+                logger.debug(f"Statement re-used from its equivalence class ({len(self._classes)} classes so far).")
+                reused = {**rep_result, "postgresql_sql": converted, "deduplicated": True, "cached": False, "queue_wait": 0.0, "rules_dropped": 0}
+                reused.pop("telemetry", None)   # the representative already accounts for those calls
+                return reused
+        return await convert()
+
+_deduper: Optional[StatementDeduper] = None
+_deduper_loop_id = None
+
+def get_deduper(config: Dict) -> Optional[StatementDeduper]:
+    """Return the run-wide deduper (one per event loop), or None if disabled."""
+    global _deduper, _deduper_loop_id
+    if not config.get("settings", {}).get("dedup_statements", True):
+        return None
+    loop_id = id(asyncio.get_running_loop())
+    if _deduper is None or loop_id != _deduper_loop_id:
+        _deduper = StatementDeduper()
+        _deduper_loop_id = loop_id
+    return _deduper
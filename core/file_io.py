@@ -1,14 +1,85 @@
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import fnmatch
+import html
 import json
+import os
 import sys
 
-def get_sql_files(input_dir: Path) -> List[Path]:
-    """Recursively collect all .sql files from the input directory."""
+DISCOVERY_MODES = ("sorted", "stream", "largest_first")
+
+def _matches(relative: str, patterns: Iterable[str]) -> bool:
+    """Glob match against the relative POSIX path or just the name."""
+    name = relative.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatchcase(relative, p) or fnmatch.fnmatchcase(name, p) for p in patterns)
+
+def iter_sql_files(input_dir: Path, include: Iterable[str] = ("*.sql",), exclude: Iterable[str] = (),
+                   min_size: int = 0, max_size: Optional[int] = None) -> Iterator[Tuple[Path, int]]:
+    """
+    Walk `input_dir` with os.scandir and yield (path, size) for each file as it
+    is found. Files must match an `include` glob and no `exclude` glob;
+    excluded directories are not descended into. Symlinked directories are
+    not followed. Size is -1 unless a size threshold needs it.
+    """
+    include, exclude = list(include), list(exclude)
+    need_size = min_size > 0 or max_size is not None
+    stack = [(input_dir, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            print(f"Warning: cannot read directory '{directory}': {e}", file=sys.stderr)
+            continue
+        subdirs = []
+        with entries:
+            for entry in entries:
+                relative = prefix + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # "archive/*" names the directory's contents, so it prunes "archive" too
+                        if not _matches(relative, exclude) and not _matches(relative + "/", exclude):
+                            subdirs.append((Path(entry.path), relative + "/"))
+                        continue
+                    if not entry.is_file() or not _matches(relative, include) or _matches(relative, exclude):
+                        continue
+                    size = entry.stat().st_size if need_size else -1
+                except OSError:
+                    continue
+                if need_size and (size < min_size or (max_size is not None and size > max_size)):
+                    continue
+                yield Path(entry.path), size
+        stack.extend(reversed(subdirs))
+
+def get_sql_files(input_dir: Path, discovery: Optional[Dict] = None) -> Union[List[Path], Iterator[Path]]:
+    """
+    Collect the .sql files to convert from the input directory (settings.discovery).
+    "sorted" (default) returns a sorted list; "stream" returns a generator that
+    yields files while the tree is still being walked, so conversion starts at
+    once; "largest_first" returns a list ordered by size, biggest first, to
+    shorten the tail of the run.
+    """
     if not input_dir.is_dir():
         print(f"Error: '{input_dir}' is not a valid directory.", file=sys.stderr)
         sys.exit(1)
-    return sorted(input_dir.rglob("*.sql"))
+    discovery = discovery or {}
+    mode = discovery.get("mode", "sorted")
+    if mode not in DISCOVERY_MODES:
+        print(f"Warning: unknown discovery mode '{mode}', using 'sorted'.", file=sys.stderr)
+        mode = "sorted"
+    found = iter_sql_files(
+        input_dir,
+        include=discovery.get("include") or ("*.sql",),
+        exclude=discovery.get("exclude") or (),
+        min_size=discovery.get("min_size", 0),
+        max_size=discovery.get("max_size"),
+    )
+    if mode == "stream":
+        return (path for path, _ in found)
+    if mode == "largest_first":
+        sized = [(size if size >= 0 else path.stat().st_size, path) for path, size in found]
+        return [path for _, path in sorted(sized, key=lambda pair: (-pair[0], pair[1]))]
+    return sorted(path for path, _ in found)
 
 def read_sql_file(file_path: Path) -> str:
     """Read the content of a SQL file as a string."""
@@ -21,11 +92,21 @@ def read_sql_file(file_path: Path) -> str:
         print(f"Error reading file ({file_path}): {e}", file=sys.stderr)
         sys.exit(1)
 
-def write_sql_with_comment(output_base_dir: Path, input_base_dir: Path, input_path: Path, sql: str, comment: str, prefix: str = "--"):
+def format_unconverted_statement(oracle_sql: str, reason: str, prefix: str = "--") -> str:
+    """Render a statement that could not be converted as a commented-out block."""
+    lines = [f"{prefix} NOT CONVERTED: {reason}".rstrip()]
+    lines += [f"{prefix} {line}" for line in oracle_sql.splitlines()]
+    return "\n".join(lines)
+
+def write_sql_with_comment(output_base_dir: Path, input_base_dir: Path, input_path: Path, sql: Union[str, List[str]], comment: str, prefix: str = "--"):
     """
     Write the converted SQL with a header comment to the output path.
     The output path mirrors the input directory structure and appends '_ported' to the filename.
+    `sql` may be a list of converted statements; they are written in order, separated by a blank line.
     """
+    if not isinstance(sql, str):
+        sql = "\n\n".join(sql)
+
     relative_path = input_path.relative_to(input_base_dir)
     output_path = output_base_dir / relative_path.with_name(relative_path.stem + "_ported.sql")
 
@@ -47,63 +128,71 @@ def write_report(report_path: Path, result_dict: dict):
         print(f"Error writing report file ({report_path}): {e}", file=sys.stderr)
         sys.exit(1)
 
-def write_html_report(report_path: Path, result_dict: dict):
-    """Generate a simple HTML report from the result dictionary."""
+HTML_COLUMNS = [
+    ("Filename", None), ("Status", "status"), ("Error", "error"),
+    ("Rating", "rating"), ("Refinement", "refinement"), ("Feedback", "feedback"),
+]
+
+HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>SQLPorter Report</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; padding: 20px; }}
+        table {{ border-collapse: collapse; width: 100%; }}
+        th, td {{ border: 1px solid #ccc; padding: 8px; text-align: left; }}
+        th {{ background-color: #f4f4f4; }}
+        tr:nth-child(even) {{ background-color: #f9f9f9; }}
+    </style>
+</head>
+<body>
+    <h2>SQLPorter Result Summary</h2>
+    <table>
+        <thead>
+            <tr>{headers}</tr>
+        </thead>
+        <tbody>
+"""
+
+HTML_TAIL = """        </tbody>
+    </table>
+</body>
+</html>
+"""
+
+REPORT_BUFFER_SIZE = 1 << 16
+
+def _items(results: Union[Dict, Iterable[Tuple[str, Dict]]]) -> Iterable[Tuple[str, Dict]]:
+    return results.items() if isinstance(results, dict) else results
+
+def _html_row(filename: str, data: Dict) -> str:
+    cells = [filename] + [data.get(key, "") for _, key in HTML_COLUMNS[1:]]
+    return "            <tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in cells) + "</tr>\n"
+
+def write_reports(report_path: Path, results: Union[Dict, Iterable[Tuple[str, Dict]]]):
+    """
+    Render the JSON summary and the HTML report in one pass over `results`
+    (a dict or a stream of (filename, entry) pairs), through buffered writers.
+    Memory use does not grow with the number of files.
+    """
+    html_path = report_path.with_suffix(".html")
     try:
         report_path.parent.mkdir(parents=True, exist_ok=True)
-        rows = ""
-        for filename, data in result_dict.items():
-            status = data.get("status", "")
-            error = data.get("error", "")
-            rating = data.get("rating", "")
-            feedback = data.get("feedback", "")
-            rows += f"""
-            <tr>
-                <td>{filename}</td>
-                <td>{status}</td>
-                <td>{error}</td>
-                <td>{rating}</td>
-                <td>{feedback}</td>
-            </tr>
-            """
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>SQLPorter Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; padding: 20px; }}
-                table {{ border-collapse: collapse; width: 100%; }}
-                th, td {{ border: 1px solid #ccc; padding: 8px; text-align: left; }}
-                th {{ background-color: #f4f4f4; }}
-                tr:nth-child(even) {{ background-color: #f9f9f9; }}
-            </style>
-        </head>
-        <body>
-            <h2>SQLPorter Result Summary</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Filename</th>
-                        <th>Status</th>
-                        <th>Error</th>
-                        <th>Rating</th>
-                        <th>Feedback</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {rows}
-                </tbody>
-            </table>
-        </body>
-        </html>
-        """
-
-        html_path = report_path.with_suffix(".html")
-        html_path.write_text(html_content, encoding="utf-8")
+        with open(report_path, "w", encoding="utf-8", buffering=REPORT_BUFFER_SIZE) as json_out, \
+                open(html_path, "w", encoding="utf-8", buffering=REPORT_BUFFER_SIZE) as html_out:
+            headers = "".join(f"<th>{title}</th>" for title, _ in HTML_COLUMNS)
+            html_out.write(HTML_HEAD.format(headers=headers))
+            json_out.write("{")
+            separator = "\n"
+            for filename, data in _items(results):
+                body = json.dumps(data, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+                json_out.write(f"{separator}  {json.dumps(filename, ensure_ascii=False)}: {body}")
+                separator = ",\n"
+                html_out.write(_html_row(filename, data))
+            json_out.write("\n}\n" if separator != "\n" else "}\n")
+            html_out.write(HTML_TAIL)
         print(f"HTML report generated at {html_path}")
-
     except IOError as e:
-        print(f"Error writing HTML report: {e}", file=sys.stderr)
+        print(f"Error writing report files ({report_path}): {e}", file=sys.stderr)
+        sys.exit(1)
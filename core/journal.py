@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = "conversion_journal.jsonl"
+# Statuses of files whose SQL is complete (see core.conversion.file_status).
+# "partial", "incomplete" and "error" files are converted again.
+FINISHED_STATUSES = ("success", "cached", "deduplicated", "deterministic")
+
+def file_fingerprint(file_path: Path) -> Dict:
+    """Return mtime, size and content hash of a file."""
+    stat = file_path.stat()
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(file_path.read_bytes()).hexdigest(),
+    }
+
+class ConversionJournal:
+    """
+    Append-only JSONL record of finished files. Each line holds the file's
+    relative path, its fingerprint at conversion time and its report entry,
+    so an interrupted run can be resumed and unchanged files skipped.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._handle = None
+
+    def load(self) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """Return (latest entry per file, latest finished entry per file)."""
+        latest: Dict[str, Dict] = {}
+        latest_success: Dict[str, Dict] = {}
+        if not self.path.exists():
+            return latest, latest_success
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a truncated last line.
+                    logger.warning(f"Skipping corrupt journal line {line_no} in {self.path}")
+                    continue
+                key = entry.get("file")
+                if not key:
+                    continue
+                latest[key] = entry
+                if is_finished(entry):
+                    latest_success[key] = entry
+        return latest, latest_success
+
+    def append(self, file_key: str, fingerprint: Dict, result: Dict):
+        if self._handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path, "a", encoding="utf-8")
+        entry = {"file": file_key, **fingerprint, "finished_at": time.time(), "result": result}
+        self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._handle.flush()
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+def is_finished(entry: Dict | None) -> bool:
+    return bool(entry) and entry.get("result", {}).get("status") in FINISHED_STATUSES
+
+def is_resumable(entry: Dict | None, fingerprint: Dict) -> bool:
+    """A journaled file can be skipped on --resume if it finished without error and is unchanged."""
+    if not is_finished(entry):
+        return False
+    if entry.get("mtime") == fingerprint["mtime"] and entry.get("size") == fingerprint["size"]:
+        return True
+    return entry.get("sha256") == fingerprint["sha256"]
+
+def is_unchanged(success_entry: Dict | None, fingerprint: Dict) -> bool:
+    """For --changed-only: the content matches the last successful conversion."""
+    return bool(success_entry) and success_entry.get("sha256") == fingerprint["sha256"]
@@ -0,0 +1,215 @@
+import ast
+import json
+import logging
+import re
+from collections import Counter
+from typing import Any, Iterable, Optional, Tuple
+
+from core.sql_lexer import tokenize
+
+logger = logging.getLogger(__name__)
+
+# How responses were parsed: "strict" needed no help; every other method is a
+# model retry avoided.
+repair_counts: Counter = Counter()
+
+_FENCE = re.compile(r"```[A-Za-z0-9_-]*[ \t]*\n?(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def _balanced_object(text: str, opener: str = "{", closer: str = "}") -> Optional[str]:
+    """The first top-level {...} (or [...]) in `text`, skipping brackets inside quoted strings."""
+    start = text.find(opener)
+    while start != -1:
+        depth = 0
+        quote = None
+        escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if quote:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == quote:
+                    quote = None
+            elif ch in ("\"", "'"):
+                quote = ch
+            elif ch == opener:
+                depth += 1
+            elif ch == closer:
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        # Unbalanced from here (e.g. a stray apostrophe in prose); try the next one.
+        start = text.find(opener, start + 1)
+    return None
+
+def _normalise(candidate: str) -> str:
+    """Rewrite single quotes, Python literals, raw newlines in strings and trailing commas as JSON."""
+    out = []
+    quote = None
+    escaped = False
+    i = 0
+    while i < len(candidate):
+        ch = candidate[i]
+        if quote:
+            if escaped:
+                # \' is not a JSON escape
+                out.append("'" if ch == "'" else "\\" + ch)
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                out.append("\"")
+                quote = None
+            elif ch == "\"" and quote == "'":
+                out.append("\\\"")
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch == "\r":
+                pass
+            else:
+                out.append(ch)
+        elif ch in ("\"", "'"):
+            quote = ch
+            out.append("\"")
+        elif ch.isalpha():
+            j = i
+            while j < len(candidate) and (candidate[j].isalnum() or candidate[j] == "_"):
+                j += 1
+            word = candidate[i:j]
+            out.append(_PY_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return _TRAILING_COMMA.sub(r"\1", "".join(out))
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+def _double_escaped(sql: str) -> bool:
+    """
+    SQL that clearly went through a second level of escaping: no real
+    newlines, and literal \\n sequences only outside string literals, where
+    PostgreSQL would reject a backslash anyway. E'\\n' and '\\n' are real SQL.
+    """
+    if "\n" in sql or "\\n" not in sql:
+        return False
+    code = []
+    for token in tokenize(sql):
+        if token.kind in ("string", "quoted_ident", "comment"):
+            if "\\n" in token.text:
+                return False
+            code.append(" ")
+        else:
+            code.append(token.text)     # a backslash is its own token; keep neighbours joined
+    return "\\n" in "".join(code)
+
+def _decode_sql(parsed: dict, double_encoded: bool = False) -> dict:
+    """
+    Undo a second level of escaping in the SQL: always for JSON that was
+    encoded twice, otherwise only when the SQL is clearly double-escaped.
+    """
+    sql = parsed.get("postgresql_sql")
+    if not isinstance(sql, str) or "\n" in sql or "\\n" not in sql:
+        return parsed
+    if double_encoded or _double_escaped(sql):
+        decoded = _loads(f"\"{sql}\"")
+        if isinstance(decoded, str):
+            parsed["postgresql_sql"] = decoded
+    return parsed
+
+def extract_json_object(text: str, expected_keys: Iterable[str] = ()) -> Tuple[Optional[dict], str]:
+    """
+    Parse a JSON object from a model response, tolerating the usual damage:
+    code fences, prose around the object, trailing commas, single quotes,
+    Python literals, raw newlines inside strings and double-encoded JSON.
+    An object cut out of a larger response only counts if it has
+    every one of `expected_keys`; otherwise it is likely a literal inside SQL
+    or prose (SELECT '{"a": 1}'::jsonb). Returns (object or None, method used).
+    """
+    parsed, method = _extract_object(text)
+    if (parsed is not None and method not in ("strict", "double_encoded")
+            and any(key not in parsed for key in expected_keys)):
+        return None, "failed"
+    return parsed, method
+
+def _extract_object(text: str) -> Tuple[Optional[dict], str]:
+    stripped = text.strip()
+    parsed = _loads(stripped)
+    if isinstance(parsed, str):
+        parsed = _loads(parsed)                          # JSON encoded twice
+        if isinstance(parsed, dict):
+            return _decode_sql(parsed, double_encoded=True), "double_encoded"
+    if isinstance(parsed, dict):
+        return _decode_sql(parsed), "strict"
+
+    fence = _FENCE.search(stripped)
+    if fence:
+        parsed = _loads(fence.group(1).strip())
+        if isinstance(parsed, dict):
+            return _decode_sql(parsed), "fenced"
+        stripped = fence.group(1)
+
+    candidate = _balanced_object(stripped)
+    if candidate is None:
+        return None, "failed"
+    parsed = _loads(candidate)
+    if isinstance(parsed, dict):
+        return _decode_sql(parsed), "embedded"
+
+    parsed = _loads(_normalise(candidate))
+    if isinstance(parsed, dict):
+        return _decode_sql(parsed), "repaired"
+
+    try:
+        parsed = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        parsed = None
+    if isinstance(parsed, dict):
+        return _decode_sql(parsed), "python_literal"
+    return None, "failed"
+
+def extract_json_array(text: str) -> Tuple[Optional[list], str]:
+    """
+    Like extract_json_object, for responses that should be a JSON array.
+    An object wrapping a single list value ({"results": [...]}) is accepted too.
+    """
+    stripped = text.strip()
+    fence = _FENCE.search(stripped)
+    if fence:
+        stripped = fence.group(1).strip()
+    for method, candidate in (("strict", stripped), ("embedded", _balanced_object(stripped, "[", "]"))):
+        if candidate is None:
+            continue
+        for repair, attempt in (("", candidate), ("repaired", _normalise(candidate))):
+            parsed = _loads(attempt)
+            if isinstance(parsed, list):
+                if fence and method == "strict" and not repair:
+                    return parsed, "fenced"
+                return parsed, repair or method
+    parsed, method = extract_json_object(text)
+    if isinstance(parsed, dict):
+        lists = [v for v in parsed.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            return lists[0], method
+    return None, "failed"
+
+def parse_response(text: str, origin: str = "", expected_keys: Iterable[str] = ()) -> Optional[dict]:
+    """extract_json_object with the outcome counted in `repair_counts`."""
+    parsed, method = extract_json_object(text, expected_keys)
+    repair_counts[method] += 1
+    if parsed is not None and method != "strict":
+        logger.info(f"Salvaged malformed JSON{f' from {origin}' if origin else ''} ({method}); no retry needed.")
+    return parsed
+
+def avoided_retries() -> int:
+    return sum(n for method, n in repair_counts.items() if method not in ("strict", "failed"))
@@ -1,7 +1,9 @@
 import json
 from pathlib import Path
 import logging
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
+
+from core.sql_lexer import significant_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +27,12 @@ def load_transformations(file_path: Path = DEFAULT_KNOWLEDGE_FILE) -> Dict[str,
         logger.error(f"Error loading knowledge: {e}", exc_info=True)
         return {}
 
-def save_transformations(new_rules: List[Dict[str, str]], file_path: Path = DEFAULT_KNOWLEDGE_FILE):
-    """Save new transformation rules into the knowledge tree."""
+def save_transformations(new_rules: List[Dict[str, str]], file_path: Path = DEFAULT_KNOWLEDGE_FILE) -> int:
+    """Save new transformation rules into the knowledge tree. Returns the number of rules added."""
     if not new_rules:
-        return
+        return 0
 
-    DEFAULT_KNOWLEDGE_DIR.mkdir(parents=True, exist_ok=True)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
     existing_tree = load_transformations(file_path)
     added_count = 0
 
@@ -53,8 +55,10 @@ def save_transformations(new_rules: List[Dict[str, str]], file_path: Path = DEFA
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(existing_tree, f, indent=2, ensure_ascii=False)
         logger.info(f"{added_count} new transformation(s) saved to knowledge base.")
+        return added_count
     except IOError as e:
         logger.error(f"Error saving knowledge: {e}", exc_info=True)
+        return 0
 
 def format_rules_for_prompt(tree: Dict[str, List[Dict[str, str]]], relevant_keys: List[str]) -> str:
     """Format a subset of transformation rules for inclusion in a prompt."""
@@ -69,7 +73,59 @@ def format_rules_for_prompt(tree: Dict[str, List[Dict[str, str]]], relevant_keys
             prompt_lines.append(line)
     return "\n".join(prompt_lines)
 
+def _match_tokens(text: str) -> Tuple[List[str], List[int]]:
+    """Token texts used for matching (words upper-cased) and their character offsets."""
+    texts, starts = [], []
+    for token in significant_tokens(text):
+        texts.append(token.text.upper() if token.kind == "word" else token.text)
+        starts.append(token.start)
+    return texts, starts
+
+class KeyMatcher:
+    """
+    Multi-pattern matcher over SQL tokens.
+    Each key is tokenized once and indexed by its first token, so a lookup is a
+    single pass over the SQL tokens with a dictionary probe per token,
+    independent of the number of keys. Keys match whole tokens only:
+    'NVL' does not match inside 'ENVLOG', and whitespace between tokens is ignored.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        self._keys = set()
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: str):
+        if key in self._keys:
+            return
+        tokens = tuple(_match_tokens(key)[0])
+        if not tokens:
+            return
+        self._keys.add(key)
+        self._index.setdefault(tokens[0], []).append((tokens, key))
+
+    def find(self, sql_text: str) -> List[Tuple[str, int]]:
+        """All (key, character offset) matches in the SQL, in order of appearance."""
+        texts, starts = _match_tokens(sql_text)
+        matches = []
+        for i, text in enumerate(texts):
+            for tokens, key in self._index.get(text, ()):
+                if len(tokens) == 1 or tuple(texts[i:i + len(tokens)]) == tokens:
+                    matches.append((key, starts[i]))
+        return matches
+
+    def keys_in(self, sql_text: str) -> List[str]:
+        """Distinct keys present in the SQL, in order of first appearance."""
+        return list(dict.fromkeys(key for key, _ in self.find(sql_text)))
+
 def extract_relevant_keys(sql_text: str, known_keys: List[str]) -> List[str]:
-    """Find transformation keys that are present in the given SQL text."""
-    upper_sql = sql_text.upper()
-    return [k for k in known_keys if k.upper() in upper_sql]
+    """
+    Find transformation keys that are present in the given SQL text.
+    Builds a matcher for this one call; repeated lookups should use a
+    store's matcher() (core.knowledge_store), which is kept up to date as rules change.
+    """
+    return KeyMatcher(known_keys).keys_in(sql_text)
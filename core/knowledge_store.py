@@ -0,0 +1,421 @@
+import asyncio
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import core.knowledge
+from core.knowledge import DEFAULT_KNOWLEDGE_DIR, DEFAULT_KNOWLEDGE_FILE, KeyMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KNOWLEDGE_DB = DEFAULT_KNOWLEDGE_DIR / "transformations.db"
+
+def _valid_rules(new_rules: Iterable[Dict]) -> Iterable[Dict[str, str]]:
+    """Normalise incoming rules the same way save_transformations does."""
+    for rule in new_rules:
+        from_pattern = rule.get("from")
+        to_pattern = rule.get("to")
+        if not from_pattern or not to_pattern:
+            continue
+        yield {
+            "from": from_pattern,
+            "to": to_pattern,
+            "context": rule.get("context", "unknown"),
+            "example": rule.get("example", ""),
+        }
+
+class KnowledgeStore(ABC):
+    """
+    Interface of a transformation knowledge backend. `version` grows by the
+    number of rules added through this object, so readers can tell cheaply
+    whether (and roughly how much) the knowledge changed.
+    """
+
+    version = 0
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """All known 'from' patterns."""
+
+    @abstractmethod
+    def lookup(self, keys: Iterable[str]) -> Dict[str, List[Dict[str, str]]]:
+        """Rules for the given 'from' patterns, as {from: [{to, context, example}, ...]}."""
+
+    @abstractmethod
+    def upsert(self, new_rules: List[Dict[str, str]]) -> int:
+        """Add rules that are not known yet; returns how many were added."""
+
+    def load_tree(self) -> Dict[str, List[Dict[str, str]]]:
+        """The whole knowledge tree."""
+        return self.lookup(self.keys())
+
+    def matcher(self) -> KeyMatcher:
+        """A matcher over all known 'from' patterns."""
+        return KeyMatcher(self.keys())
+
+    def watch_paths(self) -> List[Path]:
+        """Files whose modification means the knowledge changed on disk."""
+        return []
+
+    def close(self):
+        pass
+
+class JsonKnowledgeStore(KnowledgeStore):
+    """The original knowledge/transformations.json tree, rewritten on every save."""
+
+    def __init__(self, file_path: Path = DEFAULT_KNOWLEDGE_FILE):
+        self.file_path = file_path
+
+    def keys(self) -> List[str]:
+        return list(core.knowledge.load_transformations(self.file_path).keys())
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, List[Dict[str, str]]]:
+        tree = core.knowledge.load_transformations(self.file_path)
+        return {key: tree[key] for key in keys if key in tree}
+
+    def load_tree(self) -> Dict[str, List[Dict[str, str]]]:
+        return core.knowledge.load_transformations(self.file_path)
+
+    def upsert(self, new_rules: List[Dict[str, str]]) -> int:
+        added = core.knowledge.save_transformations(new_rules, self.file_path)
+        self.version += added
+        return added
+
+    def watch_paths(self) -> List[Path]:
+        return [self.file_path]
+
+class SqliteKnowledgeStore(KnowledgeStore):
+    """
+    Knowledge in SQLite (WAL mode), indexed by 'from' pattern.
+    Upserts only touch the new rows, and WAL plus a busy timeout lets several
+    processes read while one writes.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_KNOWLEDGE_DB, json_path: Optional[Path] = DEFAULT_KNOWLEDGE_FILE):
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # CachedKnowledgeStore writes from a worker thread, one call at a time.
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rules (
+                id INTEGER PRIMARY KEY,
+                from_pattern TEXT NOT NULL,
+                to_pattern TEXT NOT NULL,
+                context TEXT NOT NULL DEFAULT '',
+                example TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL,
+                UNIQUE (from_pattern, to_pattern, context)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+        if json_path is not None:
+            self.migrate_from_json(json_path)
+
+    def keys(self) -> List[str]:
+        rows = self._conn.execute("SELECT DISTINCT from_pattern FROM rules ORDER BY from_pattern").fetchall()
+        return [row[0] for row in rows]
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, List[Dict[str, str]]]:
+        keys = list(dict.fromkeys(keys))
+        tree: Dict[str, List[Dict[str, str]]] = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                "SELECT from_pattern, to_pattern, context, example FROM rules "
+                f"WHERE from_pattern IN ({placeholders}) ORDER BY id",
+                chunk,
+            ).fetchall()
+            for from_pattern, to_pattern, context, example in rows:
+                tree.setdefault(from_pattern, []).append({"to": to_pattern, "context": context, "example": example})
+        return {key: tree[key] for key in keys if key in tree}
+
+    def load_tree(self) -> Dict[str, List[Dict[str, str]]]:
+        tree: Dict[str, List[Dict[str, str]]] = {}
+        rows = self._conn.execute("SELECT from_pattern, to_pattern, context, example FROM rules ORDER BY id")
+        for from_pattern, to_pattern, context, example in rows:
+            tree.setdefault(from_pattern, []).append({"to": to_pattern, "context": context, "example": example})
+        return tree
+
+    def upsert(self, new_rules: List[Dict[str, str]]) -> int:
+        rows = [(r["from"], r["to"], r["context"], r["example"], time.time()) for r in _valid_rules(new_rules)]
+        if not rows:
+            return 0
+        try:
+            with self._conn:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO rules (from_pattern, to_pattern, context, example, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                added = self._conn.total_changes - before
+            self.version += added
+            logger.info(f"{added} new transformation(s) saved to knowledge base.")
+            return added
+        except sqlite3.Error as e:
+            logger.error(f"Error saving knowledge: {e}", exc_info=True)
+            return 0
+
+    def migrate_from_json(self, json_path: Path) -> int:
+        """Import an existing transformations.json once; later calls are no-ops."""
+        marker = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+        if marker or not json_path.exists():
+            return 0
+        tree = core.knowledge.load_transformations(json_path)
+        rules = [
+            {"from": key, "to": entry.get("to"), "context": entry.get("context", "unknown"), "example": entry.get("example", "")}
+            for key, entries in tree.items()
+            for entry in entries
+        ]
+        added = self.upsert(rules)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (str(json_path),),
+            )
+        logger.info(f"Migrated {added} rule(s) from {json_path} to {self.db_path}.")
+        return added
+
+    def watch_paths(self) -> List[Path]:
+        # WAL commits land in the -wal file; the main file changes on checkpoint.
+        return [self.db_path, self.db_path.with_name(self.db_path.name + "-wal")]
+
+    def close(self):
+        self._conn.close()
+
+class CachedKnowledgeStore(KnowledgeStore):
+    """
+    Process-wide in-memory view of a backend.
+
+    The tree is loaded once; lookups are dictionary hits. Upserts are applied
+    in memory immediately and written to the backend in batches (write-behind):
+    `flush_interval` seconds after the last flush (by a timer on the running
+    event loop, or on the next upsert outside one), when `flush_batch` rules
+    are pending, or at interpreter exit. Inside an event loop the backend
+    write runs in a worker thread, so a busy database never blocks the loop. If the backend's
+    files are modified by someone else, the tree is reloaded on the next read.
+    `version` also grows when a reload from disk changes the rules.
+    """
+
+    def __init__(self, backend: KnowledgeStore, flush_interval: float = 5.0,
+                 flush_batch: int = 100, check_interval: float = 1.0):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.check_interval = check_interval
+        self.version = 0
+        self._rule_count = 0
+        self._pending: List[Dict[str, str]] = []
+        self._last_flush = time.monotonic()
+        self._last_check = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()     # one backend call at a time
+        self._matcher = None
+        self._reload()
+        atexit.register(self.flush)
+
+    def _disk_signature(self):
+        signature = []
+        for path in self.backend.watch_paths():
+            try:
+                stat = path.stat()
+                signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((str(path), None, None))
+        return tuple(signature)
+
+    def _reload(self):
+        with self._write_lock:
+            self._tree = self.backend.load_tree()
+        self._matcher = None
+        for rule in self._pending:
+            self._apply(rule)
+        self._signature = self._disk_signature()
+        rule_count = sum(len(entries) for entries in self._tree.values())
+        self.version += max(1, abs(rule_count - self._rule_count))
+        self._rule_count = rule_count
+        logger.debug(f"Knowledge cache loaded: {len(self._tree)} pattern(s), version {self.version}.")
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._disk_signature() != self._signature:
+            logger.info("Knowledge changed on disk; reloading.")
+            self._reload()
+
+    def _apply(self, rule: Dict[str, str]) -> bool:
+        if self._matcher is not None and rule["from"] not in self._tree:
+            self._matcher.add(rule["from"])
+        entries = self._tree.setdefault(rule["from"], [])
+        if any(e["to"] == rule["to"] and e.get("context") == rule["context"] for e in entries):
+            return False
+        entries.append({"to": rule["to"], "context": rule["context"], "example": rule["example"]})
+        return True
+
+    def keys(self) -> List[str]:
+        self._refresh_if_changed()
+        return list(self._tree.keys())
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, List[Dict[str, str]]]:
+        self._refresh_if_changed()
+        return {key: self._tree[key] for key in keys if key in self._tree}
+
+    def matcher(self) -> KeyMatcher:
+        """Built once per loaded tree and extended in place as rules are added."""
+        self._refresh_if_changed()
+        if self._matcher is None:
+            self._matcher = KeyMatcher(self._tree.keys())
+        return self._matcher
+
+    def load_tree(self) -> Dict[str, List[Dict[str, str]]]:
+        """The live in-memory tree; callers must not modify it."""
+        self._refresh_if_changed()
+        return self._tree
+
+    def upsert(self, new_rules: List[Dict[str, str]]) -> int:
+        added = 0
+        for rule in _valid_rules(new_rules):
+            if self._apply(rule):
+                self._pending.append(rule)
+                added += 1
+        self.version += added
+        self._rule_count += added
+        if not self._pending:
+            return added
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if len(self._pending) >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval:
+            if loop is None:
+                self.flush()
+            else:
+                self._flush_in_background(loop)
+        elif loop is not None:
+            self._schedule_flush(loop)
+        return added
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop):
+        """Flush pending rules once `flush_interval` has passed, even if no further upsert comes."""
+        if self._timer is not None and self._timer_loop is loop:
+            return
+        delay = max(0.0, self.flush_interval - (time.monotonic() - self._last_flush))
+        self._timer = loop.call_later(delay, self._flush_in_background, loop)
+        self._timer_loop = loop
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = self._timer_loop = None
+
+    def _flush_in_background(self, loop: asyncio.AbstractEventLoop):
+        """Hand the pending rules to a worker thread; one background write at a time."""
+        self._cancel_timer()
+        if self._flush_task is not None and not self._flush_task.done():
+            return      # the running write reschedules what is left
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._flush_task = loop.create_task(self._write_in_thread(pending))
+
+    async def _write_in_thread(self, pending: List[Dict[str, str]]):
+        written = await asyncio.to_thread(self._write, pending)
+        self._flush_task = None
+        loop = asyncio.get_running_loop()
+        if written:
+            self._signature = self._disk_signature()
+            if len(self._pending) >= self.flush_batch:
+                self._flush_in_background(loop)
+                return
+        else:
+            self._pending = pending + self._pending     # retried after flush_interval
+        if self._pending:
+            self._schedule_flush(loop)
+
+    def _write(self, pending: List[Dict[str, str]]) -> bool:
+        with self._write_lock:
+            try:
+                self.backend.upsert(pending)
+                return True
+            except Exception as e:
+                logger.error(f"Knowledge flush failed; keeping {len(pending)} rule(s) pending: {e}", exc_info=True)
+                return False
+
+    def flush(self):
+        """Write pending rules to the backend now, on the calling thread (end of run, exit)."""
+        self._last_flush = time.monotonic()
+        self._cancel_timer()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        if not self._write(pending):
+            self._pending = pending + self._pending
+            return
+        # Our own write is not an external change.
+        self._signature = self._disk_signature()
+
+    def watch_paths(self) -> List[Path]:
+        return self.backend.watch_paths()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self.backend.close()
+
+def relevant_rules(store: KnowledgeStore, sql: str) -> List[Dict[str, str]]:
+    """Every known rule whose 'from' pattern occurs in `sql`, in order of first occurrence."""
+    relevant_keys = store.matcher().keys_in(sql)
+    tree = store.lookup(relevant_keys)
+    return [
+        {"from": key, "to": rule["to"], "context": rule.get("context", ""), "example": rule.get("example", "")}
+        for key in relevant_keys if key in tree
+        for rule in tree[key]
+    ]
+
+_stores: Dict[tuple, KnowledgeStore] = {}
+
+def get_knowledge_store(config: Dict) -> KnowledgeStore:
+    """Return the shared knowledge backend selected by settings.knowledge (SQLite by default)."""
+    knowledge_config = config.get("settings", {}).get("knowledge", {})
+    backend = knowledge_config.get("backend", "sqlite")
+    json_path = Path(knowledge_config.get("json_path", DEFAULT_KNOWLEDGE_FILE))
+
+    if backend == "json":
+        store_id = ("json", str(json_path.resolve()))
+    else:
+        if backend != "sqlite":
+            logger.warning(f"Unknown knowledge backend '{backend}', using sqlite.")
+        db_path = Path(knowledge_config.get("path", DEFAULT_KNOWLEDGE_DB))
+        store_id = ("sqlite", str(db_path.resolve()))
+
+    if store_id not in _stores:
+        store = JsonKnowledgeStore(json_path) if store_id[0] == "json" else SqliteKnowledgeStore(db_path, json_path)
+        if knowledge_config.get("in_memory", True):
+            store = CachedKnowledgeStore(
+                store,
+                flush_interval=knowledge_config.get("flush_interval", 5.0),
+                flush_batch=knowledge_config.get("flush_batch", 100),
+            )
+        _stores[store_id] = store
+    return _stores[store_id]
+
+def flush_knowledge_stores():
+    """Write any pending knowledge to disk (e.g. at the end of a run)."""
+    for store in _stores.values():
+        if isinstance(store, CachedKnowledgeStore):
+            store.flush()
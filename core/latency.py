@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 600.0
+
+# Set by `hedged` in the primary call's task; see mark_service_started.
+_service_started: ContextVar[Optional[asyncio.Event]] = ContextVar("sqlporter_service_started", default=None)
+
+class LatencyTracker:
+    """Sliding window of recent call latencies per agent, with percentile lookup."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, agent_name: str, seconds: float):
+        samples = self._samples.get(agent_name)
+        if samples is None:
+            samples = self._samples[agent_name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def count(self, agent_name: str) -> int:
+        return len(self._samples.get(agent_name, ()))
+
+    def percentile(self, agent_name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """The q-th percentile (0-100, nearest rank) or None with fewer than min_samples samples."""
+        samples = self._samples.get(agent_name)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+_tracker = LatencyTracker()
+
+def get_latency_tracker() -> LatencyTracker:
+    return _tracker
+
+def agent_timeout(config: Dict, agent_name: str) -> Optional[float]:
+    """Deadline for one call to `agent_name`: settings.timeouts.agents[name] or .default; 0 disables it."""
+    timeouts = config.get("settings", {}).get("timeouts", {})
+    timeout = timeouts.get("agents", {}).get(agent_name, timeouts.get("default", DEFAULT_TIMEOUT))
+    return timeout or None
+
+def hedge_delay(config: Dict, agent_name: str, tracker: LatencyTracker = _tracker) -> Optional[float]:
+    """Seconds to wait before sending a backup request, or None if hedging does not apply yet."""
+    hedging = config.get("settings", {}).get("hedging", {})
+    if not hedging.get("enabled", False):
+        return None
+    delay = tracker.percentile(agent_name, hedging.get("percentile", 95), hedging.get("min_samples", 20))
+    if delay is None:
+        return None
+    return max(delay, hedging.get("min_delay", 1.0))
+
+def mark_service_started():
+    """
+    Tell an enclosing `hedged` that its primary call holds its rate-limiter
+    slot and is now being served; the hedge delay counts from here, so time
+    spent queueing never triggers a backup request.
+    """
+    started = _service_started.get()
+    if started is not None:
+        started.set()
+
+async def hedged(primary: Callable[[], Awaitable[Any]], backup: Callable[[], Awaitable[Any]],
+                 delay: Optional[float], can_hedge: Callable[[], bool] = lambda: True) -> Any:
+    """
+    Await `primary`; if it has not finished `delay` seconds after it called
+    mark_service_started, start `backup` as well (unless `can_hedge()` says
+    there is no capacity for it) and return the first useful (truthy) result.
+    The other call is cancelled. If both fail, the primary's outcome is
+    re-raised/returned.
+    """
+    started = asyncio.Event()
+
+    async def run_primary():
+        _service_started.set(started)
+        return await primary()
+
+    primary_task = asyncio.ensure_future(run_primary())
+    if delay is None:
+        return await primary_task
+
+    pending = {primary_task}
+    try:
+        waiting = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({primary_task, waiting}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiting.cancel()
+        if not primary_task.done():
+            await asyncio.wait({primary_task}, timeout=delay)
+        if primary_task.done():
+            return primary_task.result()
+        if not can_hedge():
+            logger.debug("No free slot for a hedged request; waiting for the primary.")
+            return await primary_task
+
+        backup_task = asyncio.ensure_future(backup())
+        pending = {primary_task, backup_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.exception() and task.result():
+                    if task is backup_task:
+                        logger.info("Hedged request answered first.")
+                    return task.result()
+        return primary_task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,66 @@
+import json
+from typing import Dict, List, Tuple
+
+# Share of the model's max_tokens used for the request when no explicit budget is set.
+DEFAULT_BUDGET_RATIO = 0.4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for prompt budgeting."""
+    return len(text) // 4 + 1
+
+def rule_tokens(rule: Dict) -> int:
+    return estimate_tokens(json.dumps(rule, ensure_ascii=False))
+
+def model_budget(config: Dict, model: str) -> int:
+    """
+    Token budget for one request to `model`: settings.prompt.budgets[model] if
+    set, otherwise budget_ratio * settings.max_tokens.
+    """
+    settings = config.get("settings", {})
+    prompt_config = settings.get("prompt", {})
+    budgets = prompt_config.get("budgets", {})
+    if model in budgets:
+        return int(budgets[model])
+    ratio = prompt_config.get("budget_ratio", DEFAULT_BUDGET_RATIO)
+    return int(settings.get("max_tokens", 10000) * ratio)
+
+def rank_rules(rules: List[Dict]) -> List[Dict]:
+    """
+    Order rules by specificity (longer patterns first), then by pattern and
+    replacement text. Only the rules themselves decide the order, so the same
+    statement always gets the same prompt and stage cache key.
+    """
+    return sorted(rules, key=lambda rule: (
+        -len(rule["from"]),
+        rule["from"],
+        rule.get("to", ""),
+        rule.get("context", ""),
+    ))
+
+def build_payload(oracle_sql: str, prompt_context: Dict, budget: int) -> Tuple[Dict, int]:
+    """
+    Assemble a converter payload within `budget` tokens.
+    The SQL is always sent; rules are added in rank order, then examples,
+    while they fit. Returns the payload and the number of rules dropped.
+    """
+    remaining = budget - estimate_tokens(oracle_sql)
+    rules = prompt_context.get("known_transformations", [])
+    kept = []
+    for rule in rank_rules(rules):
+        cost = rule_tokens(rule)
+        if cost > remaining:
+            continue
+        kept.append(rule)
+        remaining -= cost
+
+    payload = {"oracle_sql": oracle_sql, "known_transformations": kept}
+    examples = []
+    for example in prompt_context.get("examples", []):
+        cost = estimate_tokens(example["oracle_sql"]) + estimate_tokens(example["postgresql_sql"])
+        if cost > remaining:
+            continue
+        examples.append(example)
+        remaining -= cost
+    if examples:
+        payload["examples"] = examples
+    return payload, len(rules) - len(kept)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens are added per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready(self) -> bool:
+        """Whether acquire() would return without waiting right now."""
+        if self._lock.locked():
+            return False
+        self._refill()
+        return self._tokens >= 1.0
+
+    async def acquire(self):
+        """Wait until one token is available and consume it."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1.0
+
+class ModelLimiter:
+    """Request-rate and concurrency budget shared by every agent mapped to the same key."""
+
+    def __init__(self, key: str, requests_per_minute: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, burst: Optional[float] = None):
+        self.key = key
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst or 1.0) if requests_per_minute else None
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    def has_free_slot(self) -> bool:
+        """Whether a request could start now without queueing."""
+        if self.semaphore and self.semaphore.locked():
+            return False
+        return self.bucket is None or self.bucket.ready()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """Hold a request slot; yields the number of seconds spent waiting for it."""
+        started = time.monotonic()
+        if self.semaphore:
+            await self.semaphore.acquire()
+        try:
+            if self.bucket:
+                await self.bucket.acquire()
+            yield time.monotonic() - started
+        finally:
+            if self.semaphore:
+                self.semaphore.release()
+
+def agent_model(config: Dict, agent_name: str) -> str:
+    """The model an agent runs on: its `models` entry, else the fast-agent default_model."""
+    return config.get("models", {}).get(agent_name) or config.get("default_model", "")
+
+class RateLimiterRegistry:
+    """
+    Resolve the limiter for an agent from `settings.rate_limits`.
+    Keys are matched from most to least specific: agent name, full model
+    string (e.g. "generic.gemma3:4b"), provider prefix (e.g. "generic"),
+    then "default". Agents without a `models` entry (merge, evaluator,
+    pipeline, knowledge) run on `default_model`. Agents resolving to the
+    same key share one limiter. The merge/evaluator calls fast-agent makes
+    inside an evaluator-optimizer loop bypass it; the loop as a whole holds
+    one pipeline slot.
+    """
+
+    def __init__(self, limits_config: Dict[str, Dict], model_map: Dict[str, str], default_model: str = ""):
+        self.limits_config = limits_config or {}
+        self.model_map = model_map or {}
+        self.default_model = default_model or ""
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def _resolve_key(self, agent_name: str) -> Optional[str]:
+        model = self.model_map.get(agent_name) or self.default_model
+        candidates = [agent_name, model, model.split(".", 1)[0] if model else "", "default"]
+        for key in candidates:
+            if key and key in self.limits_config:
+                return key
+        return None
+
+    def for_agent(self, agent_name: str) -> Optional[ModelLimiter]:
+        key = self._resolve_key(agent_name)
+        if key is None:
+            return None
+        if key not in self._limiters:
+            limits = self.limits_config.get(key) or {}
+            self._limiters[key] = ModelLimiter(
+                key,
+                requests_per_minute=limits.get("requests_per_minute"),
+                max_concurrency=limits.get("max_concurrency"),
+                burst=limits.get("burst"),
+            )
+            logger.debug(f"Rate limiter '{key}' created: {limits}")
+        return self._limiters[key]
+
+_registry: Optional[RateLimiterRegistry] = None
+_registry_signature = None
+
+def get_rate_limiters(config: Dict) -> RateLimiterRegistry:
+    """Return the process-wide registry, rebuilding it if the config or event loop changed."""
+    global _registry, _registry_signature
+    limits_config = config.get("settings", {}).get("rate_limits", {})
+    model_map = config.get("models", {})
+    default_model = config.get("default_model", "")
+    signature = (id(asyncio.get_running_loop()), repr(limits_config), repr(model_map), default_model)
+    if _registry is None or signature != _registry_signature:
+        _registry = RateLimiterRegistry(limits_config, model_map, default_model)
+        _registry_signature = signature
+    return _registry
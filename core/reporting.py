@@ -0,0 +1,110 @@
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILENAME = "results.jsonl"
+
+class ResultSink:
+    """
+    JSONL stream of this run's per-file report entries, written as files
+    finish. Reports are rendered from it afterwards, so no run-wide summary
+    has to be kept in memory.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._handle = None
+        self.count = 0
+
+    def append(self, file_key: str, result: Dict):
+        if self._handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path, "w", encoding="utf-8")
+        self._handle.write(json.dumps({"file": file_key, "result": result}, ensure_ascii=False) + "\n")
+        self._handle.flush()    # a crash keeps every finished file
+        self.count += 1
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def replay(self) -> Iterator[Tuple[str, Dict]]:
+        """This run's entries; a file left over from an earlier run is ignored."""
+        self.close()
+        return iter_results(self.path) if self.count else iter(())
+
+def iter_results(path: Path) -> Iterator[Tuple[str, Dict]]:
+    """(file, entry) pairs from a result sink, in the order they were written."""
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt result line {line_no} in {path}")
+                continue
+            yield record["file"], record["result"]
+
+class ProgressTracker:
+    """
+    Logs files/min, ETA and cache-hit rate at most every `interval` seconds.
+    `total` is None while input files are still being discovered (no ETA then).
+    """
+
+    def __init__(self, total: Optional[int], interval: float = 10.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.cached = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self._last_log = self.started
+        self._logged_done = 0
+
+    def update(self, entry: Dict):
+        self.done += 1
+        status = entry.get("status")
+        if status == "cached":
+            self.cached += 1
+        elif status == "error":
+            self.errors += 1
+        now = time.monotonic()
+        if self.done == self.total or now - self._last_log >= self.interval:
+            self._last_log = now
+            self._logged_done = self.done
+            logger.info(self.summary())
+
+    def finish(self):
+        """Log the final figures unless the last update already did."""
+        if self.done and self._logged_done != self.done:
+            self._logged_done = self.done
+            logger.info(self.summary())
+
+    def snapshot(self) -> Dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        rate = self.done / elapsed
+        remaining = self.total - self.done if self.total is not None else None
+        return {
+            "done": self.done,
+            "total": self.total,
+            "files_per_min": round(rate * 60, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate and remaining is not None else None,
+            "cache_hit_rate": round(self.cached / self.done, 4) if self.done else 0.0,
+            "errors": self.errors,
+        }
+
+    def summary(self) -> str:
+        s = self.snapshot()
+        eta = f"{s['eta_seconds']:.0f}s" if s["eta_seconds"] is not None else "?"
+        total = s["total"] if s["total"] is not None else "?"
+        return (f"Progress: {s['done']}/{total} files, {s['files_per_min']:.1f} files/min, "
+                f"ETA {eta}, cache hits {s['cache_hit_rate']:.1%}, errors {s['errors']}")
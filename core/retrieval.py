@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from core.knowledge import DEFAULT_KNOWLEDGE_DIR
+from core.prompt import estimate_tokens, rule_tokens
+from core.sql_lexer import canonical_form
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:  # retrieval degrades to exact key matches only
+    np = None
+    TfidfVectorizer = None
+
+DEFAULT_EXAMPLES_FILE = DEFAULT_KNOWLEDGE_DIR / "conversions.jsonl"
+
+def _rule_text(rule: Dict[str, str]) -> str:
+    return " ".join(filter(None, (rule.get("from"), rule.get("to"), rule.get("context"), rule.get("example"))))
+
+class _TfidfIndex:
+    """Character n-gram TF-IDF matrix over a list of documents with top-k cosine lookup."""
+
+    def __init__(self, documents: List[str]):
+        self.size = len(documents)
+        self.vectorizer = None
+        self.matrix = None
+        if documents:
+            self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), lowercase=True, sublinear_tf=True)
+            self.matrix = self.vectorizer.fit_transform(documents)
+
+    def top_k(self, query: str, k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        if self.matrix is None or k <= 0:
+            return []
+        # Rows are L2-normalised, so the dot product is the cosine similarity.
+        scores = (self.matrix @ self.vectorizer.transform([query]).T).toarray().ravel()
+        k = min(k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = sorted(candidates, key=lambda i: -scores[i])
+        return [(int(i), float(scores[i])) for i in ranked if scores[i] > min_score]
+
+class RetrievalIndex:
+    """
+    Similarity retrieval over knowledge rules and past conversions.
+
+    Rules come from the knowledge store; (oracle_sql, postgresql_sql) pairs of
+    successful conversions are appended to a JSONL file. Both are indexed with
+    character n-gram TF-IDF. The index is rebuilt lazily once at least
+    `rebuild_min_changes` rules and examples were added since the last build,
+    and at most once per `rebuild_interval` seconds; exact key matches are
+    sent regardless, so only similarity results lag. In async code refresh()
+    fits the new index in a worker thread while lookups keep using the
+    previous one.
+    """
+
+    def __init__(self, examples_path: Path = DEFAULT_EXAMPLES_FILE, max_examples: int = 5000,
+                 rebuild_interval: float = 60.0, rebuild_min_changes: int = 20):
+        self.examples_path = examples_path
+        self.max_examples = max_examples
+        self.rebuild_interval = rebuild_interval
+        self.rebuild_min_changes = max(1, rebuild_min_changes)
+        self.examples: List[Dict[str, str]] = self._load_examples()
+        self._examples_added = 0
+        self._seen = {e["oracle_sql"] for e in self.examples}
+        self._rules: List[Dict[str, str]] = []
+        self._rule_index = None
+        self._example_index = None
+        self._example_snapshot: List[Dict[str, str]] = []
+        self._built_signature = None
+        self._built_at = 0.0
+        self._rebuild_task: asyncio.Task | None = None
+
+    @property
+    def available(self) -> bool:
+        return TfidfVectorizer is not None
+
+    def _load_examples(self) -> List[Dict[str, str]]:
+        if not self.examples_path.exists():
+            return []
+        examples = []
+        with open(self.examples_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("oracle_sql") and entry.get("postgresql_sql"):
+                    examples.append(entry)
+        return examples[-self.max_examples:]
+
+    def add_example(self, oracle_sql: str, postgresql_sql: str):
+        """Remember a successful conversion for future few-shot prompts."""
+        if not oracle_sql.strip() or not postgresql_sql.strip() or oracle_sql in self._seen:
+            return
+        entry = {"oracle_sql": oracle_sql, "postgresql_sql": postgresql_sql}
+        self._seen.add(oracle_sql)
+        self.examples.append(entry)
+        self._examples_added += 1
+        if len(self.examples) > self.max_examples:
+            self.examples = self.examples[-self.max_examples:]
+        try:
+            self.examples_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.examples_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except IOError as e:
+            logger.warning(f"Could not record conversion example: {e}")
+
+    def _stale_signature(self, store):
+        """
+        The signature to build for, or None while the index is current enough:
+        fewer than rebuild_min_changes additions, or rebuilt too recently.
+        Only counters are compared, so this is cheap to call per statement.
+        """
+        signature = (id(store), store.version, self._examples_added)
+        built = self._built_signature
+        if built is None or built[0] != signature[0]:
+            return signature
+        changes = abs(signature[1] - built[1]) + signature[2] - built[2]
+        if changes < self.rebuild_min_changes or time.monotonic() - self._built_at < self.rebuild_interval:
+            return None
+        return signature
+
+    def _collect(self, store) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """Snapshot rules and examples on the caller's thread; the live tree may change during a fit."""
+        rules = [
+            {"from": key, "to": entry["to"], "context": entry.get("context", ""), "example": entry.get("example", "")}
+            for key, entries in store.load_tree().items()
+            for entry in entries
+        ]
+        return rules, list(self.examples)
+
+    @staticmethod
+    def _fit(rules: List[Dict[str, str]], examples: List[Dict[str, str]]) -> Tuple[_TfidfIndex, _TfidfIndex]:
+        return _TfidfIndex([_rule_text(r) for r in rules]), _TfidfIndex([e["oracle_sql"] for e in examples])
+
+    def _install(self, signature, rules, examples, indexes, started: float):
+        self._rules = rules
+        self._rule_index, self._example_index = indexes
+        self._example_snapshot = examples
+        self._built_signature = signature
+        self._built_at = time.monotonic()
+        logger.debug(f"Retrieval index rebuilt: {len(rules)} rules, {len(examples)} examples "
+                     f"in {self._built_at - started:.2f}s.")
+
+    def _ensure_built(self, store):
+        """Rebuild synchronously; outside an event loop, or before refresh() built anything."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            if self._built_signature is not None:
+                return
+        signature = self._stale_signature(store)
+        if signature is None:
+            return
+        started = time.monotonic()
+        rules, examples = self._collect(store)
+        self._install(signature, rules, examples, self._fit(rules, examples), started)
+
+    async def refresh(self, store):
+        """
+        Start a rebuild in a worker thread if the index is stale. Concurrent
+        conversions keep using the previous index meanwhile; only the first
+        build, when there is nothing to serve yet, is awaited.
+        """
+        if not self.available:
+            return
+        task = self._rebuild_task
+        if task is not None and task.get_loop() is not asyncio.get_running_loop():
+            task = None     # left over from an earlier event loop
+        if task is None or task.done():
+            signature = self._stale_signature(store)
+            if signature is None:
+                return
+            task = self._rebuild_task = asyncio.ensure_future(self._rebuild(signature, *self._collect(store)))
+        if self._built_signature is None:
+            await asyncio.shield(task)
+
+    async def _rebuild(self, signature, rules: List[Dict[str, str]], examples: List[Dict[str, str]]):
+        started = time.monotonic()
+        try:
+            indexes = await asyncio.to_thread(self._fit, rules, examples)
+        except Exception as e:
+            logger.warning(f"Retrieval index rebuild failed: {e}")
+            return
+        self._install(signature, rules, examples, indexes, started)
+
+    def similar_rules(self, store, sql: str, k: int, min_score: float = 0.0) -> List[Tuple[Dict[str, str], float]]:
+        if not self.available:
+            return []
+        self._ensure_built(store)
+        return [(self._rules[i], score) for i, score in self._rule_index.top_k(sql, k, min_score)]
+
+    def similar_examples(self, store, sql: str, k: int, min_score: float = 0.0) -> List[Tuple[Dict[str, str], float]]:
+        """Past conversions similar to `sql`, never the conversion of `sql` itself."""
+        if not self.available:
+            return []
+        self._ensure_built(store)
+        own = canonical_form(sql)
+        found = [
+            (self._example_snapshot[i], score) for i, score in self._example_index.top_k(sql, k + 1, min_score)
+            if canonical_form(self._example_snapshot[i]["oracle_sql"]) != own
+        ]
+        return found[:k]
+
+_indexes: Dict[str, RetrievalIndex] = {}
+
+def get_retrieval_index(config: Dict) -> RetrievalIndex | None:
+    """Return the shared retrieval index, or None when retrieval is disabled."""
+    retrieval_config = config.get("settings", {}).get("retrieval", {})
+    if not retrieval_config.get("enabled", False):
+        return None
+    examples_path = Path(retrieval_config.get("examples_path", DEFAULT_EXAMPLES_FILE))
+    index_id = str(examples_path.resolve())
+    if index_id not in _indexes:
+        index = RetrievalIndex(
+            examples_path,
+            max_examples=retrieval_config.get("max_examples", 5000),
+            rebuild_interval=retrieval_config.get("rebuild_interval", 60.0),
+            rebuild_min_changes=retrieval_config.get("rebuild_min_changes", 20),
+        )
+        if not index.available:
+            logger.warning("scikit-learn is not installed; similarity retrieval is disabled.")
+        _indexes[index_id] = index
+    return _indexes[index_id]
+
+def select_prompt_context(index: RetrievalIndex, store, oracle_sql: str, matched_rules: List[Dict],
+                          retrieval_config: Dict) -> Dict:
+    """
+    Choose the rules and few-shot examples sent with a statement.
+    Rules whose key occurs in the SQL rank first, then by similarity; the
+    top_k_rules are kept, then top_k_examples past conversions are added, all
+    within token_budget (estimated tokens of the serialised entries).
+    """
+    top_k_rules = retrieval_config.get("top_k_rules", 20)
+    top_k_examples = retrieval_config.get("top_k_examples", 2)
+    min_similarity = retrieval_config.get("min_similarity", 0.2)
+    budget = retrieval_config.get("token_budget", 1500)
+
+    scored: Dict[Tuple[str, str, str], Tuple[float, Dict]] = {}
+    for rule in matched_rules:
+        scored[(rule["from"], rule["to"], rule.get("context", ""))] = (1.0, rule)
+    for rule, score in index.similar_rules(store, oracle_sql, top_k_rules, min_similarity):
+        key = (rule["from"], rule["to"], rule.get("context", ""))
+        previous = scored.get(key)
+        # Exact key matches get a bonus so they outrank merely similar rules.
+        scored[key] = (previous[0] + score, previous[1]) if previous else (score, rule)
+
+    ranked = sorted(scored.values(), key=lambda item: -item[0])[:top_k_rules]
+
+    used = 0
+    rules = []
+    for _, rule in ranked:
+        cost = rule_tokens(rule)
+        if used + cost > budget:
+            continue
+        rules.append(rule)
+        used += cost
+
+    examples = []
+    for example, _ in index.similar_examples(store, oracle_sql, top_k_examples, min_similarity):
+        cost = estimate_tokens(example["oracle_sql"]) + estimate_tokens(example["postgresql_sql"])
+        if used + cost > budget:
+            continue
+        examples.append({"oracle_sql": example["oracle_sql"], "postgresql_sql": example["postgresql_sql"]})
+        used += cost
+
+    context = {"known_transformations": rules}
+    if examples:
+        context["examples"] = examples
+    return context
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Error classes
+TRANSPORT = "transport"        # connection errors, timeouts, 5xx
+RATE_LIMIT = "rate_limit"      # 429 / quota exceeded
+MALFORMED = "malformed"        # the answer is not the JSON we asked for
+EMPTY_SQL = "empty_sql"        # valid JSON but no SQL in it
+UNEXPECTED = "unexpected"      # anything else, e.g. a bug in our own code: never retried
+
+# Client-library connection/timeout errors that do not derive from OSError
+# (httpx, aiohttp, the OpenAI and Anthropic SDKs), matched by class name.
+TRANSPORT_ERROR_NAMES = {
+    "TransportError", "ClientConnectionError", "ServerTimeoutError", "ServerDisconnectedError",
+    "APIConnectionError", "APITimeoutError", "InternalServerError",
+}
+
+DEFAULT_POLICIES = {
+    TRANSPORT: {"attempts": 3, "base_delay": 1.0, "max_delay": 30.0},
+    RATE_LIMIT: {"attempts": 5, "base_delay": 2.0, "max_delay": 60.0},
+    MALFORMED: {"attempts": 2, "base_delay": 0.0, "max_delay": 0.0},
+    EMPTY_SQL: {"attempts": 1, "base_delay": 0.5, "max_delay": 2.0},
+}
+MAX_RETRY_AFTER = 120.0
+
+REPAIR_INSTRUCTION = (
+    "Your previous answer could not be parsed. Respond ONLY with a raw JSON object "
+    'with the keys "postgresql_sql" and "transformations", no code fences and no other text.'
+)
+
+class AgentOutputError(Exception):
+    """An agent answered, but not with a usable result."""
+
+    def __init__(self, error_class: str, agent_name: str, response: Any = None):
+        super().__init__(f"[{agent_name}] {error_class.replace('_', ' ')} response")
+        self.error_class = error_class
+        self.response = response
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "status", "code"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+def classify_error(error: BaseException) -> str:
+    """
+    Map an exception raised while calling an agent to an error class. Only
+    known transport failures (timeouts, connection/OS errors, HTTP 5xx) are
+    TRANSPORT; any other exception is UNEXPECTED.
+    """
+    if isinstance(error, AgentOutputError):
+        return error.error_class
+    status = _status_code(error)
+    message = str(error).lower()
+    if status == 429 or "rate limit" in message or "too many requests" in message or "quota" in message:
+        return RATE_LIMIT
+    if isinstance(error, (asyncio.TimeoutError, OSError)):    # includes ConnectionError and TimeoutError
+        return TRANSPORT
+    if (status is not None and 500 <= status < 600) or any(
+            cls.__name__ in TRANSPORT_ERROR_NAMES for cls in type(error).__mro__):
+        return TRANSPORT
+    return UNEXPECTED
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header (or attribute) on the error, if any."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """
+    Per-model breaker: after `failure_threshold` consecutive transport or
+    rate-limit failures the model is skipped for `cooldown` seconds. Then it
+    is half-open: exactly one trial call is let through and everyone else is
+    refused until that trial reports success (closed) or failure (open again).
+    A trial that never reports back, e.g. because it was cancelled, expires
+    after another `cooldown`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._trial_started: Dict[str, float] = {}
+
+    def allow(self, key: str) -> bool:
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return True
+        now = time.monotonic()
+        trial_started = self._trial_started.get(key)
+        if trial_started is not None and now - trial_started < self.cooldown:
+            return False        # a trial call is in flight
+        if now - opened_at >= self.cooldown:
+            self._trial_started[key] = now
+            return True
+        return False
+
+    def record_success(self, key: str):
+        self._failures.pop(key, None)
+        self._opened_at.pop(key, None)
+        self._trial_started.pop(key, None)
+
+    def record_failure(self, key: str):
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        if self._trial_started.pop(key, None) is not None:
+            logger.warning(f"Trial call to '{key}' failed; skipping it for another {self.cooldown:.0f}s.")
+            self._opened_at[key] = time.monotonic()
+        elif failures >= self.failure_threshold and key not in self._opened_at:
+            logger.warning(f"Circuit opened for '{key}' after {failures} consecutive failures; "
+                           f"skipping it for {self.cooldown:.0f}s.")
+            self._opened_at[key] = time.monotonic()
+
+class RetryPolicy:
+    """Attempt limits and backoff with jitter per error class (settings.retry)."""
+
+    def __init__(self, retry_config: Dict):
+        self.policies = {
+            error_class: {**defaults, **retry_config.get(error_class, {})}
+            for error_class, defaults in DEFAULT_POLICIES.items()
+        }
+        breaker_config = retry_config.get("circuit_breaker", {})
+        self.breaker = CircuitBreaker(
+            breaker_config.get("failure_threshold", 5),
+            breaker_config.get("cooldown", 60.0),
+        )
+
+    def attempts(self, error_class: str) -> int:
+        return self.policies[error_class]["attempts"]
+
+    def delay(self, error_class: str, retry_number: int, requested: Optional[float] = None) -> float:
+        """
+        Exponential backoff with equal jitter: half the capped delay plus a
+        random share of the other half. A Retry-After request is honoured if longer.
+        """
+        policy = self.policies[error_class]
+        capped = min(policy["max_delay"], policy["base_delay"] * 2 ** retry_number)
+        delay = capped / 2 + random.uniform(0, capped / 2)
+        if requested is not None:
+            delay = max(delay, min(requested, MAX_RETRY_AFTER))
+        return delay
+
+def repair_payload(payload: Dict, response: Any) -> Dict:
+    """The original request plus the unusable answer and an instruction to fix its format."""
+    previous = response if isinstance(response, str) else str(response)
+    return {**payload, "previous_response": previous[:2000], "repair_instruction": REPAIR_INSTRUCTION}
+
+_policy: Optional[RetryPolicy] = None
+_policy_config_key = None
+
+def get_retry_policy(config: Dict) -> RetryPolicy:
+    """The process-wide policy (and its circuit breaker), rebuilt when the config changes."""
+    global _policy, _policy_config_key
+    retry_config = config.get("settings", {}).get("retry", {})
+    config_key = json.dumps(retry_config, sort_keys=True, default=str)
+    if _policy is None or _policy_config_key != config_key:
+        _policy = RetryPolicy(retry_config)
+        _policy_config_key = config_key
+    return _policy
+
+async def backoff(policy: RetryPolicy, error_class: str, retry_number: int, error: BaseException):
+    delay = policy.delay(error_class, retry_number, retry_after(error))
+    if delay > 0:
+        logger.debug(f"Backing off {delay:.2f}s after {error_class} error.")
+        await asyncio.sleep(delay)
@@ -0,0 +1,251 @@
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.sql_lexer import Token, tokenize
+from core.validator import syntax_check_trusted, validate_sql
+
+logger = logging.getLogger(__name__)
+
+# Only plain DML is rewritten without an agent; DDL and PL/SQL always go to the LLMs.
+DML_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+# Renames that are always correct in PostgreSQL, as (from, to, applies to function calls only).
+BUILTIN_RULES = [
+    ("NVL", "COALESCE", True),
+    ("SYSDATE", "CURRENT_TIMESTAMP", False),
+    ("SYSTIMESTAMP", "CURRENT_TIMESTAMP", False),
+    ("VARCHAR2", "VARCHAR", False),
+    ("NVARCHAR2", "VARCHAR", False),
+]
+
+# Renamed only outside date arithmetic: Oracle adds days to a date, while
+# PostgreSQL rejects CURRENT_TIMESTAMP - 30 (timestamptz minus integer).
+DATE_WORDS = {"SYSDATE", "SYSTIMESTAMP"}
+
+# Functions that take the same arguments and mean the same thing in both
+# databases. Any other call (and any package-qualified call) goes to the LLMs.
+SAFE_FUNCTIONS = {
+    "COALESCE", "NULLIF", "UPPER", "LOWER", "LENGTH", "TRIM", "LTRIM", "RTRIM", "LPAD", "RPAD",
+    "ABS", "ROUND", "CEIL", "FLOOR", "MOD", "POWER", "SQRT", "SIGN",
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "ROW_NUMBER", "RANK", "DENSE_RANK",
+}
+# Keywords that may stand right before '(' without being a function call.
+PAREN_KEYWORDS = {
+    "IN", "EXISTS", "VALUES", "AS", "OVER", "AND", "OR", "NOT", "ON", "USING", "WHERE", "FROM",
+    "JOIN", "SELECT", "UNION", "ALL", "ANY", "SOME", "SET", "THEN", "ELSE", "WHEN", "BY", "IS",
+}
+# Qualifiers of Oracle-supplied packages (DBMS_RANDOM.VALUE, UTL_RAW.CAST_TO_RAW, ...).
+_PACKAGE = re.compile(r"^(?:(?:DBMS|UTL|APEX|OWA|CTX|ORD|SDO)_\w+|SYS|HTP|HTF|STANDARD)$", re.IGNORECASE)
+
+# Words that have no direct PostgreSQL equivalent or differ in meaning.
+ORACLE_ONLY_WORDS = {
+    "NVL", "NVL2", "DECODE", "SYSDATE", "SYSTIMESTAMP", "ROWNUM", "ROWID", "DUAL",
+    "VARCHAR2", "NVARCHAR2", "NUMBER", "CLOB", "NCLOB", "BLOB", "RAW", "LONG",
+    "CONNECT", "PRIOR", "LEVEL", "MINUS", "MERGE", "NEXTVAL", "CURRVAL",
+    "SYS_GUID", "TRUNC", "ADD_MONTHS", "MONTHS_BETWEEN", "LAST_DAY", "INSTR",
+    "TO_NUMBER", "LISTAGG", "REGEXP_LIKE", "BULK", "RETURNING", "PIVOT", "UNPIVOT",
+}
+
+# Constructs whose conversion changes the statement's shape; a learned one-word
+# rule for them (e.g. DECODE -> CASE) is never applied mechanically.
+STRUCTURAL_WORDS = {
+    "DECODE", "NVL2", "ROWNUM", "ROWID", "DUAL", "CONNECT", "PRIOR", "LEVEL", "MERGE",
+    "NEXTVAL", "CURRVAL", "TRUNC", "ADD_MONTHS", "MONTHS_BETWEEN", "LAST_DAY", "INSTR",
+    "TO_NUMBER", "LISTAGG", "REGEXP_LIKE", "BULK", "RETURNING", "PIVOT", "UNPIVOT",
+}
+# PostgreSQL special forms with their own syntax; renaming into them is never safe.
+STRUCTURAL_TARGETS = {"CASE", "CAST", "EXTRACT", "LIMIT", "OFFSET", "FETCH", "JOIN", "INTERVAL", "WITH"}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_$#]*$")
+_REPLACEMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(?: [A-Za-z_][A-Za-z0-9_]*)*$")
+
+def _neighbours(tokens: List[Token]) -> Tuple[List[int], List[int]]:
+    """Index of the previous and next significant token for every token (-1 if none)."""
+    n = len(tokens)
+    previous, following = [-1] * n, [-1] * n
+    last = -1
+    for i, token in enumerate(tokens):
+        previous[i] = last
+        if token.kind not in ("ws", "comment"):
+            last = i
+    last = -1
+    for i in range(n - 1, -1, -1):
+        following[i] = last
+        if tokens[i].kind not in ("ws", "comment"):
+            last = i
+    return previous, following
+
+def oracle_constructs(sql: str, allowed_calls: Iterable[str] = ()) -> List[str]:
+    """
+    Oracle-only constructs left in `sql`: the words above, (+) outer joins,
+    q'...' literals, bind variables, @dblink references, PL/SQL blocks, calls
+    to functions outside SAFE_FUNCTIONS and `allowed_calls`, and references
+    into Oracle packages. Also syntax that parses in both databases but means
+    something else: '' (NULL in Oracle), || (ignores NULLs in Oracle) and
+    division of integer literals (integer division in PostgreSQL). An empty
+    list means the statement should run unchanged on PostgreSQL.
+    """
+    tokens = [t for t in tokenize(sql) if t.kind not in ("ws", "comment")]
+    allowed = SAFE_FUNCTIONS | {name.upper() for name in allowed_calls}
+    found = []
+    if tokens and tokens[0].kind == "word" and tokens[0].text.upper() not in DML_KEYWORDS:
+        found.append(tokens[0].text.upper())
+    for i, token in enumerate(tokens):
+        previous = tokens[i - 1] if i > 0 else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.kind == "word":
+            word = token.text.upper()
+            qualified = previous is not None and previous.text == "."
+            if word in ORACLE_ONLY_WORDS or word in ("BEGIN", "DECLARE"):
+                found.append(word)
+            elif following is not None and following.text == "(":
+                name_start = i - 2 if qualified else i
+                if name_start > 0 and tokens[name_start - 1].text.upper() == "INTO":
+                    continue                # INSERT INTO [schema.]table (columns)
+                if qualified or (word not in allowed and word not in PAREN_KEYWORDS):
+                    found.append(f"call {''.join(t.text for t in tokens[max(0, name_start):i + 1])}")
+            elif following is not None and following.text == "." and not qualified and _PACKAGE.match(word):
+                found.append(f"package {token.text}")
+        elif token.kind == "string" and token.text[:2].upper() in ("Q'", "NQ"):
+            found.append("q-quote literal")
+        elif token.kind == "string" and token.text == "''":
+            found.append("empty string literal")
+        elif token.text == "||":
+            found.append("|| concatenation")
+        elif (token.text == "/" and previous is not None and following is not None
+              and previous.kind == "number" and following.kind == "number"
+              and previous.text.isdigit() and following.text.isdigit()):
+            found.append("integer division")
+        elif token.kind == "bind":
+            found.append("bind variable")
+        elif token.kind == "symbol" and token.text == "@":
+            found.append("database link")
+        elif (token.text == "+" and 0 < i < len(tokens) - 1
+              and tokens[i - 1].text == "(" and tokens[i + 1].text == ")"):
+            found.append("(+) outer join")
+    return list(dict.fromkeys(found))
+
+def knowledge_rules(tree: Dict[str, List[Dict[str, str]]]) -> List[Tuple[str, str, bool]]:
+    """
+    High-confidence rules from the knowledge tree: a single identifier renamed
+    to a keyword or identifier (optionally both written as 'NAME(' calls),
+    with exactly one known replacement and not a structural construct.
+    """
+    rules = []
+    for key, entries in tree.items():
+        targets = {e["to"].strip() for e in entries}
+        if len(targets) != 1:
+            continue
+        target = targets.pop()
+        call = key.endswith("(") and target.endswith("(")
+        source = key[:-1].strip() if call else key.strip()
+        target = target[:-1].strip() if call else target
+        if source.upper() in STRUCTURAL_WORDS or target.split(" ")[0].upper() in STRUCTURAL_TARGETS:
+            continue
+        if _IDENTIFIER.match(source) and _REPLACEMENT.match(target):
+            rules.append((source, target, call))
+    return rules
+
+def _star_before(tokens: List[Token], previous: List[int], index: int) -> bool:
+    """Whether the select list ending at tokens[index] ('FROM') contains a '*' at its own level."""
+    depth = 0
+    i = previous[index]
+    while i >= 0:
+        text = tokens[i].text
+        if text == ")":
+            depth += 1
+        elif text == "(":
+            if depth == 0:
+                return False
+            depth -= 1
+        elif depth == 0 and text == "*":
+            return True
+        elif depth == 0 and text.upper() == "SELECT":
+            return False
+        i = previous[i]
+    return False
+
+def rewrite(sql: str, rules: List[Tuple[str, str, bool]]) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Apply token-level renames and drop 'FROM dual' (kept when the select list
+    has a '*', which PostgreSQL rejects without FROM). Strings, comments and
+    quoted identifiers are never touched. Returns the SQL and the applied
+    transformations in the converters' {from, to, context} format.
+    """
+    renames = {source.upper(): (target, call) for source, target, call in rules}
+    tokens = list(tokenize(sql))
+    previous, following = _neighbours(tokens)
+    applied: Dict[Tuple[str, str], Dict[str, str]] = {}
+    out = []
+    skip_until = -1
+    for i, token in enumerate(tokens):
+        if i <= skip_until:
+            continue
+        if token.kind != "word":
+            out.append(token.text)
+            continue
+        word = token.text.upper()
+        next_text = tokens[following[i]].text if following[i] >= 0 else None
+        if previous[i] >= 0 and tokens[previous[i]].text == ".":
+            out.append(token.text)        # column or package member, not a keyword
+            continue
+
+        if word == "FROM" and next_text is not None and next_text.upper() == "DUAL":
+            dual_index = following[i]
+            after = tokens[following[dual_index]].text if following[dual_index] >= 0 else None
+            if ((after is None or after in (";", ")") or after.upper() in ("UNION", "WHERE"))
+                    and not _star_before(tokens, previous, i)):
+                # Remove 'FROM' and 'dual' plus the whitespace before 'FROM'.
+                while out and out[-1].isspace():
+                    out.pop()
+                skip_until = dual_index
+                applied[("FROM DUAL", "")] = {"from": "FROM DUAL", "to": "", "context": "dummy table"}
+                continue
+
+        if word in renames:
+            target, call = renames[word]
+            previous_text = tokens[previous[i]].text if previous[i] >= 0 else None
+            if word in DATE_WORDS and (previous_text in ("+", "-") or next_text in ("+", "-")):
+                out.append(token.text)        # left for the LLM; see DATE_WORDS
+                continue
+            if not call or next_text == "(":
+                out.append(target)
+                applied[(word, target)] = {"from": word, "to": target, "context": "function call" if call else "keyword"}
+                continue
+        out.append(token.text)
+    return "".join(out), list(applied.values())
+
+_rules_for = (None, [])
+
+def deterministic_rules(store, use_knowledge: bool = False) -> List[Tuple[str, str, bool]]:
+    """Built-in rules plus the store's high-confidence ones, recomputed when the knowledge changes."""
+    global _rules_for
+    if not use_knowledge:
+        return BUILTIN_RULES
+    key = (id(store), getattr(store, "version", None))
+    if key[1] is None or _rules_for[0] != key:
+        # Built-in rules come last so they win over learned ones for the same word.
+        _rules_for = (key, knowledge_rules(store.load_tree()) + BUILTIN_RULES)
+    return _rules_for[1]
+
+def try_deterministic(sql: str, rules: List[Tuple[str, str, bool]], trust_lexical: bool = False) -> Optional[Dict]:
+    """
+    Convert a statement without an agent, or return None when an LLM is needed:
+    it is not plain DML, Oracle-only constructs or unknown calls remain after
+    rewriting, or the result does not pass the PostgreSQL syntax check. Without
+    pglast the lexical check is only accepted with `trust_lexical`
+    (settings.validation.trust_lexical), as in run_pipeline.
+    """
+    if not syntax_check_trusted(trust_lexical):
+        return None
+    converted, applied = rewrite(sql, rules)
+    remaining = oracle_constructs(converted, (target for _, target, call in rules if call))
+    if remaining:
+        logger.debug(f"Deterministic rewrite not possible, remaining: {', '.join(remaining)}")
+        return None
+    errors = validate_sql(converted)
+    if errors:
+        logger.debug(f"Deterministic rewrite rejected by the syntax check: {'; '.join(errors)}")
+        return None
+    return {"postgresql_sql": converted, "transformations": applied, "method": "deterministic", "validation": "passed"}
@@ -1,30 +1,157 @@
 import asyncio
 import logging
 import json
-from typing import List, Dict, Any
-
-import core.knowledge
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Tuple
+
+from core.batching import batchable, get_batcher
+from core.cache import get_cache, make_result_key, make_stage_key
+from core.complexity import PIPELINE_AGENT, STANDARD_TIER, choose_refinement, evaluator_settings
+from core.dedup import get_deduper
+from core.knowledge_store import get_knowledge_store, relevant_rules
+from core.json_repair import parse_response
+from core.latency import agent_timeout, get_latency_tracker, hedge_delay, hedged, mark_service_started
+from core.prompt import build_payload, estimate_tokens, model_budget
+from core.ratelimit import agent_model, get_rate_limiters
+from core.rewriter import deterministic_rules, try_deterministic
+from core.retry import (
+    EMPTY_SQL, MALFORMED, RATE_LIMIT, TRANSPORT, UNEXPECTED, AgentOutputError, backoff, classify_error,
+    get_retry_policy, repair_payload,
+)
+from core.retrieval import get_retrieval_index, select_prompt_context
+from core.splitter import split_statements
+from core.sql_lexer import canonical_form
+from core.telemetry import AGENT_SEND, KNOWLEDGE_LOOKUP, get_telemetry, merge_summaries, summarize_span
+from core.validator import FIX_INSTRUCTION, syntax_check_trusted, validate_sql
 
 logger = logging.getLogger(__name__)
 
+# Per-file counters; each file conversion runs in its own task/context.
+_file_stats: ContextVar[Dict | None] = ContextVar("sqlporter_file_stats", default=None)
+
+def current_file_stats() -> Dict:
+    stats = _file_stats.get()
+    if stats is None:
+        stats = {"queue_wait": 0.0}
+        _file_stats.set(stats)
+    return stats
+
+@contextmanager
+def traced(config: Dict, name: str, attributes: Dict):
+    """A telemetry span (settings.telemetry) that is also summed into the current file's stats."""
+    telemetry = get_telemetry(config)
+    if telemetry is None:
+        yield attributes
+        return
+    summary = current_file_stats().setdefault("telemetry", {})
+    span_attributes = attributes
+    try:
+        with telemetry.span(name, attributes) as span_attributes:
+            yield span_attributes
+    finally:
+        summarize_span(summary, name, span_attributes)
+
+def record_retry(config: Dict, agent_name: str):
+    telemetry = get_telemetry(config)
+    if telemetry is not None:
+        telemetry.count_retries(agent_name, 1)
+        summary = current_file_stats().setdefault("telemetry", {})
+        summary["retries"] = summary.get("retries", 0) + 1
+
+async def send_to_agent(agent_instance: Any, agent_name: str, payload: Any, config: Dict,
+                        record_latency: bool = True) -> Any:
+    """
+    Send a payload to an agent, honouring the configured rate limit for its
+    model and the agent's deadline. Successful call latencies are recorded
+    unless `record_latency` is off (batched calls would skew hedging).
+    """
+    limiter = get_rate_limiters(config).for_agent(agent_name)
+    if limiter is None:
+        return await _timed_send(agent_instance, agent_name, payload, config, record_latency)
+
+    async with limiter.slot() as waited:
+        if waited > 0.001:
+            logger.debug(f"[{agent_name}] waited {waited:.3f}s for rate limiter '{limiter.key}'")
+        stats = current_file_stats()
+        stats["queue_wait"] = stats.get("queue_wait", 0.0) + waited
+        return await _timed_send(agent_instance, agent_name, payload, config, record_latency)
+
+async def _timed_send(agent_instance: Any, agent_name: str, payload: Any, config: Dict,
+                      record_latency: bool = True) -> Any:
+    mark_service_started()
+    timeout = agent_timeout(config, agent_name)
+    started = time.monotonic()
+    attributes = {"agent": agent_name, "model": agent_model(config, agent_name)}
+    with traced(config, AGENT_SEND, attributes) as span:
+        span["prompt_tokens"] = estimate_tokens(payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str))
+        try:
+            response = await asyncio.wait_for(agent_instance.send(payload), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{agent_name}] no answer within {timeout}s; giving up on this call.")
+            span["outcome"] = "timeout"
+            raise
+        span["completion_tokens"] = estimate_tokens(response if isinstance(response, str) else str(response))
+        history = getattr(agent_instance, "refinement_history", None)
+        if isinstance(history, list):
+            span["refinements"] = len(history)
+    if record_latency:
+        get_latency_tracker().record(agent_name, time.monotonic() - started)
+    return response
+
+async def run_stage(agent_instance: Any, agent_name: str, payload: Any, config: Dict, strict: bool = False) -> Dict | None:
+    """
+    Send a payload to an agent and process its response, memoizing valid results.
+    The stage cache is keyed on agent name, model, instruction and payload, so
+    unchanged stages are reused even when a later stage's settings change.
+    With `strict`, an unusable answer raises AgentOutputError instead of returning None.
+    """
+    cache_settings = config.get("settings", {}).get("cache", {})
+    stage_cache = get_cache(config, "stage_results") if cache_settings.get("stages", True) else None
+    cache_key = None
+    if stage_cache:
+        cache_key = make_stage_key(
+            agent_name,
+            agent_model(config, agent_name),
+            getattr(agent_instance, "instruction", ""),
+            payload,
+            # evaluator_optimizer agents: refinement settings change the result
+            evaluator_settings(config, agent_name),
+        )
+        cached = stage_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Stage cache hit for '{agent_name}'.")
+            stats = current_file_stats()
+            stats["stage_cache_hits"] = stats.get("stage_cache_hits", 0) + 1
+            return cached
+
+    response = await send_to_agent(agent_instance, agent_name, payload, config)
+    processed = process_agent_result(response, agent_name)
+    if stage_cache and processed and processed.get("postgresql_sql"):
+        stage_cache.put(cache_key, processed)
+    if strict and not processed:
+        raise AgentOutputError(MALFORMED, agent_name, response)
+    if strict and not processed.get("postgresql_sql"):
+        raise AgentOutputError(EMPTY_SQL, agent_name, response)
+    return processed
+
 def looks_like_sql(s: str) -> bool:
     s_upper = s.strip().upper()
     return s_upper.startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'WITH', '--', '/*'))
 
 def process_agent_result(result_data: Any, agent_name: str) -> Dict | None:
-    import json
     logger = logging.getLogger(__name__)
 
     processed_dict = None
 
     def try_parse_json_from_content(content: str, origin: str):
-        try:
-            parsed = json.loads(content.strip())
+        parsed = parse_response(content, f"{agent_name} {origin}", ("postgresql_sql",))
+        if parsed is None:
+            logger.warning(f"[{agent_name}] Failed to parse content from {origin} as JSON.")
+        else:
             logger.debug(f"[{agent_name}] Parsed JSON from {origin}: {parsed}")
-            return parsed
-        except json.JSONDecodeError as e:
-            logger.warning(f"[{agent_name}] Failed to parse content from {origin} as JSON: {e}")
-            return None
+        return parsed
 
     if isinstance(result_data, dict):
         logger.debug(f"[{agent_name}] Raw result_data (dict): {result_data}")
@@ -65,124 +192,242 @@ def process_agent_result(result_data: Any, agent_name: str) -> Dict | None:
     logger.warning(f"[{agent_name}] Could not extract valid result.")
     return None
 
-async def run_parallel_conversion(agent: Any, config: Dict, oracle_sql: str, model_map: Dict[str, str]) -> List[Dict]:
-    payload = {"oracle_sql": oracle_sql}
-    initial_tasks = []
-    executed_agent_names = []
-
-    tree = core.knowledge.load_transformations()
-    relevant_keys = core.knowledge.extract_relevant_keys(oracle_sql, list(tree.keys()))
+def collect_relevant_rules(oracle_sql: str, config: Dict) -> List[Dict]:
+    """Collect the known transformation rules that apply to the given SQL."""
+    return relevant_rules(get_knowledge_store(config), oracle_sql)
+
+async def build_prompt_context(oracle_sql: str, config: Dict) -> Dict:
+    """
+    Knowledge sent to the converters with the SQL: every rule whose key occurs
+    in it, or, with retrieval enabled, the most similar rules and past
+    conversions within the configured token budget.
+    """
+    with traced(config, KNOWLEDGE_LOOKUP, {}) as span:
+        relevant_rules = collect_relevant_rules(oracle_sql, config)
+        index = get_retrieval_index(config)
+        if index is None or not index.available:
+            span.update(method="matcher", rules=len(relevant_rules))
+            return {"known_transformations": relevant_rules}
+        retrieval_config = config.get("settings", {}).get("retrieval", {})
+        store = get_knowledge_store(config)
+        await index.refresh(store)
+        prompt_context = select_prompt_context(index, store, oracle_sql, relevant_rules, retrieval_config)
+        span.update(method="retrieval", rules=len(prompt_context["known_transformations"]),
+                    examples=len(prompt_context.get("examples", [])))
+        return prompt_context
+
+async def convert_with_retry(agent: Any, agent_name: str, payload: Dict, config: Dict) -> Dict:
+    """
+    Run one converter under the retry policy (settings.retry). Each failure is
+    classified; every class has its own attempt limit and backoff with jitter,
+    Retry-After is honoured, and a malformed answer is retried with a repair
+    prompt. settings.retry_limit caps the total number of retries. Transport and
+    rate-limit failures count towards the model's circuit breaker; unexpected
+    errors (bugs on our side) fail at once and leave the breaker alone.
+    Once the converter has been served for longer than its usual latency
+    (settings.hedging), a backup request goes to the same or a fallback
+    converter, if that one's rate limiter has a free slot, and the first
+    valid answer wins. Short statements are first offered to the converter's
+    batcher (settings.batching); they only come here if the batch lost them.
+    """
+    settings = config.get("settings", {})
+    retries = settings.get("retry_limit", 3)
+    backup_name = settings.get("hedging", {}).get("fallback", {}).get(agent_name, agent_name)
+    model = agent_model(config, agent_name) or agent_name
+    policy = get_retry_policy(config)
+
+    def backup_has_slot() -> bool:
+        limiter = get_rate_limiters(config).for_agent(backup_name)
+        return limiter is None or limiter.has_free_slot()
+
+    if batchable(config, payload):
+        async def send_batch(request: Dict) -> Any:
+            try:
+                response = await send_to_agent(agent[agent_name], agent_name, request, config, record_latency=False)
+            except Exception as e:
+                if classify_error(e) in (TRANSPORT, RATE_LIMIT):
+                    policy.breaker.record_failure(model)
+                raise
+            policy.breaker.record_success(model)
+            return response
+
+        batcher = get_batcher(config, agent_name, send_batch, model_budget(config, model))
+        if batcher:
+            batched = await batcher.submit(payload)
+            if batched:
+                return batched
+    failures: Dict[str, int] = {}
+    request = payload
+    error = None
+    for attempt in range(retries + 1):
+        if attempt and not policy.breaker.allow(model):
+            logger.info(f"Circuit open for model '{model}'; no more retries for '{agent_name}'.")
+            break
+        try:
+            processed = await hedged(
+                lambda: run_stage(agent[agent_name], agent_name, request, config, strict=True),
+                lambda: run_stage(agent[backup_name], backup_name, request, config, strict=True),
+                hedge_delay(config, agent_name),
+                backup_has_slot,
+            )
+            policy.breaker.record_success(model)
+            return processed
+        except Exception as e:
+            error_class = classify_error(e)
+            error = str(e) or type(e).__name__
+            if error_class == UNEXPECTED:
+                # Not the model's fault: no retry, and the circuit breaker is left alone.
+                logger.error(f"Agent '{agent_name}' failed with an unexpected error: {error}", exc_info=True)
+                break
+            failures[error_class] = failures.get(error_class, 0) + 1
+            logger.warning(f"Agent '{agent_name}' attempt {attempt + 1} failed ({error_class}): {error}")
+            if error_class in (TRANSPORT, RATE_LIMIT):
+                policy.breaker.record_failure(model)
+            else:
+                policy.breaker.record_success(model)    # the model answered; ends a half-open trial
+            if failures[error_class] > policy.attempts(error_class) or attempt == retries:
+                break
+            if error_class == MALFORMED:
+                request = repair_payload(payload, e.response)
+            await backoff(policy, error_class, failures[error_class] - 1, e)
+            record_retry(config, agent_name)
+    return {"error": error, "agent_name": agent_name}
+
+def consensus_quorum(config: Dict, agent_count: int) -> int | None:
+    """Number of equivalent candidates that ends the converter stage early, or None."""
+    consensus_config = config.get("settings", {}).get("consensus", {})
+    if not consensus_config.get("enabled", True):
+        return None
+    quorum = consensus_config.get("quorum", 2)
+    return quorum if 1 <= quorum <= agent_count else None
 
-    # Collect raw relevant transformation rules as list
-    relevant_rules = []
-    for key in relevant_keys:
-        if key not in tree:
+def find_consensus(candidates: List[Dict], quorum: int | None) -> List[Dict] | None:
+    """The first group of at least `quorum` successful candidates with equivalent SQL."""
+    if not quorum:
+        return None
+    groups: Dict[str, List[Dict]] = {}
+    for candidate in candidates:
+        if "error" in candidate or not candidate.get("postgresql_sql"):
             continue
-        for rule in tree[key]:
-            relevant_rules.append({
-                "from": key,
-                "to": rule["to"],
-                "context": rule.get("context", ""),
-                "example": rule.get("example", "")
-            })
-
-    # Construct payload
-    payload = {
-        "oracle_sql": oracle_sql,
-        "known_transformations": relevant_rules
-    }
-    
-    for agent_name in model_map:
+        group = groups.setdefault(canonical_form(candidate["postgresql_sql"]), [])
+        group.append(candidate)
+        if len(group) >= quorum:
+            return group
+    return None
+
+async def run_parallel_conversion(agent: Any, config: Dict, oracle_sql: str, model_map: Dict[str, str], prompt_context: Dict | None = None) -> List[Dict]:
+    """
+    Run all converters concurrently. With consensus enabled, results are
+    checked as they complete and the remaining converters are cancelled as
+    soon as a quorum of them produced equivalent SQL.
+    """
+    if prompt_context is None:
+        prompt_context = await build_prompt_context(oracle_sql, config)
+
+    # Construct one payload per converter, trimmed to its model's token budget
+    payloads = {}
+    stats = current_file_stats()
+    for agent_name, model in model_map.items():
+        payloads[agent_name], dropped = build_payload(oracle_sql, prompt_context, model_budget(config, model))
+        if dropped:
+            logger.debug(f"[{agent_name}] {dropped} rule(s) dropped to fit the prompt budget of '{model}'.")
+            stats["rules_dropped"] = max(stats.get("rules_dropped", 0), dropped)
+
+    breaker = get_retry_policy(config).breaker
+    available = [name for name in model_map if breaker.allow(model_map[name])]
+    if len(available) < len(model_map):
+        skipped = [name for name in model_map if name not in available]
+        if available:
+            logger.info(f"Circuit open, leaving out of the fan-out: {', '.join(skipped)}")
+        else:
+            available = list(model_map)     # never drop every converter; this run is the trial call
+
+    tasks = {}
+    for agent_name in available:
         try:
-            agent_instance = agent[agent_name]
-            initial_tasks.append(agent_instance.send(payload))
-            executed_agent_names.append(agent_name)
+            agent[agent_name]  # fail early if the converter is not registered
+            tasks[agent_name] = asyncio.ensure_future(
+                convert_with_retry(agent, agent_name, payloads[agent_name], config)
+            )
         except Exception as e:
             logger.error(f"Failed to prepare task for '{agent_name}': {e}", exc_info=True)
 
-    if not initial_tasks:
+    if not tasks:
         return [{"error": "No valid conversion agents found"}]
 
-    initial_results = await asyncio.gather(*initial_tasks, return_exceptions=True)
-    processed_results = [None] * len(executed_agent_names)
-    agents_to_retry = []
-
-    for i, res in enumerate(initial_results):
-        agent_name = executed_agent_names[i]
-        processed = None
-        error_for_retry = None
-
-        if isinstance(res, Exception):
-            logger.warning(f"Agent '{agent_name}' failed with exception: {res}")
-            error_for_retry = str(res)
-        else:
-            processed = process_agent_result(res, agent_name)
-            if not processed:
-                logger.warning(f"Agent '{agent_name}' result invalid.")
-                error_for_retry = f"Invalid type {type(res)}"
-
-        if processed:
-            processed_results[i] = processed
-        else:
-            agents_to_retry.append(i)
-            processed_results[i] = {"error": error_for_retry, "agent_name": agent_name, "_needs_retry": True}
-
-    retries = config.get("settings", {}).get("retry_limit", 3)
-    for attempt in range(retries):
-        if not agents_to_retry:
+    quorum = consensus_quorum(config, len(tasks))
+    finished: Dict[str, Dict] = {}
+    pending = set(tasks.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for agent_name, task in tasks.items():
+                if task in done:
+                    error = task.exception()
+                    finished[agent_name] = {"error": str(error), "agent_name": agent_name} if error else task.result()
+            if pending and find_consensus(list(finished.values()), quorum):
+                names = [name for name, task in tasks.items() if task in pending]
+                logger.info(f"Consensus of {quorum} converters reached; cancelling {', '.join(names)}.")
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    # Keep the configured converter order so downstream payloads are stable.
+    return [finished[name] for name in tasks if name in finished]
+
+async def save_knowledge(agent: Any, config: Dict, transformations: List[Dict]):
+    """Have the knowledge manager audit new transformations and store the result."""
+    try:
+        km_agent = agent["knowledge_manager"]
+        audit_result = await send_to_agent(km_agent, "knowledge_manager", {
+            "action": "audit",
+            "rules": transformations
+        }, config)
+        if isinstance(audit_result, str):
+            audit_result = parse_response(audit_result, "knowledge_manager")
+        if not isinstance(audit_result, dict):
+            raise ValueError("knowledge_manager did not return a JSON object")
+        cleaned_rules = audit_result.get("cleaned_rules", [])
+        get_knowledge_store(config).upsert(cleaned_rules)
+        logger.info(f"Knowledge cleaned and saved. Removed: {audit_result.get('removed_count', 0)}")
+    except Exception as e:
+        logger.warning(f"Knowledge cleanup failed, saving raw transformations: {e}", exc_info=True)
+        get_knowledge_store(config).upsert(transformations)
+
+async def validate_and_fix(agent: Any, config: Dict, oracle_sql: str, sql: str, model_map: Dict[str, str]) -> Tuple[str, str, List[str]]:
+    """
+    Check `sql` with the local PostgreSQL syntax validator. On errors, ask one
+    converter (settings.validation.fix_agent, default the first) to fix exactly
+    those errors, up to max_fix_attempts times.
+    Returns (sql, "passed" | "fixed" | "failed", remaining errors).
+    """
+    validation_config = config.get("settings", {}).get("validation", {})
+    errors = validate_sql(sql)
+    if not errors:
+        return sql, "passed", []
+
+    fix_agent = validation_config.get("fix_agent") or next(iter(model_map))
+    for attempt in range(validation_config.get("max_fix_attempts", 1)):
+        logger.info(f"Syntax check failed ({'; '.join(errors)}); asking '{fix_agent}' for a fix.")
+        payload = {
+            "oracle_sql": oracle_sql,
+            "previous_response": sql,
+            "repair_instruction": FIX_INSTRUCTION.format(errors="; ".join(errors)),
+        }
+        try:
+            fixed = await run_stage(agent[fix_agent], fix_agent, payload, config, strict=True)
+        except Exception as e:
+            logger.warning(f"Syntax fix by '{fix_agent}' failed: {e}")
             break
-
-        retry_tasks = []
-        retry_map = {}
-        await asyncio.sleep(1)
-
-        for original_idx in agents_to_retry:
-            agent_name = executed_agent_names[original_idx]
-            try:
-                agent_instance = agent[agent_name]
-                retry_tasks.append(agent_instance.send(payload))
-                retry_map[len(retry_tasks) - 1] = original_idx
-            except Exception as e:
-                logger.error(f"Retry error '{agent_name}': {e}", exc_info=True)
-
-        retry_results = await asyncio.gather(*retry_tasks, return_exceptions=True)
-        next_agents_to_retry = []
-
-        for task_idx, retry_res in enumerate(retry_results):
-            original_idx = retry_map[task_idx]
-            agent_name = executed_agent_names[original_idx]
-            processed = None
-            error_for_next_retry = None
-
-            if isinstance(retry_res, Exception):
-                error_for_next_retry = str(retry_res)
-            else:
-                processed = process_agent_result(retry_res, agent_name)
-                if not processed:
-                    error_for_next_retry = f"Retry {attempt + 1} invalid: {type(retry_res)}"
-
-            if processed:
-                processed_results[original_idx] = processed
-            else:
-                next_agents_to_retry.append(original_idx)
-                processed_results[original_idx]["error"] = error_for_next_retry
-
-        agents_to_retry = next_agents_to_retry
-
-    final_results = []
-    for i, result in enumerate(processed_results):
-        agent_name = executed_agent_names[i]
-        if result is None:
-            final_results.append({"error": "Processing logic error", "agent_name": agent_name})
-        elif result.pop("_needs_retry", None):
-            final_results.append(result)
-        else:
-            final_results.append(result)
-
-    return final_results
-
-async def run_pipeline(agent: Any, config: Dict, oracle_sql: str, model_map: Dict[str, str], source_file: str = "") -> Dict:
-    candidate_payloads = await run_parallel_conversion(agent, config, oracle_sql, model_map)
+        fixed_errors = validate_sql(fixed["postgresql_sql"])
+        if not fixed_errors:
+            return fixed["postgresql_sql"], "fixed", []
+        errors = fixed_errors
+    return sql, "failed", errors
+
+async def run_pipeline(agent: Any, config: Dict, oracle_sql: str, model_map: Dict[str, str], source_file: str = "", prompt_context: Dict | None = None) -> Dict:
+    candidate_payloads = await run_parallel_conversion(agent, config, oracle_sql, model_map, prompt_context)
     successful_candidates = [
         p.get("postgresql_sql", "")
         for p in candidate_payloads
@@ -193,59 +438,77 @@ async def run_pipeline(agent: Any, config: Dict, oracle_sql: str, model_map: Dic
         failed_info = [p for p in candidate_payloads if isinstance(p, dict) and "error" in p]
         return {"error": f"No valid SQL candidates. Failures: {failed_info}", "postgresql_sql": ""}
 
-    merge_payload = {
-        "oracle_sql": oracle_sql,
-        "candidates": successful_candidates
-    }
+    agreed = find_consensus(candidate_payloads, consensus_quorum(config, len(model_map)))
+    if agreed:
+        logger.info(f"{len(agreed)} converters agree; skipping merge_and_select.")
+        merged_sql = agreed[0]["postgresql_sql"]
+        merged_transformations = agreed[0].get("transformations", [])
+        if merged_transformations:
+            await save_knowledge(agent, config, merged_transformations)
+    else:
+        merge_payload = {
+            "oracle_sql": oracle_sql,
+            "candidates": successful_candidates
+        }
 
-    merged_sql = ""
-    merged_transformations = []
-    processed_merge_result = None
-    try:
-        merge_agent = agent['merge_and_select']
-        merged_result_payload = await merge_agent.send(merge_payload)
-        processed_merge_result = process_agent_result(merged_result_payload, "merge_and_select")
+        merged_sql = ""
+        merged_transformations = []
+        processed_merge_result = None
+        try:
+            merge_agent = agent['merge_and_select']
+            processed_merge_result = await run_stage(merge_agent, "merge_and_select", merge_payload, config)
 
-        if not processed_merge_result:
-            return {"error": "Merge result processing failed", "postgresql_sql": ""}
+            if not processed_merge_result:
+                return {"error": "Merge result processing failed", "postgresql_sql": ""}
 
-        merged_sql = processed_merge_result.get("postgresql_sql", "")
-        merged_transformations = processed_merge_result.get("transformations", [])
+            merged_sql = processed_merge_result.get("postgresql_sql", "")
+            merged_transformations = processed_merge_result.get("transformations", [])
 
-        if not merged_sql:
-            return {"error": "Merge agent produced empty SQL", "postgresql_sql": ""}
+            if not merged_sql:
+                return {"error": "Merge agent produced empty SQL", "postgresql_sql": ""}
 
-        if merged_transformations:
-            try:
-                km_agent = agent["knowledge_manager"]
-                audit_result = await km_agent.send({
-                    "action": "audit",
-                    "rules": merged_transformations
-                })
-                cleaned_rules = audit_result.get("cleaned_rules", [])
-                core.knowledge.save_transformations(cleaned_rules)
-                logger.info(f"Knowledge cleaned and saved. Removed: {audit_result.get('removed_count', 0)}")
-            except Exception as e:
-                logger.warning(f"Knowledge cleanup failed, saving raw transformations: {e}", exc_info=True)
-                core.knowledge.save_transformations(merged_transformations)
+            if merged_transformations:
+                await save_knowledge(agent, config, merged_transformations)
 
-    except Exception as e:
-        return {"error": f"Merge error: {e}", "postgresql_sql": ""}
+        except Exception as e:
+            return {"error": f"Merge error: {e}", "postgresql_sql": ""}
+
+    validation_config = config.get("settings", {}).get("validation", {})
+    validation, syntax_errors = "", []
+    if validation_config.get("enabled", True):
+        merged_sql, validation, syntax_errors = await validate_and_fix(agent, config, oracle_sql, merged_sql, model_map)
+
+    refinement = choose_refinement(oracle_sql, config)
+    trusted = syntax_check_trusted(validation_config.get("trust_lexical", False))
+    if validation == "failed" and refinement["agent"] is None:
+        # Never accept SQL known not to parse without the evaluator's refinement loop.
+        refinement = {**refinement, "tier": STANDARD_TIER, "agent": PIPELINE_AGENT}
+    elif (validation in ("passed", "fixed") and trusted and refinement["agent"] is not None
+          and refinement["complexity"] < validation_config.get("short_circuit_below", 8)):
+        refinement = {**refinement, "tier": "validated", "agent": None}
+    logger.info(f"{source_file or 'SQL input'}: complexity {refinement['complexity']}, refinement tier '{refinement['tier']}'.")
+    if refinement["agent"] is None:
+        return {
+            "postgresql_sql": merged_sql,
+            "transformations": merged_transformations,
+            "refinement": refinement["tier"],
+            "complexity": refinement["complexity"],
+            "validation": validation,
+        }
 
     pipeline_payload = {
         "oracle_sql": oracle_sql,
         "postgresql_sql": merged_sql
     }
+    if syntax_errors:
+        pipeline_payload["syntax_errors"] = syntax_errors
 
     final_result_payload = {}
     try:
         logger.debug("[DEBUG] Entering pipeline agent execution block")
         logger.debug(f"[DEBUG] agent object: {agent}")
-        pipeline_agent = agent['oracle_to_pg_pipeline']
-        final_result_payload_raw = await pipeline_agent.send(pipeline_payload)
-        logger.debug(f"Final pipeline raw output: {final_result_payload_raw}")
-
-        final_result_payload = process_agent_result(final_result_payload_raw, "oracle_to_pg_pipeline")
+        pipeline_agent = agent[refinement["agent"]]
+        final_result_payload = await run_stage(pipeline_agent, refinement["agent"], pipeline_payload, config)
 
         if final_result_payload is None:
             logger.warning("Pipeline result processing failed, falling back to merge result.")
@@ -267,6 +530,9 @@ async def run_pipeline(agent: Any, config: Dict, oracle_sql: str, model_map: Dic
             "transformations": merged_transformations,
         }
 
+    final_result_payload["refinement"] = refinement["tier"]
+    final_result_payload["complexity"] = refinement["complexity"]
+    final_result_payload["validation"] = validation
     return final_result_payload
 
 async def run_single_sql(agent: Any, config: Dict, oracle_sql: str, source_file: str = "") -> Dict:
@@ -274,7 +540,120 @@ async def run_single_sql(agent: Any, config: Dict, oracle_sql: str, source_file:
     if not model_map:
         return {"error": "Missing 'models' in config", "postgresql_sql": ""}
 
-    from core.app import fast_agent_instance
-    logger.debug(f"[DEBUG] fast_agent_instance registered agents: {list(fast_agent_instance.agents.keys())}")
-    result_payload = await run_pipeline(agent, config, oracle_sql, model_map, source_file)
+    deduper = get_deduper(config)
+    if deduper is None:
+        return await convert_sql(agent, config, oracle_sql, model_map, source_file)
+    return await deduper.run(oracle_sql, lambda: convert_sql(agent, config, oracle_sql, model_map, source_file))
+
+async def convert_sql(agent: Any, config: Dict, oracle_sql: str, model_map: Dict[str, str], source_file: str = "") -> Dict:
+    stats = {"queue_wait": 0.0}
+    _file_stats.set(stats)
+
+    deterministic_config = config.get("settings", {}).get("deterministic", {})
+    if deterministic_config.get("enabled", True):
+        rules = deterministic_rules(get_knowledge_store(config), deterministic_config.get("use_knowledge", False))
+        trust_lexical = config.get("settings", {}).get("validation", {}).get("trust_lexical", False)
+        result_payload = try_deterministic(oracle_sql, rules, trust_lexical)
+        if result_payload is not None:
+            logger.info(f"{source_file or 'SQL input'}: converted deterministically; skipping agents.")
+            result_payload.update({"deterministic": True, "queue_wait": 0.0, "rules_dropped": 0})
+            return result_payload
+
+    prompt_context = await build_prompt_context(oracle_sql, config)
+    result_cache = get_cache(config)
+    cache_key = make_result_key(oracle_sql, config, prompt_context) if result_cache else None
+    if result_cache:
+        cached_payload = result_cache.get(cache_key)
+        if cached_payload is not None:
+            logger.info(f"Result cache hit for {source_file or 'SQL input'}; skipping agents.")
+            cached_payload["cached"] = True
+            cached_payload["queue_wait"] = 0.0
+            cached_payload["rules_dropped"] = 0
+            if "telemetry" in stats:
+                cached_payload["telemetry"] = stats["telemetry"]
+            return cached_payload
+
+    result_payload = await run_pipeline(agent, config, oracle_sql, model_map, source_file, prompt_context)
+    if result_payload.get("postgresql_sql") and not result_payload.get("error"):
+        if result_cache:
+            result_cache.put(cache_key, result_payload)
+        index = get_retrieval_index(config)
+        if index is not None:
+            index.add_example(oracle_sql, result_payload["postgresql_sql"])
+
+    result_payload["queue_wait"] = round(stats["queue_wait"], 3)
+    result_payload["rules_dropped"] = stats.get("rules_dropped", 0)
+    if "telemetry" in stats:
+        result_payload["telemetry"] = stats["telemetry"]
     return result_payload
+
+RATING_ORDER = ["POOR", "FAIR", "GOOD", "EXCELLENT"]
+
+async def run_split_sql(agent: Any, config: Dict, oracle_sql: str, source_file: str = "") -> Dict:
+    """
+    Split a script into statements and convert them concurrently through the pipeline.
+    Returns one payload for the file: the converted statements in original order
+    under "statements", plus the joined SQL, worst rating and total queue wait.
+    """
+    settings = config.get("settings", {})
+    statements = list(split_statements(oracle_sql)) if settings.get("split_statements", True) else [oracle_sql]
+    if len(statements) <= 1:
+        return await run_single_sql(agent, config, oracle_sql, source_file)
+
+    logger.info(f"{source_file}: split into {len(statements)} statements.")
+    semaphore = asyncio.Semaphore(max(1, settings.get("max_concurrent_statements", 4)))
+
+    async def convert_statement(index: int, statement: str) -> Dict:
+        async with semaphore:
+            try:
+                return await run_single_sql(agent, config, statement, f"{source_file}#{index + 1}")
+            except Exception as e:
+                logger.error(f"{source_file}: statement {index + 1} failed: {e}", exc_info=True)
+                return {"error": str(e), "postgresql_sql": ""}
+
+    results = await asyncio.gather(*(convert_statement(i, stmt) for i, stmt in enumerate(statements)))
+
+    statement_reports = []
+    errors = []
+    ratings = []
+    for index, (statement, result) in enumerate(zip(statements, results), 1):
+        converted = result.get("postgresql_sql", "")
+        if result.get("cached"):
+            status = "cached"
+        elif result.get("deduplicated"):
+            status = "deduplicated"
+        elif result.get("deterministic"):
+            status = "deterministic"
+        else:
+            status = "success" if converted else "incomplete"
+        if result.get("error"):
+            errors.append(f"#{index}: {result['error']}")
+        if result.get("RATING"):
+            ratings.append(result["RATING"])
+        statement_reports.append({
+            "index": index,
+            "status": status,
+            "oracle_sql": statement,
+            "postgresql_sql": converted,
+            "error": result.get("error", ""),
+            "rating": result.get("RATING", ""),
+            "refinement": result.get("refinement", ""),
+            "complexity": result.get("complexity"),
+            "validation": result.get("validation", ""),
+        })
+
+    known_ratings = [r for r in ratings if r in RATING_ORDER]
+    telemetry = merge_summaries(r["telemetry"] for r in results if r.get("telemetry"))
+    file_payload = {
+        "postgresql_sql": "\n\n".join(s["postgresql_sql"] for s in statement_reports if s["postgresql_sql"]),
+        "statements": statement_reports,
+        "error": "; ".join(errors),
+        "RATING": min(known_ratings, key=RATING_ORDER.index) if known_ratings else "",
+        "cached": all(s["status"] == "cached" for s in statement_reports),
+        "deterministic": all(s["status"] == "deterministic" for s in statement_reports),
+        "queue_wait": round(sum(r.get("queue_wait", 0.0) for r in results), 3),
+        "rules_dropped": sum(r.get("rules_dropped", 0) for r in results),
+    }
+    if telemetry:
+        file_payload["telemetry"] = telemetry
+    return file_payload
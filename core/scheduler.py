@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+async def run_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    max_concurrency: int = 1,
+    max_buffered: int | None = None,
+) -> AsyncIterator[Tuple[T, R]]:
+    """
+    Run `worker` over `items` keeping at most `max_concurrency` calls in flight.
+    Results are yielded as (item, result) pairs in the same order as `items`,
+    regardless of the order in which the workers finish.
+
+    Ordering has a cost: results that finish behind a slow item wait for it.
+    At most `max_buffered` items (default 2 * max_concurrency) are started
+    but not yet yielded; beyond that no new item is started until the head
+    finishes, so memory stays bounded while throughput drops behind a
+    straggler.
+    """
+    max_concurrency = max(1, int(max_concurrency or 1))
+    max_buffered = max(max_concurrency, max_buffered or 2 * max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pending: deque = deque()
+
+    async def _run(item: T) -> R:
+        try:
+            return await worker(item)
+        finally:
+            semaphore.release()
+
+    try:
+        for item in items:
+            while len(pending) >= max_buffered:
+                done_item, task = pending[0]
+                result = await task
+                pending.popleft()
+                yield done_item, result
+            await semaphore.acquire()
+            pending.append((item, asyncio.create_task(_run(item))))
+
+            while pending and pending[0][1].done():
+                done_item, task = pending.popleft()
+                yield done_item, task.result()
+
+        while pending:
+            done_item, task = pending[0]
+            result = await task
+            pending.popleft()
+            yield done_item, result
+    finally:
+        for _, task in pending:
+            if not task.done():
+                task.cancel()
+        if pending:
+            logger.debug(f"Cancelled {len(pending)} in-flight task(s).")
@@ -0,0 +1,107 @@
+from typing import Iterator, List
+
+from core.sql_lexer import Token, tokenize
+
+# Objects whose body is PL/SQL: their inner ';' do not end the statement.
+PLSQL_OBJECTS = {"PROCEDURE", "FUNCTION", "PACKAGE", "TRIGGER", "TYPE", "LIBRARY", "JAVA"}
+_CREATE_MODIFIERS = {"OR", "REPLACE", "EDITIONABLE", "NONEDITIONABLE", "EDITIONING", "FORCE", "NOFORCE"}
+
+def _is_plsql_block(leading_words: List[str]) -> bool:
+    if not leading_words:
+        return False
+    if leading_words[0] in ("DECLARE", "BEGIN"):
+        return True
+    if leading_words[0] != "CREATE":
+        return False
+    for word in leading_words[1:]:
+        if word in _CREATE_MODIFIERS:
+            continue
+        return word in PLSQL_OBJECTS
+    return False
+
+def _has_code(tokens: List[Token]) -> bool:
+    return any(t.kind not in ("ws", "comment") for t in tokens)
+
+def _text(tokens: List[Token]) -> str:
+    return "".join(t.text for t in tokens).strip()
+
+def split_statements(sql: str) -> Iterator[str]:
+    """
+    Split an Oracle script into statements, lazily.
+
+    Plain SQL ends at ';'. PL/SQL units (CREATE [OR REPLACE] PROCEDURE /
+    FUNCTION / PACKAGE [BODY] / TRIGGER / TYPE, anonymous DECLARE / BEGIN
+    blocks) end only at a '/' alone on its line, or at end of input. A '/'
+    line also ends a plain statement that has no ';'. Strings and comments
+    are never split; comments before a statement stay with it, and trailing
+    comments are attached to the last statement.
+    """
+    current: List[Token] = []
+    leading_words: List[str] = []
+    pending: str | None = None          # one statement held back for trailing comments
+    at_line_start = True
+    slash_index = None                  # index in `current` of a '/' that may be a terminator
+
+    def flush(tokens: List[Token]):
+        nonlocal pending
+        text = _text(tokens)
+        if not text:
+            return None
+        if not _has_code(tokens):
+            # Comment-only fragment: keep it for the next statement.
+            return tokens
+        previous, pending = pending, text
+        return previous
+
+    carried: List[Token] = []
+    for token in tokenize(sql):
+        if slash_index is not None:
+            if token.kind == "ws" and "\n" in token.text:
+                statement_tokens = carried + current[:slash_index]
+                current, carried, leading_words, slash_index = [], [], [], None
+                at_line_start = True
+                result = flush(statement_tokens)
+                if isinstance(result, list):
+                    carried = result
+                elif result is not None:
+                    yield result
+                continue
+            if token.kind != "ws":
+                slash_index = None      # something follows the '/': it was an operator
+
+        current.append(token)
+
+        if token.kind == "ws":
+            if "\n" in token.text:
+                at_line_start = True
+            continue
+        if token.kind == "comment":
+            continue
+
+        if token.kind == "word" and len(leading_words) < 6:
+            leading_words.append(token.text.upper())
+
+        if token.kind == "symbol" and token.text == "/" and at_line_start:
+            slash_index = len(current) - 1
+        elif token.kind == "symbol" and token.text == ";" and not _is_plsql_block(leading_words):
+            statement_tokens = carried + current
+            current, carried, leading_words = [], [], []
+            result = flush(statement_tokens)
+            if isinstance(result, list):
+                carried = result
+            elif result is not None:
+                yield result
+        at_line_start = False
+
+    if slash_index is not None:
+        current = current[:slash_index]
+    remainder = carried + current
+    if _has_code(remainder):
+        if pending is not None:
+            yield pending
+        yield _text(remainder)
+    elif pending is not None:
+        trailing = _text(remainder)
+        yield f"{pending}\n{trailing}" if trailing else pending
+    elif _text(remainder):
+        yield _text(remainder)
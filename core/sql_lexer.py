@@ -0,0 +1,63 @@
+import re
+from typing import Iterator, NamedTuple
+
+class Token(NamedTuple):
+    kind: str   # ws, comment, string, quoted_ident, number, word, bind, symbol
+    text: str
+    start: int
+
+_Q_QUOTE_CLOSERS = {"[": "]", "(": ")", "{": "}", "<": ">"}
+
+# One alternation tried at each token start; group names are the token kinds.
+# q'...' literals are only recognised by their prefix here because their
+# closing delimiter depends on the opening one.
+_TOKEN = re.compile(r"""
+      (?P<ws>\s+)
+    | (?P<comment>--[^\n]*|/\*(?:[^*]|\*(?!/))*(?:\*/|\Z))
+    | (?P<qstring>[nN]?[qQ]'.)
+    | (?P<string>[nN]?'(?:[^']|'')*(?:'|\Z))
+    | (?P<quoted_ident>"(?:[^"]|"")*(?:"|\Z))
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$#]*)
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<bind>:(?:[A-Za-z_][A-Za-z0-9_$#]*|\d+))
+    | (?P<symbol>\|\||::|:=|=>|<>|!=|\^=|<=|>=|\.\.|\*\*|.)
+""", re.VERBOSE | re.DOTALL)
+
+def tokenize(sql: str) -> Iterator[Token]:
+    """
+    Lazily split Oracle SQL / PL/SQL text into tokens.
+    String literals (including q'[...]' and N'...'), quoted identifiers and
+    comments are kept whole, so callers never see keywords inside them.
+    Concatenating the text of all tokens reproduces the input exactly.
+    """
+    pos = 0
+    n = len(sql)
+    match_token = _TOKEN.match
+    while pos < n:
+        match = match_token(sql, pos)
+        kind = match.lastgroup
+        end = match.end()
+        if kind == "qstring":
+            # Alternative quoting: q'[...]', Q'{...}', nq'!...!'
+            opener = sql[end - 1]
+            closer = _Q_QUOTE_CLOSERS.get(opener, opener)
+            close = sql.find(closer + "'", end)
+            end = n if close == -1 else close + 2
+            kind = "string"
+        yield Token(kind, sql[pos:end], pos)
+        pos = end
+
+def significant_tokens(sql: str) -> Iterator[Token]:
+    """Tokens without whitespace and comments."""
+    return (t for t in tokenize(sql) if t.kind not in ("ws", "comment"))
+
+def canonical_form(sql: str) -> str:
+    """
+    Significant tokens joined by single spaces with unquoted words upper-cased
+    and a trailing ';' dropped: equal for statements that differ only in
+    formatting, comments or keyword case.
+    """
+    tokens = [t.text.upper() if t.kind == "word" else t.text for t in significant_tokens(sql)]
+    if tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(tokens)
@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import metrics, trace
+except ImportError:  # spans still go to the local sink
+    metrics = None
+    trace = None
+
+TELEMETRY_FILENAME = "telemetry.jsonl"
+INSTRUMENTATION_NAME = "sqlporter"
+
+AGENT_SEND = "agent.send"
+KNOWLEDGE_LOOKUP = "knowledge.lookup"
+
+class Telemetry:
+    """
+    Timed spans around agent calls and knowledge lookups. Every span is
+    appended to a local JSONL sink and, when OpenTelemetry is installed, also
+    emitted through the global tracer and meter (no-ops unless a provider is
+    configured, e.g. by running under `opentelemetry-instrument`).
+    """
+
+    def __init__(self, sink_path: Optional[Path]):
+        self.sink_path = sink_path
+        self._handle = None
+        self._tracer = trace.get_tracer(INSTRUMENTATION_NAME) if trace else None
+        self._instruments = {}
+        if metrics:
+            meter = metrics.get_meter(INSTRUMENTATION_NAME)
+            self._instruments = {
+                AGENT_SEND: meter.create_histogram("sqlporter.agent.duration", unit="s",
+                                                   description="Latency of one agent call"),
+                KNOWLEDGE_LOOKUP: meter.create_histogram("sqlporter.knowledge.lookup.duration", unit="s",
+                                                         description="Time spent selecting known rules"),
+                "tokens": meter.create_counter("sqlporter.agent.tokens", unit="{token}",
+                                               description="Estimated prompt and completion tokens"),
+                "retries": meter.create_counter("sqlporter.agent.retries", description="Converter retries"),
+            }
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Time the block. The yielded dict holds the span's attributes and may be
+        filled in by the block (tokens, outcome, ...); "duration" is added on exit.
+        """
+        attributes = dict(attributes or {})
+        otel_span = self._tracer.start_as_current_span(name) if self._tracer else None
+        active = otel_span.__enter__() if otel_span else None
+        started_at = time.time()
+        started = time.monotonic()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes.setdefault("outcome", type(e).__name__)
+            raise
+        finally:
+            attributes.setdefault("outcome", "ok")
+            attributes["duration"] = round(time.monotonic() - started, 6)
+            if active is not None:
+                for key, value in attributes.items():
+                    if isinstance(value, (str, bool, int, float)):
+                        active.set_attribute(f"sqlporter.{key}", value)
+                otel_span.__exit__(None, None, None)
+            self._record_metrics(name, attributes)
+            self._write({"span": name, "start": round(started_at, 6), **attributes})
+
+    def count_retries(self, agent_name: str, retries: int):
+        if retries and "retries" in self._instruments:
+            self._instruments["retries"].add(retries, {"agent": agent_name})
+
+    def _record_metrics(self, name: str, attributes: Dict):
+        histogram = self._instruments.get(name)
+        if histogram is None:
+            return
+        labels = {k: attributes[k] for k in ("agent", "model", "outcome") if attributes.get(k)}
+        histogram.record(attributes["duration"], labels)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if attributes.get(kind):
+                self._instruments["tokens"].add(attributes[kind], {**labels, "type": kind.split("_")[0]})
+
+    def _write(self, record: Dict):
+        if self.sink_path is None:
+            return
+        if self._handle is None:
+            self.sink_path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.sink_path, "w", encoding="utf-8")
+        self._handle.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+def summarize_span(summary: Dict, name: str, attributes: Dict):
+    """Fold one span into a per-file telemetry summary."""
+    if name == AGENT_SEND:
+        summary["agent_calls"] = summary.get("agent_calls", 0) + 1
+        summary["agent_seconds"] = round(summary.get("agent_seconds", 0.0) + attributes["duration"], 6)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            summary[kind] = summary.get(kind, 0) + attributes.get(kind, 0)
+        agent = summary.setdefault("agents", {}).setdefault(attributes.get("agent", ""), {"calls": 0, "seconds": 0.0})
+        agent["calls"] += 1
+        agent["seconds"] = round(agent["seconds"] + attributes["duration"], 6)
+        if "refinements" in attributes:
+            summary["refinements"] = summary.get("refinements", 0) + attributes["refinements"]
+    elif name == KNOWLEDGE_LOOKUP:
+        summary["knowledge_lookups"] = summary.get("knowledge_lookups", 0) + 1
+        summary["knowledge_seconds"] = round(summary.get("knowledge_seconds", 0.0) + attributes["duration"], 6)
+
+def merge_summaries(summaries) -> Dict:
+    """Add up the per-statement telemetry summaries of one file."""
+    merged: Dict = {}
+    for summary in summaries:
+        for key, value in summary.items():
+            if key == "agents":
+                agents = merged.setdefault("agents", {})
+                for agent_name, counts in value.items():
+                    total = agents.setdefault(agent_name, {"calls": 0, "seconds": 0.0})
+                    total["calls"] += counts["calls"]
+                    total["seconds"] = round(total["seconds"] + counts["seconds"], 6)
+            else:
+                merged[key] = round(merged.get(key, 0) + value, 6)
+    return merged
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_path = None
+
+def get_telemetry(config: Dict) -> Optional[Telemetry]:
+    """The process-wide instrumentation (settings.telemetry), or None if it is off."""
+    global _telemetry, _telemetry_path
+    telemetry_config = config.get("settings", {}).get("telemetry", {})
+    if not telemetry_config.get("enabled", False):
+        return None
+    path = telemetry_config.get("path") or str(
+        Path(config.get("paths", {}).get("report_dir", "./reports")) / TELEMETRY_FILENAME)
+    if _telemetry is None or _telemetry_path != path:
+        if _telemetry is not None:
+            _telemetry.close()
+        _telemetry = Telemetry(Path(path))
+        _telemetry_path = path
+    return _telemetry
+
+def close_telemetry():
+    if _telemetry is not None:
+        _telemetry.close()
@@ -0,0 +1,91 @@
+import logging
+from typing import List
+
+from core.sql_lexer import tokenize
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pglast import parse_sql
+    from pglast.parser import ParseError
+except ImportError:  # fall back to lexical checks only
+    parse_sql = None
+    ParseError = None
+
+FIX_INSTRUCTION = (
+    "The PostgreSQL in \"previous_response\" does not parse: {errors}. "
+    "Fix these syntax errors and change nothing else."
+)
+
+def validator_backend() -> str:
+    """'pglast' when the PostgreSQL parser is installed, otherwise 'lexical'."""
+    return "pglast" if parse_sql is not None else "lexical"
+
+def syntax_check_trusted(trust_lexical: bool = False) -> bool:
+    """
+    Whether passing validate_sql is enough to accept SQL without the evaluator:
+    always with pglast, with the lexical fallback only when `trust_lexical`.
+    """
+    return validator_backend() != "lexical" or trust_lexical
+
+def lexical_errors(sql: str) -> List[str]:
+    """
+    Cheap checks that need no grammar: unterminated strings, quoted identifiers
+    and comments, unbalanced parentheses, empty lists and Oracle-only syntax
+    that PostgreSQL rejects outright ((+) joins, :name binds outside array
+    subscripts such as arr[1:n]).
+    """
+    errors = []
+    depth = 0
+    brackets = 0
+    previous = None
+    significant = 0
+    for token in tokenize(sql):
+        if token.kind == "ws":
+            continue
+        if token.kind == "comment":
+            if token.text.startswith("/*") and not token.text.endswith("*/"):
+                errors.append(f"unterminated comment at offset {token.start}")
+            continue
+        significant += 1
+        text = token.text
+        if token.kind == "string" and (len(text) < 2 or not text.endswith("'")):
+            errors.append(f"unterminated string literal at offset {token.start}")
+        elif token.kind == "quoted_ident" and (len(text) < 2 or not text.endswith('"')):
+            errors.append(f"unterminated quoted identifier at offset {token.start}")
+        elif token.kind == "bind" and not brackets:
+            errors.append(f"Oracle bind variable {text} at offset {token.start}")
+        elif text == "[":
+            brackets += 1
+        elif text == "]":
+            brackets = max(0, brackets - 1)
+        elif text == "(":
+            depth += 1
+        elif text == ")":
+            if previous is not None and previous.text == ",":
+                errors.append(f"trailing comma before ')' at offset {token.start}")
+            if previous is not None and previous.text == "+" and depth > 0:
+                errors.append(f"Oracle (+) outer join at offset {previous.start}")
+            depth -= 1
+            if depth < 0:
+                errors.append(f"unmatched ')' at offset {token.start}")
+                depth = 0
+        elif text == "," and previous is not None and previous.text in (",", "("):
+            errors.append(f"empty list element at offset {token.start}")
+        previous = token
+    if depth > 0:
+        errors.append(f"{depth} unclosed '('")
+    if not significant:
+        errors.append("no SQL statement")
+    return errors
+
+def validate_sql(sql: str) -> List[str]:
+    """Syntax errors in PostgreSQL `sql`; an empty list means it parses."""
+    errors = lexical_errors(sql)
+    if errors or parse_sql is None:
+        return errors
+    try:
+        parse_sql(sql)
+    except ParseError as e:
+        return [str(e)]
+    return []
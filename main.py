@@ -6,14 +6,16 @@ from pathlib import Path
 
 from config.loader import load_sqlporter_config
 from config.logging_config import setup_logging
-from core.file_io import (
-    get_sql_files,
-    read_sql_file,
-    write_sql_with_comment,
-    write_report,
-    write_html_report
-)
-from core.runner import run_single_sql
+from core.file_io import get_sql_files, write_report, write_reports
+from core.batching import batch_stats
+from core.conversion import convert_file
+from core.dedup import get_deduper
+from core.journal import ConversionJournal, JOURNAL_FILENAME, file_fingerprint, is_resumable, is_unchanged
+from core.json_repair import avoided_retries, repair_counts
+from core.knowledge_store import flush_knowledge_stores
+from core.reporting import RESULTS_FILENAME, ProgressTracker, ResultSink
+from core.scheduler import run_bounded
+from core.telemetry import close_telemetry
 
 from core.app import fast_agent_instance
 
@@ -25,6 +27,9 @@ import agents.knowledge_agent
 
 __version__ = "1.0.0"
 
+# run_stats.json names at most this many deterministic files; the count covers all.
+MAX_LISTED_FILES = 100
+
 def resource_path(relative_path: str) -> Path:
     try:
         base_path = Path(sys._MEIPASS)
@@ -37,6 +42,8 @@ def main():
     parser.add_argument("--config", type=Path, default=Path("fastagent.config.yaml"), help="Path to config file")
     parser.add_argument("--secret", type=Path, default=Path("fastagent.secrets.yaml"), help="Path to secret file")
     parser.add_argument("--version", action="store_true", help="Print version and exit")
+    parser.add_argument("--resume", action="store_true", help="Skip files already finished by a previous (interrupted) run")
+    parser.add_argument("--changed-only", action="store_true", help="Only convert files whose content changed since their last successful run")
 
     args = parser.parse_args()
 
@@ -52,58 +59,113 @@ def main():
     input_dir = Path(paths.get("input_dir", "./ASIS"))
     output_dir = Path(paths.get("output_dir", "./TOBE"))
     report_dir = Path(paths.get("report_dir", "./reports"))
-    prefix = config.get("settings", {}).get("comment_prefix", "--")
 
-    summary = {}
+    results = ResultSink(report_dir / RESULTS_FILENAME)
+    run_stats = {}
+    journal = ConversionJournal(report_dir / JOURNAL_FILENAME)
+    previous, previous_success = journal.load() if (args.resume or args.changed_only) else ({}, {})
 
     async def run_agents():
         async with fast_agent_instance.run() as agent:
-            sql_files = get_sql_files(input_dir)
-            if not sql_files:
+            sql_files = get_sql_files(input_dir, config.get("settings", {}).get("discovery", {}))
+            total = len(sql_files) if isinstance(sql_files, list) else None
+            if total == 0:
                 logging.warning(f"No SQL files found in '{input_dir}'.")
                 return
 
-            logging.info(f"Processing {len(sql_files)} SQL files...")
+            max_concurrent_files = config.get("settings", {}).get("max_concurrent_files", 1)
+            if total is None:
+                logging.info(f"Processing SQL files as they are discovered ({max_concurrent_files} concurrent)...")
+            else:
+                logging.info(f"Processing {total} SQL files ({max_concurrent_files} concurrent)...")
+            progress = ProgressTracker(total, config.get("settings", {}).get("progress_interval", 10))
+
+            def relative_key(sql_path: Path) -> str:
+                # Files are keyed by their path under input_dir; names alone repeat across directories.
+                return sql_path.relative_to(input_dir).as_posix()
 
-            for sql_path in sql_files:
-                logging.info(f"Processing file: {sql_path.name}")
+            async def process_file(sql_path: Path) -> dict:
+                file_key = relative_key(sql_path)
                 try:
-                    oracle_sql = read_sql_file(sql_path)
-                    result_payload = await run_single_sql(agent, config, oracle_sql, sql_path.name)
-
-                    final_sql = result_payload.get("postgresql_sql", "")
-                    comment = f"Converted from: {sql_path.name}"
-                    write_sql_with_comment(output_dir, input_dir, sql_path, final_sql, comment, prefix)
-
-                    summary[sql_path.name] = {
-                        "status": "success" if final_sql else "incomplete",
-                        "error": result_payload.get("error", ""),
-                        "rating": result_payload.get("RATING", ""),
-                        "feedback": result_payload.get("FEEDBACK", "")
-                    }
-
-                    logging.info(f"Finished: {sql_path.name}")
-
-                except FileNotFoundError:
-                    logging.error(f"File not found: {sql_path.name}")
-                    summary[sql_path.name] = {"status": "error", "message": "File not found"}
-                except IOError as e:
-                    logging.error(f"I/O error while processing {sql_path.name}: {e}")
-                    summary[sql_path.name] = {"status": "error", "message": f"I/O Error: {e}"}
-                except Exception as e:
-                    logging.exception(f"Unexpected error while processing {sql_path.name}: {e}")
-                    summary[sql_path.name] = {"status": "error", "message": str(e)}
+                    fingerprint = file_fingerprint(sql_path)
+                except OSError as e:
+                    logging.error(f"Cannot stat {file_key}: {e}")
+                    return {"status": "error", "message": f"I/O Error: {e}"}
+
+                if args.changed_only and is_unchanged(previous_success.get(file_key), fingerprint):
+                    logging.info(f"Unchanged since last successful run, skipping: {file_key}")
+                    return previous_success[file_key]["result"]
+                if args.resume and is_resumable(previous.get(file_key), fingerprint):
+                    logging.info(f"Already converted in previous run, skipping: {file_key}")
+                    return previous[file_key]["result"]
+
+                entry = await convert_file(agent, config, sql_path, input_dir, output_dir)
+                journal.append(file_key, fingerprint, entry)
+                return entry
+
+            # Results come back in input order and are streamed to the result sink;
+            # only this loop writes to it.
+            deterministic_count = 0
+            deterministic_files = []
+            rules_dropped = 0
+            async for sql_path, entry in run_bounded(sql_files, process_file, max_concurrent_files):
+                results.append(relative_key(sql_path), entry)
+                progress.update(entry)
+                if entry.get("status") == "deterministic":
+                    deterministic_count += 1
+                    if len(deterministic_files) < MAX_LISTED_FILES:
+                        deterministic_files.append(relative_key(sql_path))
+                rules_dropped += entry.get("rules_dropped", 0)
+
+            if not results.count:
+                logging.warning(f"No SQL files found in '{input_dir}'.")
+                return
+            progress.finish()
+            run_stats["progress"] = progress.snapshot()
+            if deterministic_count:
+                run_stats["deterministic_count"] = deterministic_count
+                run_stats["deterministic_files"] = deterministic_files
+                logging.info(f"Converted without agents: {deterministic_count}/{results.count} file(s).")
+
+            if rules_dropped:
+                run_stats["rules_dropped"] = rules_dropped
+                logging.info(f"Prompt budget: {rules_dropped} rule(s) left out of converter prompts.")
+
+            if avoided_retries():
+                run_stats["json_parse_methods"] = dict(repair_counts)
+                run_stats["retries_avoided_by_json_repair"] = avoided_retries()
+                logging.info(f"JSON repair salvaged {avoided_retries()} malformed agent response(s).")
+
+            batches = batch_stats()
+            if batches:
+                run_stats["batching"] = batches
+                for name, counts in batches.items():
+                    logging.info(f"Batching [{name}]: {counts['statements']} statement(s) in {counts['requests']} "
+                                 f"request(s), {counts['fallbacks']} re-queued alone.")
+
+            deduper = get_deduper(config)
+            if deduper:
+                run_stats["statements"] = deduper.total
+                run_stats["deduplicated_statements"] = deduper.reused
+                run_stats["dedup_ratio"] = round(deduper.ratio, 4)
+                logging.info(f"Deduplication: {deduper.reused}/{deduper.total} statements re-used ({deduper.ratio:.1%}).")
 
     try:
         asyncio.run(run_agents())
     except Exception as e:
         logging.exception(f"Fatal error during FastAgent execution: {e}")
         return
+    finally:
+        journal.close()
+        results.close()
+        close_telemetry()
+        flush_knowledge_stores()
 
     try:
         report_file = report_dir / "result_summary.json"
-        write_report(report_file, summary)
-        write_html_report(report_file, summary)
+        write_reports(report_file, results.replay())
+        if run_stats:
+            write_report(report_dir / "run_stats.json", run_stats)
         logging.info(f"Conversion complete. Report generated: {report_file}")
     except Exception as e:
         logging.exception(f"Unexpected error while writing report: {e}")
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from core.batching import StatementBatcher, batchable
+from core.json_repair import extract_json_array
+
+class BatchAgent:
+    """Answers batch requests; `drop` ids are left out, `garble_over` breaks larger batches."""
+
+    def __init__(self, drop=(), garble_over=None):
+        self.requests = []
+        self.drop = set(drop)
+        self.garble_over = garble_over
+
+    async def send(self, request):
+        self.requests.append(request)
+        items = request["batch"]
+        if self.garble_over and len(items) > self.garble_over:
+            return "Sorry, that was too much at once."
+        answer = [
+            {"id": item["id"], "postgresql_sql": item["oracle_sql"].replace("NVL", "COALESCE"), "transformations": []}
+            for item in items if item["id"] not in self.drop
+        ]
+        return "```json\n" + json.dumps(answer) + "\n```"
+
+def run_batch(agent, statements, token_budget=10000):
+    async def main():
+        batcher = StatementBatcher(agent.send, "converter_1", token_budget, max_wait=0.01)
+        payloads = [{"oracle_sql": sql, "known_transformations": [{"from": "NVL", "to": "COALESCE", "context": "f"}]}
+                    for sql in statements]
+        return batcher, await asyncio.gather(*(batcher.submit(p) for p in payloads))
+    return asyncio.run(main())
+
+def test_extract_json_array_variants():
+    assert extract_json_array('[{"id": 1}]') == ([{"id": 1}], "strict")
+    assert extract_json_array("Here:\n[{'id': 1,},]") == ([{"id": 1}], "repaired")
+    assert extract_json_array('{"results": [{"id": 2}]}')[0] == [{"id": 2}]
+    assert extract_json_array("no json") == (None, "failed")
+
+def test_statements_share_one_request():
+    agent = BatchAgent()
+    batcher, results = run_batch(agent, [f"SELECT NVL(a, {i}) FROM t" for i in range(4)])
+    assert len(agent.requests) == 1
+    assert len(agent.requests[0]["known_transformations"]) == 1
+    assert [r["postgresql_sql"] for r in results] == [f"SELECT COALESCE(a, {i}) FROM t" for i in range(4)]
+    assert batcher.batched == 4
+
+def test_token_budget_bounds_batch_size():
+    agent = BatchAgent()
+    run_batch(agent, [f"SELECT NVL(a, {i}) FROM t" for i in range(6)], token_budget=80)
+    assert len(agent.requests) > 1
+    assert all(len(r["batch"]) < 6 for r in agent.requests)
+
+def test_partial_failures_split_and_requeue():
+    agent = BatchAgent(drop={2}, garble_over=2)
+    batcher, results = run_batch(agent, [f"SELECT NVL(a, {i}) FROM t" for i in range(4)])
+    # 4 garbled -> two batches of 2; the id missing from one answer falls back to the caller.
+    assert [len(r["batch"]) for r in agent.requests] == [4, 2, 2]
+    assert results[1] is None
+    assert all(r is not None for i, r in enumerate(results) if i != 1)
+    assert batcher.fallbacks == 1
+
+def test_batchable_limits():
+    config = {"settings": {"batching": {"enabled": True, "max_statement_tokens": 10}}}
+    assert batchable(config, {"oracle_sql": "SELECT 1 FROM dual"})
+    assert not batchable(config, {"oracle_sql": "SELECT " + "x, " * 40 + "y FROM t"})
+    assert not batchable(config, {"oracle_sql": "SELECT 1", "repair_instruction": "fix"})
+    assert not batchable({"settings": {}}, {"oracle_sql": "SELECT 1"})
+
+def test_transport_failure_is_not_split():
+    class RateLimited:
+        def __init__(self):
+            self.requests = 0
+
+        async def send(self, request):
+            self.requests += 1
+            raise RuntimeError("429 Too Many Requests")
+
+    agent = RateLimited()
+    batcher, results = run_batch(agent, [f"SELECT NVL(c{i}, 0) FROM t" for i in range(8)])
+    assert results == [None] * 8
+    assert agent.requests == 1
+    assert batcher.fallbacks == 8
@@ -0,0 +1,35 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from bench.corpus import generate_corpus
+from bench.fake_agents import FakeAgentProvider, parse_latency
+from bench.harness import bench_config, run_benchmark
+from bench.metrics import compare, percentile
+
+def test_corpus_is_deterministic():
+    with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+        first = generate_corpus(Path(a), files=4, seed=7)
+        second = generate_corpus(Path(b), files=4, seed=7)
+        assert [p.read_text() for p in first] == [p.read_text() for p in second]
+
+def test_metrics_helpers():
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([], 99) == 0.0
+    assert parse_latency("uniform:0.1:0.2") == {"distribution": "uniform", "low": 0.1, "high": 0.2}
+    rows, regressions = compare({"files_per_sec": 8.0, "llm_calls_per_file": 5.0},
+                                {"files_per_sec": 10.0, "llm_calls_per_file": 5.0}, tolerance=0.1)
+    assert regressions == ["files_per_sec"] and len(rows) == 2
+
+def test_benchmark_run_with_injected_faults():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        generate_corpus(work_dir / "ASIS", files=6, statements_per_file=2, seed=1)
+        config = bench_config(work_dir, concurrency=3)
+        config["settings"]["retry"] = {"transport": {"base_delay": 0.0, "max_delay": 0.0}}
+        provider = FakeAgentProvider(failure_rate=0.1, malformed_rate=0.1, seed=1)
+        results = asyncio.run(run_benchmark(config, provider))
+
+        assert results["files"] == 6
+        assert results["llm_calls"] == provider.total_calls > 0
+        assert set(results["file_latency"]) == {"p50", "p95", "p99"}
+        assert sum(results["statuses"].values()) == 6
+        assert len(list((work_dir / "TOBE").rglob("*_ported.sql"))) == 6
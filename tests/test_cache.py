@@ -0,0 +1,99 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from core.cache import ResultCache, make_result_key, make_stage_key, normalize_sql
+from core.runner import convert_sql
+
+class CountingAgent:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+
+    async def send(self, payload):
+        self.calls += 1
+        return json.dumps({"postgresql_sql": self.sql, "transformations": []})
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("SELECT  a,\n  b FROM t ;") == "SELECT a, b FROM t"
+    assert normalize_sql("SELECT 'a  b' FROM t") == "SELECT 'a  b' FROM t"
+
+def test_normalize_sql_keeps_line_comment_boundary():
+    assert normalize_sql("SELECT a -- note\n  FROM t") == "SELECT a -- note\nFROM t"
+    assert normalize_sql("SELECT a -- note\nFROM t") != normalize_sql("SELECT a -- note FROM t")
+    assert normalize_sql("SELECT a -- don't\n  ,  b FROM t") == "SELECT a -- don't\n, b FROM t"
+
+def test_result_key_depends_on_models_and_rules():
+    config = {"models": {"converter_1": "generic.gemma3:4b"}, "instructions": {}}
+    rules = [{"from": "NVL", "to": "COALESCE", "context": "", "example": ""}]
+    key = make_result_key("SELECT NVL(a, 0) FROM t", config, rules)
+
+    assert key == make_result_key("SELECT NVL(a, 0)\nFROM t;", config, rules)
+    assert key != make_result_key("SELECT NVL(a, 0) FROM t", config, [])
+    context = {"known_transformations": rules}
+    assert make_result_key("SELECT 1", config, context) == make_result_key(
+        "SELECT 1", config, {**context, "examples": [{"oracle_sql": "SELECT 2", "postgresql_sql": "SELECT 2"}]})
+    assert key != make_result_key("SELECT NVL(a, 0) FROM t", {"models": {"converter_1": "openai.gpt-4o-mini"}}, rules)
+
+def test_result_key_depends_on_evaluator_settings():
+    config = {"models": {"converter_1": "generic.gemma3:4b"}, "settings": {"min_rating": "GOOD", "max_refinements": 3}}
+    key = make_result_key("SELECT 1", config, [])
+
+    assert key == make_result_key("SELECT 1", {**config, "settings": {**config["settings"], "retry_limit": 5}}, [])
+    assert key != make_result_key("SELECT 1", {**config, "settings": {**config["settings"], "min_rating": "EXCELLENT"}}, [])
+    assert key != make_result_key("SELECT 1", {**config, "settings": {**config["settings"], "max_refinements": 1}}, [])
+    assert key != make_result_key("SELECT 1", {**config, "settings": {**config["settings"], "refinement": {"skip_below": 0}}}, [])
+    assert key != make_result_key("SELECT 1", {**config, "settings": {**config["settings"], "validation": {"enabled": False}}}, [])
+    assert key != make_result_key("SELECT 1", {**config, "default_model": "openai.gpt-4o-mini"}, [])
+
+def test_cache_roundtrip_and_lru_eviction():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = ResultCache(Path(temp_dir) / "cache.db", max_bytes=200)
+        cache.put("a", {"postgresql_sql": "x" * 60})
+        cache.put("b", {"postgresql_sql": "y" * 60})
+        assert cache.get("a") == {"postgresql_sql": "x" * 60}  # "a" is now most recently used
+
+        cache.put("c", {"postgresql_sql": "z" * 60})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        cache.close()
+
+def test_stage_key_tracks_agent_instruction_and_payload():
+    payload = {"oracle_sql": "SELECT 1 FROM dual", "known_transformations": []}
+    key = make_stage_key("converter_1", "generic.gemma3:4b", "Convert.", payload)
+
+    assert key == make_stage_key("converter_1", "generic.gemma3:4b", "Convert.", dict(payload))
+    assert key != make_stage_key("converter_1", "generic.gemma3:4b", "Convert!", payload)
+    assert key != make_stage_key("converter_2", "generic.gemma3:4b", "Convert.", payload)
+    assert key != make_stage_key("converter_1", "generic.gemma3:4b", "Convert.", {**payload, "oracle_sql": "SELECT 2 FROM dual"})
+
+def test_changing_min_rating_reruns_only_the_evaluator():
+    agents = {
+        "converter_1": CountingAgent("SELECT COALESCE(a, 0) FROM t"),
+        "converter_2": CountingAgent("SELECT COALESCE(a, 0) AS a FROM t"),
+        "merge_and_select": CountingAgent("SELECT COALESCE(a, 0) FROM t"),
+        "oracle_to_pg_pipeline": CountingAgent("SELECT COALESCE(a, 0) FROM t"),
+    }
+    model_map = {"converter_1": "m1", "converter_2": "m2"}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        settings = {
+            "retry_limit": 0,
+            "min_rating": "GOOD",
+            "cache": {"enabled": True, "dir": temp_dir},
+            "deterministic": {"enabled": False},
+            "refinement": {"enabled": False},
+            "validation": {"short_circuit_below": 0},
+            "knowledge": {"backend": "json", "json_path": str(Path(temp_dir) / "k.json")},
+        }
+        config = {"models": model_map, "settings": settings}
+        first = asyncio.run(convert_sql(agents, config, "SELECT NVL(a, 0) FROM t", model_map))
+        again = asyncio.run(convert_sql(agents, config, "SELECT NVL(a, 0) FROM t", model_map))
+        assert not first.get("cached") and again["cached"]
+        assert agents["oracle_to_pg_pipeline"].calls == 1
+
+        stricter = {**config, "settings": {**settings, "min_rating": "EXCELLENT"}}
+        result = asyncio.run(convert_sql(agents, stricter, "SELECT NVL(a, 0) FROM t", model_map))
+        assert not result.get("cached")
+        assert agents["oracle_to_pg_pipeline"].calls == 2
+        assert [agents[name].calls for name in ("converter_1", "converter_2", "merge_and_select")] == [1, 1, 1]
@@ -0,0 +1,28 @@
+from core.complexity import complexity_score, choose_refinement
+
+PLSQL = """CREATE OR REPLACE PROCEDURE p IS
+  CURSOR c IS SELECT id FROM t WHERE ROWNUM < 10;
+BEGIN
+  FOR r IN c LOOP
+    UPDATE t SET d = SYSDATE WHERE id = r.id;
+  END LOOP;
+EXCEPTION
+  WHEN OTHERS THEN RAISE;
+END;"""
+
+def test_score_grows_with_oracle_and_plsql_constructs():
+    simple = complexity_score("SELECT a FROM t")
+    oracle = complexity_score("SELECT DECODE(a, 1, 2) FROM t WHERE ROWNUM < 5")
+    assert simple == 0
+    assert oracle == 6
+    assert complexity_score(PLSQL) > oracle
+
+def test_choose_refinement_tiers():
+    config = {"settings": {"refinement": {"skip_below": 3, "tiers": [{"name": "light", "max_score": 12}]}}}
+    assert choose_refinement("SELECT a FROM t", config)["agent"] is None
+    light = choose_refinement("SELECT DECODE(a, 1, 2) FROM t WHERE ROWNUM < 5", config)
+    assert (light["tier"], light["agent"]) == ("light", "oracle_to_pg_pipeline_light")
+    assert choose_refinement(PLSQL, config)["agent"] == "oracle_to_pg_pipeline"
+
+    disabled = {"settings": {"refinement": {"enabled": False}}}
+    assert choose_refinement("SELECT a FROM t", disabled)["tier"] == "standard"
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from core.runner import find_consensus, run_parallel_conversion
+from core.sql_lexer import canonical_form
+
+class SlowAgent:
+    def __init__(self, sql, delay):
+        self.sql = sql
+        self.delay = delay
+        self.cancelled = False
+
+    async def send(self, payload):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return json.dumps({"postgresql_sql": self.sql, "transformations": []})
+
+def make_config(temp_dir, quorum):
+    return {
+        "settings": {
+            "retry_limit": 0,
+            "cache": {"enabled": False},
+            "knowledge": {"backend": "json", "json_path": str(Path(temp_dir) / "k.json")},
+            "consensus": {"enabled": True, "quorum": quorum},
+        }
+    }
+
+def test_canonical_form_ignores_formatting():
+    assert canonical_form("select a  from t; -- done") == canonical_form("SELECT a\nFROM t")
+    assert canonical_form("SELECT 'x' FROM t") != canonical_form("SELECT 'X' FROM t")
+
+def test_find_consensus_needs_quorum():
+    candidates = [{"postgresql_sql": "SELECT 1"}, {"postgresql_sql": "select 1;"}, {"error": "x"}]
+    assert len(find_consensus(candidates, 2)) == 2
+    assert find_consensus(candidates, 3) is None
+    assert find_consensus(candidates, None) is None
+
+def test_quorum_cancels_slow_converter():
+    agents = {
+        "fast_1": SlowAgent("SELECT COALESCE(a, 0) FROM t", 0.01),
+        "fast_2": SlowAgent("select coalesce(a, 0) from t;", 0.02),
+        "slow": SlowAgent("SELECT a FROM t", 5),
+    }
+    model_map = {name: "test-model" for name in agents}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = make_config(temp_dir, 2)
+
+        async def run():
+            results = await run_parallel_conversion(agents, config, "SELECT NVL(a, 0) FROM t", model_map, {"known_transformations": []})
+            await asyncio.sleep(0)
+            return results
+
+        results = asyncio.run(asyncio.wait_for(run(), 2))
+        assert len(results) == 2
+        assert agents["slow"].cancelled
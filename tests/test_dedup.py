@@ -0,0 +1,41 @@
+import asyncio
+from core.dedup import StatementDeduper, fingerprint_statement, instantiate
+
+def test_fingerprint_ignores_literals_binds_case_and_whitespace():
+    a, params_a = fingerprint_statement("select * from emp where id = 10 and name = 'KIM' and dept = :d1;")
+    b, params_b = fingerprint_statement("SELECT *\n  FROM EMP WHERE id = 42 AND name = 'LEE' AND dept = :dept")
+
+    assert a == b
+    assert params_a == ["10", "'KIM'", ":d1"]
+    assert params_b == ["42", "'LEE'", ":dept"]
+
+def test_instantiate_swaps_literals_or_refuses():
+    converted = "SELECT * FROM emp WHERE id = 10 AND name = 'KIM' LIMIT 5"
+    assert instantiate(converted, ["10", "'KIM'", "5"], ["42", "'LEE'", "5"]) == \
+        "SELECT * FROM emp WHERE id = 42 AND name = 'LEE' LIMIT 5"
+    # Converter rewrote the literal: cannot be mapped safely
+    assert instantiate("SELECT TO_CHAR(d, 'YYYY') FROM t", ["'RRRR'"], ["'YY'"]) is None
+    # Same representative value maps to two different values: ambiguous
+    assert instantiate("SELECT 1, 1", ["1", "1"], ["1", "2"]) is None
+
+def test_deduper_converts_one_statement_per_class():
+    calls = []
+
+    async def scenario():
+        deduper = StatementDeduper()
+
+        async def convert(sql):
+            calls.append(sql)
+            await asyncio.sleep(0.01)
+            return {"postgresql_sql": sql.replace("NVL", "COALESCE")}
+
+        statements = [f"SELECT NVL(a, {n}) FROM t" for n in range(5)]
+        results = await asyncio.gather(*(deduper.run(s, lambda s=s: convert(s)) for s in statements))
+        return deduper, results
+
+    deduper, results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [r["postgresql_sql"] for r in results] == [f"SELECT COALESCE(a, {n}) FROM t" for n in range(5)]
+    assert deduper.reused == 4
+    assert deduper.ratio == 0.8
@@ -1,6 +1,8 @@
+import json
 import tempfile
 from pathlib import Path
-from core.file_io import get_sql_files, read_sql_file, write_sql_with_comment
+import core.file_io
+from core.file_io import get_sql_files, iter_sql_files, read_sql_file, write_sql_with_comment, format_unconverted_statement, write_reports
 
 def test_read_and_write_sql_file():
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -47,3 +49,76 @@ def test_recursive_sql_discovery():
         found_names = sorted([f.name for f in found_files])
 
         assert found_names == ["a.sql", "b.sql"]
+
+def test_write_statement_list_in_order():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Path(temp_dir)
+        input_dir = base / "ASIS"
+        input_dir.mkdir()
+        sql_file = input_dir / "script.sql"
+        sql_file.write_text("SELECT 1 FROM dual; SELECT 2 FROM dual;", encoding="utf-8")
+
+        write_sql_with_comment(
+            output_base_dir=base / "TOBE",
+            input_base_dir=input_dir,
+            input_path=sql_file,
+            sql=["SELECT 1;", format_unconverted_statement("SELECT 2 FROM dual;", "timeout")],
+            comment="Converted from: script.sql",
+        )
+
+        content = (base / "TOBE" / "script_ported.sql").read_text(encoding="utf-8")
+        assert content.index("SELECT 1;") < content.index("-- NOT CONVERTED: timeout")
+        assert "-- SELECT 2 FROM dual;" in content
+
+def test_streamed_reports_match_and_escape():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        report_file = Path(temp_dir) / "reports" / "result_summary.json"
+        results = {
+            "a.sql": {"status": "success", "feedback": "<script>alert(1)</script>"},
+            "sub/a.sql": {"status": "cached"},
+            "b & c.sql": {"status": "error", "error": "x < y", "statements": [{"index": 0}]},
+        }
+        write_reports(report_file, iter(results.items()))
+
+        assert json.loads(report_file.read_text(encoding="utf-8")) == results
+        html_text = report_file.with_suffix(".html").read_text(encoding="utf-8")
+        assert "<script>" not in html_text
+        assert "&lt;script&gt;" in html_text and "b &amp; c.sql" in html_text
+
+        write_reports(report_file, iter(()))
+        assert json.loads(report_file.read_text(encoding="utf-8")) == {}
+
+def test_discovery_filters_and_orders():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Path(temp_dir) / "ASIS"
+        (base / "archive").mkdir(parents=True)
+        (base / "pkg").mkdir()
+        (base / "small.sql").write_text("SELECT 1;", encoding="utf-8")
+        (base / "pkg" / "big.sql").write_text("SELECT 2;" * 100, encoding="utf-8")
+        (base / "pkg" / "body.pkb").write_text("BEGIN NULL; END;", encoding="utf-8")
+        (base / "archive" / "old.sql").write_text("SELECT 3;", encoding="utf-8")
+        (base / "empty.sql").write_text("", encoding="utf-8")
+
+        discovery = {"exclude": ["archive/*"], "min_size": 1}
+        streamed = get_sql_files(base, {**discovery, "mode": "stream"})
+        assert not isinstance(streamed, list)
+        assert sorted(p.name for p in streamed) == ["big.sql", "small.sql"]
+
+        ordered = get_sql_files(base, {**discovery, "mode": "largest_first", "include": ["*.sql", "*.pkb"]})
+        assert [p.name for p in ordered] == ["big.sql", "body.pkb", "small.sql"]
+
+        assert [p.name for p in get_sql_files(base)] == ["old.sql", "empty.sql", "big.sql", "small.sql"]
+
+def test_excluded_directories_are_not_walked(monkeypatch):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Path(temp_dir)
+        (base / "archive" / "2019").mkdir(parents=True)
+        (base / "archive" / "2019" / "old.sql").write_text("SELECT 1;", encoding="utf-8")
+        (base / "live.sql").write_text("SELECT 2;", encoding="utf-8")
+
+        scanned = []
+        real_scandir = core.file_io.os.scandir
+        with monkeypatch.context() as patch:
+            patch.setattr(core.file_io.os, "scandir", lambda path: scanned.append(Path(path)) or real_scandir(path))
+            assert [p.name for p, _ in iter_sql_files(base, exclude=["archive/*"])] == ["live.sql"]
+        assert scanned == [base]
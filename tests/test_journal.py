@@ -0,0 +1,54 @@
+import tempfile
+from pathlib import Path
+from core.conversion import file_status
+from core.journal import FINISHED_STATUSES, ConversionJournal, file_fingerprint, is_resumable, is_unchanged
+
+def test_journal_roundtrip_and_skip_decisions():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Path(temp_dir)
+        sql_file = base / "a.sql"
+        sql_file.write_text("SELECT 1 FROM dual;", encoding="utf-8")
+        fingerprint = file_fingerprint(sql_file)
+
+        journal = ConversionJournal(base / "journal.jsonl")
+        journal.append("a.sql", fingerprint, {"status": "success"})
+        journal.append("b.sql", fingerprint, {"status": "error", "message": "boom"})
+        journal.close()
+
+        # Simulate a crash in the middle of writing the next line
+        with open(base / "journal.jsonl", "a", encoding="utf-8") as f:
+            f.write('{"file": "c.sql", "mtim')
+
+        latest, latest_success = ConversionJournal(base / "journal.jsonl").load()
+
+        assert set(latest) == {"a.sql", "b.sql"}
+        assert set(latest_success) == {"a.sql"}
+        assert is_resumable(latest["a.sql"], fingerprint)
+        assert not is_resumable(latest["b.sql"], fingerprint)
+        assert is_unchanged(latest_success["a.sql"], fingerprint)
+
+        sql_file.write_text("SELECT 2 FROM dual;", encoding="utf-8")
+        changed = file_fingerprint(sql_file)
+        assert not is_unchanged(latest_success["a.sql"], changed)
+
+def test_only_files_with_complete_sql_count_as_finished():
+    finished = [{"cached": True}, {"deduplicated": True}, {"deterministic": True}, {"postgresql_sql": "x"}]
+    unfinished = [
+        {"postgresql_sql": "x", "statements": [{"postgresql_sql": "x"}, {"postgresql_sql": ""}]},
+        {}, {"error": "boom", "postgresql_sql": ""},
+    ]
+    assert {file_status(p) for p in finished} == set(FINISHED_STATUSES)
+    assert not {file_status(p) for p in unfinished} & set(FINISHED_STATUSES)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base = Path(temp_dir)
+        sql_file = base / "a.sql"
+        sql_file.write_text("SELECT 1 FROM dual;", encoding="utf-8")
+        fingerprint = file_fingerprint(sql_file)
+        journal = ConversionJournal(base / "journal.jsonl")
+        journal.append("a.sql", fingerprint, {"status": "deduplicated"})
+        journal.close()
+
+        latest, latest_success = journal.load()
+        assert is_resumable(latest["a.sql"], fingerprint)
+        assert is_unchanged(latest_success.get("a.sql"), fingerprint)
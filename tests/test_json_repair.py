@@ -0,0 +1,46 @@
+import json
+from core.json_repair import extract_json_object
+from core.runner import process_agent_result
+
+EXPECTED = {"postgresql_sql": "SELECT COALESCE(a, 0) FROM t", "transformations": []}
+
+def test_strict_json_needs_no_repair():
+    parsed, method = extract_json_object('{"postgresql_sql": "SELECT COALESCE(a, 0) FROM t", "transformations": []}')
+    assert (parsed, method) == (EXPECTED, "strict")
+
+def test_fenced_and_embedded_objects():
+    fenced = '```json\n{"postgresql_sql": "SELECT COALESCE(a, 0) FROM t", "transformations": []}\n```'
+    assert extract_json_object(fenced) == (EXPECTED, "fenced")
+
+    prose = ("Here's the result: {\"postgresql_sql\": \"SELECT COALESCE(a, 0) FROM t\", "
+             "\"transformations\": []} Let me know if it's OK {not json}.")
+    assert extract_json_object(prose) == (EXPECTED, "embedded")
+
+def test_repairs_quotes_commas_and_literals():
+    sloppy = "{'postgresql_sql': 'SELECT COALESCE(a, 0) FROM t', 'transformations': [],}"
+    assert extract_json_object(sloppy) == (EXPECTED, "repaired")
+
+    with_strings = "{'postgresql_sql': 'SELECT \\'x\\', \"Y\" FROM t\nWHERE b', 'ok': True}"
+    parsed, method = extract_json_object(with_strings)
+    assert method == "repaired"
+    assert parsed == {"postgresql_sql": "SELECT 'x', \"Y\" FROM t\nWHERE b", "ok": True}
+
+def test_escaped_sql_is_decoded():
+    parsed, _ = extract_json_object('{"postgresql_sql": "SELECT 1\\\\nFROM t"}')
+    assert parsed["postgresql_sql"] == "SELECT 1\nFROM t"
+
+    for sql in ("SELECT E'a\\nb'", "SELECT 'a\\nb' FROM t"):   # backslash-n inside a literal is real SQL
+        parsed, method = extract_json_object(json.dumps({"postgresql_sql": sql}))
+        assert (parsed["postgresql_sql"], method) == (sql, "strict")
+
+    double = '"{\\"postgresql_sql\\": \\"SELECT 1\\"}"'
+    assert extract_json_object(double) == ({"postgresql_sql": "SELECT 1"}, "double_encoded")
+
+def test_unrecoverable_text():
+    assert extract_json_object("I could not convert this statement.") == (None, "failed")
+
+def test_json_literal_inside_raw_sql_is_not_the_answer():
+    sql = """SELECT '{"a": 1}'::jsonb FROM t"""
+    assert extract_json_object(sql) == ({"a": 1}, "embedded")
+    assert extract_json_object(sql, ("postgresql_sql",)) == (None, "failed")
+    assert process_agent_result(sql, "converter_1")["postgresql_sql"] == sql
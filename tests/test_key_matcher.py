@@ -0,0 +1,18 @@
+from core.knowledge import KeyMatcher, extract_relevant_keys
+
+def test_matches_whole_tokens_with_positions():
+    matcher = KeyMatcher(["NVL", "SYSDATE", "FROM dual", "(+)", "ROWNUM"])
+    sql = "SELECT nvl(a, 0), ENVLOG, sysdate FROM   DUAL WHERE t.id = s.id(+)"
+
+    assert matcher.find(sql) == [("NVL", 7), ("SYSDATE", 26), ("FROM dual", 34), ("(+)", sql.index("(+)"))]
+    assert matcher.keys_in("SELECT ENVLOG FROM t") == []
+
+def test_keys_in_strings_and_comments_are_ignored():
+    matcher = KeyMatcher(["NVL"])
+    assert matcher.keys_in("SELECT 'NVL(x)' FROM t -- NVL") == []
+
+def test_matcher_is_extensible_and_extract_keeps_order():
+    matcher = KeyMatcher(["NVL"])
+    matcher.add("DECODE")
+    assert matcher.keys_in("SELECT DECODE(a, 1, NVL(b, 0)) FROM t") == ["DECODE", "NVL"]
+    assert extract_relevant_keys("SELECT NVL(col, 0), SYSDATE FROM DUAL;", ["SYSDATE", "NVL"]) == ["NVL", "SYSDATE"]
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from bench.knowledge import BUDGETS, check_budgets, generate_rules, measure
+
+# Wall-clock budgets depend on the machine, so they are only asserted with
+# SQLPORTER_PERF=1. 100k and 1M rule trees take minutes and several hundred MB;
+# opt in with SQLPORTER_PERF_LARGE=1.
+PERF = os.environ.get("SQLPORTER_PERF") == "1"
+LARGE = os.environ.get("SQLPORTER_PERF_LARGE") == "1"
+BUDGET_SCALE = float(os.environ.get("SQLPORTER_PERF_BUDGET_SCALE", "1.0"))
+
+def run_within_budget(rule_count):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = measure(rule_count, Path(temp_dir))
+    assert results["keys"] > rule_count // 3
+    assert check_budgets(results, BUDGET_SCALE) == []
+    return results
+
+def test_generated_rules_are_distinct():
+    rules = generate_rules(1000)
+    assert len({(r["from"], r["to"]) for r in rules}) == 1000
+
+def test_measure_reports_every_budgeted_metric():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = measure(200, Path(temp_dir))
+    assert set(BUDGETS) <= set(results)
+    assert 0 < results["keys"] <= 200
+
+@pytest.mark.skipif(not PERF, reason="set SQLPORTER_PERF=1 to assert knowledge timing budgets")
+@pytest.mark.parametrize("rule_count", [1_000, 10_000])
+def test_knowledge_within_budget(rule_count):
+    run_within_budget(rule_count)
+
+@pytest.mark.skipif(not LARGE, reason="set SQLPORTER_PERF_LARGE=1 to run large knowledge benchmarks")
+@pytest.mark.parametrize("rule_count", [100_000, 1_000_000])
+def test_knowledge_large_within_budget(rule_count):
+    run_within_budget(rule_count)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import tempfile
+import threading
+from pathlib import Path
+import pytest
+from core.knowledge_store import CachedKnowledgeStore, JsonKnowledgeStore, KnowledgeStore, SqliteKnowledgeStore
+
+RULES = [
+    {"from": "NVL", "to": "COALESCE", "context": "function call", "example": "NVL(a, 0)"},
+    {"from": "SYSDATE", "to": "CURRENT_TIMESTAMP", "context": "function call"},
+    {"from": "NVL", "to": "COALESCE", "context": "function call"},  # duplicate
+    {"from": "", "to": "X"},                                        # invalid
+]
+
+def test_sqlite_store_upsert_and_lookup():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SqliteKnowledgeStore(Path(temp_dir) / "k.db", json_path=None)
+
+        assert store.upsert(RULES) == 2
+        assert store.upsert(RULES) == 0
+        assert store.keys() == ["NVL", "SYSDATE"]
+        assert store.lookup(["NVL", "ROWNUM"]) == {
+            "NVL": [{"to": "COALESCE", "context": "function call", "example": "NVL(a, 0)"}]
+        }
+        store.close()
+
+def test_sqlite_store_migrates_json_once():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = Path(temp_dir) / "transformations.json"
+        json_path.write_text(json.dumps({
+            "SYSDATE": [{"to": "CURRENT_TIMESTAMP", "context": "function call", "example": ""}]
+        }), encoding="utf-8")
+
+        store = SqliteKnowledgeStore(Path(temp_dir) / "k.db", json_path=json_path)
+        assert store.load_tree() == JsonKnowledgeStore(json_path).load_tree()
+        store.close()
+
+        # Rules deleted from the JSON file later must not come back on reopen
+        json_path.write_text(json.dumps({"DECODE": [{"to": "CASE", "context": "", "example": ""}]}), encoding="utf-8")
+        store = SqliteKnowledgeStore(Path(temp_dir) / "k.db", json_path=json_path)
+        assert store.keys() == ["SYSDATE"]
+        store.close()
+
+def test_cached_store_writes_behind_and_reloads_external_changes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "k.db"
+        cached = CachedKnowledgeStore(SqliteKnowledgeStore(db_path, json_path=None),
+                                      flush_interval=3600, check_interval=0)
+        version = cached.version
+
+        assert cached.upsert(RULES) == 2
+        assert cached.keys() == ["NVL", "SYSDATE"]
+        assert cached.version > version
+        other = SqliteKnowledgeStore(db_path, json_path=None)
+        assert other.keys() == []          # not flushed yet
+
+        cached.flush()
+        assert other.keys() == ["NVL", "SYSDATE"]
+
+        other.upsert([{"from": "DECODE", "to": "CASE", "context": "expression"}])
+        assert "DECODE" in cached.keys()   # external write picked up
+        other.close()
+        cached.close()
+
+def test_knowledge_store_is_abstract():
+    with pytest.raises(TypeError):
+        KnowledgeStore()
+
+def test_cached_store_flushes_on_timer_without_further_upserts():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "k.db"
+        cached = CachedKnowledgeStore(SqliteKnowledgeStore(db_path, json_path=None), flush_interval=0.05)
+        other = SqliteKnowledgeStore(db_path, json_path=None)
+
+        writers = []
+        backend_upsert = cached.backend.upsert
+        cached.backend.upsert = lambda rules: writers.append(threading.current_thread()) or backend_upsert(rules)
+
+        async def scenario():
+            cached.upsert(RULES[:1])
+            assert other.keys() == []
+            await asyncio.sleep(0.1)
+            return other.keys()
+
+        assert asyncio.run(scenario()) == ["NVL"]
+        assert writers and threading.main_thread() not in writers     # never on the event loop
+        other.close()
+        cached.close()
+
+def test_cached_store_full_batch_is_written_off_the_event_loop():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "k.db"
+        cached = CachedKnowledgeStore(SqliteKnowledgeStore(db_path, json_path=None), flush_batch=1)
+        writers = []
+        backend_upsert = cached.backend.upsert
+        cached.backend.upsert = lambda rules: writers.append(threading.current_thread()) or backend_upsert(rules)
+
+        async def scenario():
+            cached.upsert(RULES[:1])
+            cached.upsert(RULES[1:2])       # the first write is still running: queued behind it
+            assert writers == []            # nothing written on the loop thread
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+        assert len(writers) == 2 and threading.main_thread() not in writers
+        cached.close()
+        assert SqliteKnowledgeStore(db_path, json_path=None).keys() == ["NVL", "SYSDATE"]
@@ -0,0 +1,67 @@
+import asyncio
+from core.latency import LatencyTracker, agent_timeout, hedge_delay, hedged, mark_service_started
+from core.ratelimit import ModelLimiter
+
+def test_percentile_nearest_rank():
+    tracker = LatencyTracker(window=100)
+    for i in range(1, 101):
+        tracker.record("c1", float(i))
+    assert tracker.percentile("c1", 95) == 95.0
+    assert tracker.percentile("c1", 50) == 50.0
+    assert tracker.percentile("c1", 95, min_samples=101) is None
+    assert tracker.percentile("other", 95) is None
+
+def test_timeout_and_hedge_settings():
+    config = {"settings": {
+        "timeouts": {"default": 30, "agents": {"slow": 0}},
+        "hedging": {"enabled": True, "percentile": 50, "min_samples": 2, "min_delay": 0.5},
+    }}
+    assert agent_timeout(config, "c1") == 30
+    assert agent_timeout(config, "slow") is None
+
+    tracker = LatencyTracker()
+    tracker.record("c1", 0.1)
+    assert hedge_delay(config, "c1", tracker) is None
+    tracker.record("c1", 2.0)
+    assert hedge_delay(config, "c1", tracker) == 0.5
+    assert hedge_delay({"settings": {}}, "c1", tracker) is None
+
+def test_backup_answers_when_primary_is_slow():
+    calls = []
+
+    async def call(name, delay, result):
+        calls.append(name)
+        mark_service_started()
+        await asyncio.sleep(delay)
+        return result
+
+    async def run():
+        fast = await hedged(lambda: call("primary", 0.01, "p"), lambda: call("backup", 0, "b"), 0.5)
+        slow = await hedged(lambda: call("primary", 5, "p"), lambda: call("backup", 0.01, "b"), 0.05)
+        broken = await hedged(lambda: call("primary", 0.2, "p"), lambda: call("backup", 0, None), 0.05)
+        return fast, slow, broken
+
+    assert asyncio.run(asyncio.wait_for(run(), 3)) == ("p", "b", "p")
+    assert calls == ["primary", "primary", "backup", "primary", "backup"]
+
+def test_hedge_timer_starts_after_the_slot_and_needs_a_free_slot():
+    calls = []
+
+    async def run():
+        limiter = ModelLimiter("generic", max_concurrency=1)
+
+        async def call(name, result):
+            calls.append(name)
+            async with limiter.slot():
+                mark_service_started()
+                await asyncio.sleep(0.1)
+            return result
+
+        async with limiter.slot():      # another statement holds the only slot for a while
+            queued = asyncio.ensure_future(hedged(lambda: call("primary", "p"), lambda: call("backup", "b"), 0.5))
+            await asyncio.sleep(0.7)
+        return await queued, await hedged(lambda: call("primary", "p"), lambda: call("backup", "b"), 0.01,
+                                          limiter.has_free_slot)
+
+    assert asyncio.run(asyncio.wait_for(run(), 3)) == ("p", "p")
+    assert calls == ["primary", "primary"]
@@ -0,0 +1,34 @@
+from core.prompt import build_payload, estimate_tokens, model_budget, rank_rules, rule_tokens
+
+RULES = [
+    {"from": "NVL", "to": "COALESCE", "context": "function call", "example": ""},
+    {"from": "NVL2", "to": "CASE", "context": "function call", "example": ""},
+    {"from": "SYSDATE", "to": "CURRENT_TIMESTAMP", "context": "function call", "example": ""},
+]
+
+def test_model_budget_prefers_explicit_value():
+    config = {"settings": {"max_tokens": 1000, "prompt": {"budget_ratio": 0.5, "budgets": {"small": 300}}}}
+    assert model_budget(config, "small") == 300
+    assert model_budget(config, "big") == 500
+
+def test_rank_by_specificity_then_text():
+    assert [r["from"] for r in rank_rules(RULES)] == ["SYSDATE", "NVL2", "NVL"]
+    assert rank_rules(list(reversed(RULES))) == rank_rules(RULES)
+
+    decode = {"from": "DECODE", "to": "CASE WHEN", "context": "function call", "example": ""}
+    rownum = {"from": "ROWNUM", "to": "LIMIT", "context": "row limit", "example": ""}
+    assert rank_rules([rownum, decode]) == rank_rules([decode, rownum]) == [decode, rownum]
+
+def test_build_payload_drops_rules_over_budget():
+    sql = "SELECT NVL(a, 0), SYSDATE FROM t"
+    context = {"known_transformations": RULES, "examples": [{"oracle_sql": "x" * 400, "postgresql_sql": "y" * 400}]}
+
+    payload, dropped = build_payload(sql, context, 10_000)
+    assert dropped == 0 and len(payload["examples"]) == 1
+
+    budget = estimate_tokens(sql) + rule_tokens(RULES[2]) + rule_tokens(RULES[1])
+    payload, dropped = build_payload(sql, context, budget)
+    assert payload["oracle_sql"] == sql
+    assert [r["from"] for r in payload["known_transformations"]] == ["SYSDATE", "NVL2"]
+    assert dropped == 1
+    assert "examples" not in payload
@@ -0,0 +1,40 @@
+import asyncio
+from core.ratelimit import RateLimiterRegistry
+
+def test_limiter_resolution_shares_provider_budget():
+    registry = RateLimiterRegistry(
+        {"generic": {"max_concurrency": 1}, "converter_3": {"requests_per_minute": 60}},
+        {"converter_1": "generic.gemma3:4b", "converter_2": "generic.llama3.2:1b", "converter_3": "openai.gpt-4o-mini"},
+    )
+
+    assert registry.for_agent("converter_1") is registry.for_agent("converter_2")
+    assert registry.for_agent("converter_3").key == "converter_3"
+    assert registry.for_agent("merge_and_select") is None
+
+def test_agents_without_models_entry_use_default_model():
+    registry = RateLimiterRegistry(
+        {"generic": {"max_concurrency": 1}},
+        {"converter_1": "generic.gemma3:4b", "converter_3": "openai.gpt-4o-mini"},
+        default_model="generic.qwen2.5:7b",
+    )
+
+    assert registry.for_agent("merge_and_select") is registry.for_agent("converter_1")
+    assert registry.for_agent("oracle_to_pg_pipeline").key == "generic"
+    assert registry.for_agent("converter_3") is None
+
+def test_max_concurrency_is_enforced_and_wait_reported():
+    async def scenario():
+        limiter = RateLimiterRegistry({"default": {"max_concurrency": 1}}, {}).for_agent("any")
+        waits = []
+
+        async def call():
+            async with limiter.slot() as waited:
+                waits.append(waited)
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(call(), call())
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[0] < 0.01
+    assert waits[1] >= 0.015
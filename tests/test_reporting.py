@@ -0,0 +1,35 @@
+import tempfile
+from pathlib import Path
+from core.reporting import ProgressTracker, ResultSink, iter_results
+
+def test_sink_streams_entries_in_order():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "results.jsonl"
+        path.write_text('{"file": "stale.sql", "result": {}}\n', encoding="utf-8")
+
+        sink = ResultSink(path)
+        assert list(sink.replay()) == []  # nothing from this run yet
+
+        sink.append("b.sql", {"status": "success"})
+        sink.append("a.sql", {"status": "cached"})
+        assert len(list(iter_results(path))) == 2   # flushed before close
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"file": "trunc')
+        assert list(sink.replay()) == [("b.sql", {"status": "success"}), ("a.sql", {"status": "cached"})]
+        assert list(iter_results(Path(temp_dir) / "missing.jsonl")) == []
+
+def test_progress_rates():
+    progress = ProgressTracker(total=4, interval=3600)
+    for status in ("cached", "success", "error"):
+        progress.update({"status": status})
+    snapshot = progress.snapshot()
+    assert snapshot["done"] == 3 and snapshot["errors"] == 1
+    assert snapshot["cache_hit_rate"] == round(1 / 3, 4)
+    assert snapshot["files_per_min"] > 0 and snapshot["eta_seconds"] >= 0
+    assert "3/4 files" in progress.summary()
+
+def test_progress_without_known_total():
+    progress = ProgressTracker(total=None, interval=3600)
+    progress.update({"status": "success"})
+    assert progress.snapshot()["eta_seconds"] is None
+    assert "1/? files" in progress.summary()
@@ -0,0 +1,89 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from core.knowledge_store import JsonKnowledgeStore
+from core.prompt import estimate_tokens
+from core.retrieval import RetrievalIndex, select_prompt_context
+
+RULES = [
+    {"from": "NVL", "to": "COALESCE", "context": "null handling", "example": "NVL(a, 0)"},
+    {"from": "SYSDATE", "to": "CURRENT_TIMESTAMP", "context": "current date", "example": "SELECT SYSDATE FROM dual"},
+    {"from": "DECODE", "to": "CASE", "context": "conditional", "example": "DECODE(x, 1, 'a', 'b')"},
+    {"from": "ROWNUM", "to": "LIMIT", "context": "row limiting", "example": "WHERE ROWNUM <= 10"},
+]
+
+def make_index(temp_dir):
+    store = JsonKnowledgeStore(Path(temp_dir) / "k.json")
+    store.upsert(RULES)
+    return store, RetrievalIndex(Path(temp_dir) / "conversions.jsonl", rebuild_interval=0, rebuild_min_changes=1)
+
+def test_similar_rules_rank_relevant_first():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, index = make_index(temp_dir)
+        ranked = index.similar_rules(store, "SELECT * FROM emp WHERE ROWNUM <= 5", k=2)
+        assert ranked[0][0]["from"] == "ROWNUM"
+        assert len(ranked) <= 2
+
+def test_examples_are_persisted_and_retrieved():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, index = make_index(temp_dir)
+        index.add_example("SELECT NVL(sal, 0) FROM emp", "SELECT COALESCE(sal, 0) FROM emp")
+        index.add_example("SELECT NVL(sal, 0) FROM emp", "duplicate ignored")
+        index.add_example("DELETE FROM audit_log", "DELETE FROM audit_log")
+
+        reopened = RetrievalIndex(Path(temp_dir) / "conversions.jsonl", rebuild_interval=0, rebuild_min_changes=1)
+        assert len(reopened.examples) == 2
+        best, _ = reopened.similar_examples(store, "SELECT NVL(bonus, 0) FROM emp", k=1)[0]
+        assert best["postgresql_sql"] == "SELECT COALESCE(sal, 0) FROM emp"
+
+def test_prompt_context_respects_budget_and_limits():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, index = make_index(temp_dir)
+        index.add_example("SELECT NVL(sal, 0) FROM emp", "SELECT COALESCE(sal, 0) FROM emp")
+        sql = "SELECT NVL(comm, 0) FROM emp"
+        matched = [{"from": "NVL", "to": "COALESCE", "context": "null handling", "example": "NVL(a, 0)"}]
+
+        context = select_prompt_context(index, store, sql, matched, {"top_k_rules": 2, "top_k_examples": 1, "min_similarity": 0.0})
+        assert context["known_transformations"][0]["from"] == "NVL"
+        assert len(context["known_transformations"]) <= 2
+        assert context["examples"][0]["oracle_sql"] == "SELECT NVL(sal, 0) FROM emp"
+
+        tight = select_prompt_context(index, store, sql, matched, {"token_budget": estimate_tokens('{"from": "NVL"}') + 20})
+        assert len(tight["known_transformations"]) == 1
+        assert "examples" not in tight
+
+def test_statement_never_retrieves_its_own_conversion():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, index = make_index(temp_dir)
+        index.add_example("SELECT NVL(sal, 0) FROM emp", "SELECT COALESCE(sal, 0) FROM emp")
+        index.add_example("SELECT NVL(bonus, 0) FROM emp", "SELECT COALESCE(bonus, 0) FROM emp")
+
+        found = index.similar_examples(store, "select nvl(sal, 0)\nFROM emp;", k=1)
+        assert [e["oracle_sql"] for e, _ in found] == ["SELECT NVL(bonus, 0) FROM emp"]
+
+def test_refresh_rebuilds_off_the_event_loop_and_serves_previous_index():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, index = make_index(temp_dir)
+
+        async def scenario():
+            await index.refresh(store)              # first build is awaited
+            assert index.similar_rules(store, "WHERE ROWNUM <= 5", k=1)[0][0]["from"] == "ROWNUM"
+            index.add_example("SELECT NVL(sal, 0) FROM emp", "SELECT COALESCE(sal, 0) FROM emp")
+            await index.refresh(store)              # rebuild runs in the background
+            assert index.similar_examples(store, "SELECT NVL(bonus, 0) FROM emp", k=1) == []
+            await index._rebuild_task
+            return index.similar_examples(store, "SELECT NVL(bonus, 0) FROM emp", k=1)
+
+        assert len(asyncio.run(scenario())) == 1
+
+def test_rebuild_waits_for_enough_changes_and_never_lists_keys():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store, _ = make_index(temp_dir)
+        index = RetrievalIndex(Path(temp_dir) / "conversions.jsonl", rebuild_interval=0, rebuild_min_changes=2)
+        assert index.similar_rules(store, "WHERE ROWNUM <= 5", k=1)[0][0]["from"] == "ROWNUM"
+
+        store.keys = None       # staleness comes from counters, not from listing the store
+        index.add_example("SELECT NVL(sal, 0) FROM emp", "SELECT COALESCE(sal, 0) FROM emp")
+        assert index.similar_examples(store, "SELECT NVL(bonus, 0) FROM emp", k=1) == []
+        store.upsert([{"from": "TRUNC", "to": "DATE_TRUNC", "context": "dates", "example": ""}])
+        assert len(index.similar_examples(store, "SELECT NVL(bonus, 0) FROM emp", k=1)) == 1
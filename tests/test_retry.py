@@ -0,0 +1,92 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from core.retry import (
+    EMPTY_SQL, MALFORMED, RATE_LIMIT, TRANSPORT, UNEXPECTED, AgentOutputError, CircuitBreaker, RetryPolicy,
+    classify_error, get_retry_policy, retry_after,
+)
+from core.runner import convert_with_retry
+
+class RateLimited(Exception):
+    status_code = 429
+    retry_after = "3"
+
+def test_classify_errors():
+    assert classify_error(RateLimited("slow down")) == RATE_LIMIT
+    assert classify_error(asyncio.TimeoutError()) == TRANSPORT
+    assert classify_error(ConnectionError("reset")) == TRANSPORT
+    assert classify_error(type("ServerError", (Exception,), {"status_code": 503})()) == TRANSPORT
+    assert classify_error(type("APIConnectionError", (Exception,), {})()) == TRANSPORT
+    assert classify_error(KeyError("postgresql_sql")) == UNEXPECTED
+    assert classify_error(TypeError("unhashable type")) == UNEXPECTED
+    assert classify_error(AgentOutputError(MALFORMED, "c1", "oops")) == MALFORMED
+    assert classify_error(AgentOutputError(EMPTY_SQL, "c1", "{}")) == EMPTY_SQL
+    assert retry_after(RateLimited()) == 3.0
+    assert retry_after(ConnectionError()) is None
+
+def test_backoff_is_jittered_capped_and_honours_retry_after():
+    policy = RetryPolicy({TRANSPORT: {"base_delay": 1.0, "max_delay": 4.0}})
+    for retry_number in range(6):
+        capped = min(4.0, 2 ** retry_number)
+        assert capped / 2 <= policy.delay(TRANSPORT, retry_number) <= capped
+    assert policy.delay(TRANSPORT, 0, requested=10) == 10
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure("m")
+    assert breaker.allow("m")
+    breaker.record_failure("m")
+    assert not breaker.allow("m")
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow("m")           # trial call
+    assert not breaker.allow("m")       # only one trial at a time
+    breaker.record_failure("m")
+    assert not breaker.allow("m")       # failed trial re-opens at once
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow("m")           # new trial; never reports back
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow("m")           # the lost trial expired
+    breaker.record_success("m")
+    assert breaker.allow("m")
+    assert breaker.allow("m")
+
+class FlakyConverter:
+    def __init__(self):
+        self.payloads = []
+
+    async def send(self, payload):
+        self.payloads.append(payload)
+        if len(self.payloads) == 1:
+            return "Sorry, I cannot do that."
+        return json.dumps({"postgresql_sql": "SELECT 1", "transformations": []})
+
+def test_malformed_answer_is_retried_with_repair_prompt():
+    converter = FlakyConverter()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {"settings": {"retry_limit": 3, "cache": {"enabled": False},
+                               "knowledge": {"backend": "json", "json_path": str(Path(temp_dir) / "k.json")}}}
+        result = asyncio.run(convert_with_retry({"c1": converter}, "c1", {"oracle_sql": "SELECT 1 FROM dual"}, config))
+    assert result["postgresql_sql"] == "SELECT 1"
+    assert "repair_instruction" not in converter.payloads[0]
+    assert converter.payloads[1]["previous_response"] == "Sorry, I cannot do that."
+
+class BuggyConverter:
+    def __init__(self):
+        self.calls = 0
+
+    async def send(self, payload):
+        self.calls += 1
+        raise KeyError("oracle_sql")
+
+def test_unexpected_error_fails_at_once_without_opening_the_circuit():
+    converter = BuggyConverter()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {"models": {"c1": "buggy-model"},
+                  "settings": {"retry_limit": 3, "cache": {"enabled": False},
+                               "retry": {"circuit_breaker": {"failure_threshold": 1}},
+                               "knowledge": {"backend": "json", "json_path": str(Path(temp_dir) / "k.json")}}}
+        result = asyncio.run(convert_with_retry({"c1": converter}, "c1", {"oracle_sql": "SELECT 1 FROM dual"}, config))
+        assert "oracle_sql" in result["error"]
+        assert converter.calls == 1
+        assert get_retry_policy(config).breaker.allow("buggy-model")
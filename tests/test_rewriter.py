@@ -0,0 +1,63 @@
+import core.validator
+from core.rewriter import BUILTIN_RULES, knowledge_rules, oracle_constructs, rewrite, try_deterministic
+
+def test_simple_dml_is_converted_without_agents():
+    sql = "SELECT NVL(a, 0), SYSDATE FROM dual;"
+    result = try_deterministic(sql, BUILTIN_RULES, trust_lexical=True)
+    assert result["postgresql_sql"] == "SELECT COALESCE(a, 0), CURRENT_TIMESTAMP;"
+    assert result["method"] == "deterministic"
+    assert {t["from"] for t in result["transformations"]} == {"NVL", "SYSDATE", "FROM DUAL"}
+
+def test_strings_comments_and_members_are_untouched():
+    sql = "UPDATE t SET note = 'NVL(x)', d = t.sysdate -- SYSDATE\nWHERE id = 1"
+    converted, applied = rewrite(sql, BUILTIN_RULES)
+    assert converted == sql
+    assert applied == []
+
+def test_remaining_oracle_constructs_need_llm():
+    assert try_deterministic("SELECT DECODE(a, 1, 'x') FROM t", BUILTIN_RULES) is None
+    assert try_deterministic("SELECT * FROM a, b WHERE a.id = b.id(+)", BUILTIN_RULES) is None
+    assert try_deterministic("CREATE TABLE t (c VARCHAR2(10))", BUILTIN_RULES) is None
+    assert oracle_constructs("SELECT * FROM t WHERE ROWNUM <= 5 AND x = :id") == ["ROWNUM", "bind variable"]
+
+def test_knowledge_rules_only_simple_unambiguous_renames():
+    tree = {
+        "MINUS": [{"to": "EXCEPT", "context": "set operator"}],
+        "DECODE": [{"to": "CASE", "context": "conditional"}],
+        "TO_CLOB(": [{"to": "CAST(", "context": "function call"}],
+        "SUBSTRB": [{"to": "SUBSTR", "context": "function"}, {"to": "SUBSTRING", "context": "function"}],
+        "SYS_GUID(": [{"to": "gen_random_uuid(", "context": "function call"}],
+    }
+    assert sorted(knowledge_rules(tree)) == [("MINUS", "EXCEPT", False), ("SYS_GUID", "gen_random_uuid", True)]
+    result = try_deterministic("SELECT SYS_GUID() FROM a MINUS SELECT id FROM b", knowledge_rules(tree) + BUILTIN_RULES, trust_lexical=True)
+    assert result["postgresql_sql"] == "SELECT gen_random_uuid() FROM a EXCEPT SELECT id FROM b"
+
+def test_date_arithmetic_and_unknown_calls_need_llm():
+    assert try_deterministic("SELECT id FROM emp WHERE hire_date > SYSDATE - 30", BUILTIN_RULES) is None
+    assert try_deterministic("SELECT DBMS_RANDOM.VALUE FROM dual", BUILTIN_RULES) is None
+    assert try_deterministic("SELECT SYS_CONTEXT('USERENV', 'SESSION_USER') FROM dual", BUILTIN_RULES) is None
+    assert oracle_constructs("SELECT app.fmt(a), SUBSTR(b, 0, 2) FROM t") == ["call app.fmt", "call SUBSTR"]
+    assert oracle_constructs("INSERT INTO s.t (a, b) SELECT COUNT(*), MAX(x) FROM u WHERE id IN (1, 2)") == []
+
+def test_output_must_pass_syntax_check():
+    assert try_deterministic("SELECT COALESCE(a, 0 FROM t", BUILTIN_RULES) is None
+    assert try_deterministic("SELECT UPPER(name) FROM t", BUILTIN_RULES, trust_lexical=True)["validation"] == "passed"
+
+def test_star_select_keeps_from_dual():
+    assert rewrite("SELECT * FROM dual", BUILTIN_RULES)[0] == "SELECT * FROM dual"
+    assert rewrite("SELECT t.* FROM dual", BUILTIN_RULES)[0] == "SELECT t.* FROM dual"
+    assert rewrite("SELECT COUNT(*) FROM dual", BUILTIN_RULES)[0] == "SELECT COUNT(*)"
+    assert try_deterministic("SELECT * FROM dual", BUILTIN_RULES, trust_lexical=True) is None
+
+def test_constructs_with_different_meaning_need_llm():
+    assert oracle_constructs("UPDATE t SET a = 1 / 2") == ["integer division"]
+    assert oracle_constructs("UPDATE t SET a = 1.0 / 2, b = c / 2") == []
+    assert oracle_constructs("SELECT a || b FROM t") == ["|| concatenation"]
+    assert oracle_constructs("SELECT id FROM t WHERE name = ''") == ["empty string literal"]
+    for sql in ("UPDATE t SET a = 1 / 2", "SELECT a || b FROM t", "SELECT COALESCE(a, '') FROM t"):
+        assert try_deterministic(sql, BUILTIN_RULES, trust_lexical=True) is None
+
+def test_lexical_check_needs_trust_lexical(monkeypatch):
+    monkeypatch.setattr(core.validator, "parse_sql", None)
+    assert try_deterministic("SELECT UPPER(name) FROM t", BUILTIN_RULES) is None
+    assert try_deterministic("SELECT UPPER(name) FROM t", BUILTIN_RULES, trust_lexical=True)["postgresql_sql"] == "SELECT UPPER(name) FROM t"
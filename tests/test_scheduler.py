@@ -0,0 +1,38 @@
+import asyncio
+from core.scheduler import run_bounded
+
+def test_run_bounded_preserves_order_and_limits_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def worker(n):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later items finish first to make sure ordering does not follow completion
+        await asyncio.sleep(0.01 * (10 - n))
+        in_flight -= 1
+        return n * n
+
+    async def collect():
+        return [pair async for pair in run_bounded(range(10), worker, max_concurrency=3)]
+
+    results = asyncio.run(collect())
+
+    assert results == [(n, n * n) for n in range(10)]
+    assert peak == 3
+
+def test_run_bounded_stops_starting_work_behind_a_slow_head():
+    started = []
+
+    async def worker(n):
+        started.append(n)
+        await asyncio.sleep(0.05 if n == 0 else 0.001)
+        return n
+
+    async def collect():
+        async for n, _ in run_bounded(range(20), worker, max_concurrency=2):
+            if n == 0:
+                return len(started)
+
+    assert asyncio.run(collect()) <= 4    # 2 * max_concurrency started while item 0 ran
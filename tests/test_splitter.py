@@ -0,0 +1,36 @@
+from core.splitter import split_statements
+from core.sql_lexer import tokenize
+
+SCRIPT = """-- header comment
+SELECT 'a;b' FROM dual;
+INSERT INTO t VALUES (q'[it's; fine]', 1 /* ; */);
+CREATE OR REPLACE PROCEDURE p IS
+  v NUMBER := 10 / 2;
+BEGIN
+  UPDATE t SET x = 1;
+END;
+/
+DECLARE x NUMBER; BEGIN x := 1; END;
+/
+SELECT a
+/ 2 FROM t
+/
+-- trailing
+"""
+
+def test_tokenize_is_lossless():
+    assert "".join(t.text for t in tokenize(SCRIPT)) == SCRIPT
+
+def test_split_statements_respects_strings_comments_and_plsql():
+    statements = list(split_statements(SCRIPT))
+
+    assert statements == [
+        "-- header comment\nSELECT 'a;b' FROM dual;",
+        "INSERT INTO t VALUES (q'[it's; fine]', 1 /* ; */);",
+        "CREATE OR REPLACE PROCEDURE p IS\n  v NUMBER := 10 / 2;\nBEGIN\n  UPDATE t SET x = 1;\nEND;",
+        "DECLARE x NUMBER; BEGIN x := 1; END;",
+        "SELECT a\n/ 2 FROM t\n-- trailing",
+    ]
+
+def test_single_statement_without_terminator():
+    assert list(split_statements("SELECT 1 FROM dual")) == ["SELECT 1 FROM dual"]
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from core.runner import convert_sql
+from core.telemetry import AGENT_SEND, Telemetry, close_telemetry, merge_summaries, summarize_span
+
+class EchoAgent:
+    def __init__(self):
+        self.refinement_history = []
+
+    async def send(self, payload):
+        await asyncio.sleep(0.001)
+        return json.dumps({"postgresql_sql": "SELECT COALESCE(a, 0) FROM t", "transformations": []})
+
+def test_span_writes_sink_and_summary():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        telemetry = Telemetry(Path(temp_dir) / "telemetry.jsonl")
+        summary = {}
+        with telemetry.span(AGENT_SEND, {"agent": "converter_1"}) as span:
+            span["prompt_tokens"] = 10
+        summarize_span(summary, AGENT_SEND, span)
+        try:
+            with telemetry.span(AGENT_SEND, {"agent": "converter_2"}):
+                raise TimeoutError()
+        except TimeoutError:
+            pass
+        telemetry.close()
+
+        records = [json.loads(line) for line in (Path(temp_dir) / "telemetry.jsonl").read_text().splitlines()]
+        assert [r["outcome"] for r in records] == ["ok", "TimeoutError"]
+        assert records[0]["duration"] >= 0 and records[0]["prompt_tokens"] == 10
+        assert summary["agent_calls"] == 1 and summary["agents"]["converter_1"]["calls"] == 1
+
+        merged = merge_summaries([summary, summary])
+        assert merged["agent_calls"] == 2 and merged["agents"]["converter_1"]["calls"] == 2
+
+def test_convert_sql_reports_file_telemetry():
+    agents = {name: EchoAgent() for name in ("converter_1", "converter_2", "merge_and_select", "oracle_to_pg_pipeline")}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = {
+            "paths": {"report_dir": temp_dir},
+            "settings": {
+                "retry_limit": 0,
+                "cache": {"enabled": False},
+                "deterministic": {"enabled": False},
+                "refinement": {"enabled": False},
+                "validation": {"short_circuit_below": 0},
+                "knowledge": {"backend": "json", "json_path": str(Path(temp_dir) / "k.json")},
+                "telemetry": {"enabled": True},
+            },
+        }
+        model_map = {"converter_1": "m1", "converter_2": "m2"}
+        result = asyncio.run(convert_sql(agents, config, "SELECT NVL(a, 0) FROM t", model_map))
+        close_telemetry()
+
+        telemetry = result["telemetry"]
+        assert telemetry["knowledge_lookups"] == 1
+        assert telemetry["agents"]["converter_1"]["calls"] == 1
+        assert telemetry["agents"]["oracle_to_pg_pipeline"]["calls"] == 1
+        assert telemetry["prompt_tokens"] > 0 and telemetry["refinements"] == 0
@@ -0,0 +1,26 @@
+import pytest
+from core.validator import lexical_errors, validate_sql
+
+def test_clean_postgresql_passes():
+    assert lexical_errors("SELECT COALESCE(a, 0)::text, 'it''s' FROM t WHERE b IN (1, 2) -- done") == []
+    assert validate_sql("UPDATE t SET d = CURRENT_TIMESTAMP WHERE id = $1") == []
+
+def test_lexical_errors():
+    assert lexical_errors("SELECT 'abc FROM t") == ["unterminated string literal at offset 7"]
+    assert lexical_errors("SELECT f(a, b FROM t") == ["1 unclosed '('"]
+    assert lexical_errors("SELECT a) FROM t") == ["unmatched ')' at offset 8"]
+    assert lexical_errors("SELECT * FROM a, b WHERE a.id = b.id(+)") == ["Oracle (+) outer join at offset 37"]
+    assert lexical_errors("SELECT f(a,) FROM t WHERE x = :id") == [
+        "trailing comma before ')' at offset 11",
+        "Oracle bind variable :id at offset 30",
+    ]
+    assert lexical_errors("  -- nothing\n") == ["no SQL statement"]
+
+def test_array_slices_are_not_bind_variables():
+    assert lexical_errors("SELECT arr[1:2], arr[lo:hi] FROM t") == []
+    assert lexical_errors("SELECT arr[1] FROM t WHERE x = :id") == ["Oracle bind variable :id at offset 31"]
+
+def test_parser_errors_with_pglast():
+    pytest.importorskip("pglast")
+    assert validate_sql("SELECT a FROM t") == []
+    assert validate_sql("SELECT a FROM WHERE t") != []